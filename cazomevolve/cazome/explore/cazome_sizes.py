@@ -48,11 +48,14 @@ from Bio import SeqIO
 from saintBioutils.utilities.file_io.get_paths import get_file_paths
 from tqdm import tqdm
 
+from cazomevolve.cazome.explore.chunked import ChunkedCazome
+from cazomevolve.cazome.explore.parse_data import unpack_dataset
+
 
 def count_items_in_cazome(gfp_df, item, grp, round_by=None):
     """Count the number of unique items per genome and per specificed tax grouping
     
-    :param gfp_df: panda df, cols = ['Family', 'Genome', 'Protein', 'tax grp', 'tax grp'...]
+    :param gfp_df: CazomeDataset, ChunkedCazome, or panda df, cols = ['Family', 'Genome', 'Protein', 'tax grp', 'tax grp'...]
     :param item: str, name of column to calculate incidence for, e.g. 'Protein' or 'Family'
     :param grp: str, name of column to group genomes by
     :param round_by: int, number of figures to round mean and sd by. If None do not round
@@ -61,6 +64,10 @@ def count_items_in_cazome(gfp_df, item, grp, round_by=None):
     * dict of {grp: {genome: {'items': {items}, 'numOfItems': int(num of items)}}}
     * df, cols = []
     """
+    if isinstance(gfp_df, ChunkedCazome):
+        return count_items_in_genome_table(gfp_df.genome_table, item, grp, round_by=round_by)
+
+    gfp_df = unpack_dataset(gfp_df, 'fgp_df')
     cazome_sizes = {}  # {genus: {genome: {'proteins': unique prot acc, 'numOfcazymes': int(num of prots)}}}
 
     for ri in tqdm(range(len(gfp_df)), desc="Gathering CAZy families per genome"):
@@ -78,14 +85,61 @@ def count_items_in_cazome(gfp_df, item, grp, round_by=None):
             cazome_sizes[grp_name][genome][f'{item}s'].add(row_item)
         except KeyError:
             cazome_sizes[grp_name][genome] = {f"{item}s": {row_item}}
-            
-    cazyme_size_data = []
 
-    for grp_name in tqdm(cazome_sizes, desc=f"Calculating num of {item} per genome and per {grp}"):
+    for grp_name in cazome_sizes:
         for genome in cazome_sizes[grp_name]:
             num_of_items = len(cazome_sizes[grp_name][genome][f'{item}s'])
             cazome_sizes[grp_name][genome][f'numOf{item}s'] = num_of_items
-            
+
+    cazome_size_df = summarise_cazome_sizes(cazome_sizes, item, grp, round_by=round_by)
+
+    return cazome_sizes, cazome_size_df
+
+
+def count_items_in_genome_table(genome_table, item, grp, round_by=None):
+    """Count the number of unique items per genome and per specificed tax grouping, from a
+    table of per genome counts (e.g. the genome_table of a ChunkedCazome)
+
+    :param genome_table: pandas df, one row per genome, with the columns 'Genome', grp
+        and f'NumOf{item}s', e.g. 'NumOfProteins'
+    :param item: str, name of the item, e.g. 'Protein' or 'Family'
+    :param grp: str, name of column to group genomes by
+    :param round_by: int, number of figures to round mean and sd by. If None do not round
+
+    Return
+    * dict of {grp: {genome: {'numOfItems': int(num of items)}}}
+    * df, cols = [grp, 'MeanItems', 'SdItems', 'NumOfGenomes']
+    """
+    cazome_sizes = {}  # {grp: {genome: {'numOfItems': int(num of items)}}}
+
+    for genome, grp_name, num_of_items in zip(
+        genome_table['Genome'], genome_table[grp], genome_table[f'NumOf{item}s']
+    ):
+        try:
+            cazome_sizes[grp_name]
+        except KeyError:
+            cazome_sizes[grp_name] = {}
+
+        cazome_sizes[grp_name][genome] = {f'numOf{item}s': int(num_of_items)}
+
+    cazome_size_df = summarise_cazome_sizes(cazome_sizes, item, grp, round_by=round_by)
+
+    return cazome_sizes, cazome_size_df
+
+
+def summarise_cazome_sizes(cazome_sizes, item, grp, round_by=None):
+    """Calculate the mean (and SD) number of items per genome per group
+
+    :param cazome_sizes: dict of {grp: {genome: {'numOfItems': int(num of items)}}}
+    :param item: str, name of the item, e.g. 'Protein' or 'Family'
+    :param grp: str, name of column to group genomes by
+    :param round_by: int, number of figures to round mean and sd by. If None do not round
+
+    Return df, cols = [grp, 'MeanItems', 'SdItems', 'NumOfGenomes']
+    """
+    cazyme_size_data = []
+
+    for grp_name in tqdm(cazome_sizes, desc=f"Calculating num of {item} per genome and per {grp}"):
         num_of_items = []
         for genome in cazome_sizes[grp_name]:
             num_of_items.append(cazome_sizes[grp_name][genome][f'numOf{item}s'])
@@ -104,8 +158,8 @@ def count_items_in_cazome(gfp_df, item, grp, round_by=None):
     
     cols = [grp, f'Mean{item}s', f'Sd{item}s', 'NumOfGenomes']
     cazome_size_df = pd.DataFrame(cazyme_size_data, columns=cols)
-    
-    return cazome_sizes, cazome_size_df
+
+    return cazome_size_df
 
 
 def get_proteome_sizes(proteome_dir, gfp_df, grp):
@@ -114,10 +168,13 @@ def get_proteome_sizes(proteome_dir, gfp_df, grp):
     Build a dict of proteome sizes grouped by tax lineage ('grp')
     
     :param proteome_dir: Path or str, path to dir containing .faa proteome files
-    :param gfp_df: pandas df containing families, genomes, tax_rank, tank_rank...
+    :param gfp_df: CazomeDataset, ChunkedCazome, or pandas df containing families, genomes, tax_rank, tank_rank...
     :param grp: str, name of column (tax_rank) to group genomes by, e.g. 'Genus'
     
     Return dict {grp: {genome: {'numOfproteins': int()}}}"""
+    if isinstance(gfp_df, ChunkedCazome):
+        gfp_df = gfp_df.genome_table
+    gfp_df = unpack_dataset(gfp_df, 'fgp_df')
     proteome_files = get_file_paths(proteome_dir, suffixes=['.faa'])
 
     proteome_sizes = {}  # {grp: {genome: {'numOfproteins': int()}}}
@@ -237,7 +294,7 @@ def calc_proteome_representation(proteome_dict, cazome_sizes_dict, grp, round_by
 def count_cazyme_fam_ratio(fgp_df, grp, round_by=None):
     """Calculate the mean (and SD) CAZyme to CAZy family ratio across the genomes for each group e.g. genus
     
-    :param fgp_df: panda df, cols = ['Family', 'Genome', 'Protein', 'tax grp', 'tax grp'...]
+    :param fgp_df: CazomeDataset, ChunkedCazome, or panda df, cols = ['Family', 'Genome', 'Protein', 'tax grp', 'tax grp'...]
     :param grp: str, name of column to group genomes by
     :param round_by: int, number of figures to round mean and sd by. If None do not round
     
@@ -245,6 +302,10 @@ def count_cazyme_fam_ratio(fgp_df, grp, round_by=None):
     * dict of {grp: {genome: {'items': {items}, 'numOfItems': int(num of items)}}}
     * df, cols = []
     """
+    if isinstance(fgp_df, ChunkedCazome):
+        return count_cazyme_fam_ratio_in_genome_table(fgp_df.genome_table, grp, round_by=round_by)
+
+    fgp_df = unpack_dataset(fgp_df, 'fgp_df')
     cazome_sizes = {}  # {genus: {genome: {'proteins': unique prot acc, 'numOfcazymes': int(num of prots)}}}
     
     for ri in tqdm(range(len(fgp_df)), desc="Gathering CAZymes and CAZy families per genome"):
@@ -264,16 +325,64 @@ def count_cazyme_fam_ratio(fgp_df, grp, round_by=None):
             cazome_sizes[grp_name][genome]['Families'].add(fam)
         except KeyError:
             cazome_sizes[grp_name][genome] = {'Proteins': {protein}, 'Families': {fam}}
-            
-    cazyme_ratio_data = []
 
-    for grp_name in tqdm(cazome_sizes, desc=f"Calculating CAZyme/CAZy family ratio"):
+    for grp_name in cazome_sizes:
         for genome in cazome_sizes[grp_name]:
             num_of_cazymes = len(cazome_sizes[grp_name][genome]['Proteins'])
             num_of_families = len(cazome_sizes[grp_name][genome]['Families'])
             cazyme_fam_ratio = num_of_cazymes / num_of_families
             cazome_sizes[grp_name][genome]['ratio'] =cazyme_fam_ratio
-            
+
+    cazome_ratio_df = summarise_cazyme_fam_ratios(cazome_sizes, grp, round_by=round_by)
+
+    return cazome_sizes, cazome_ratio_df
+
+
+def count_cazyme_fam_ratio_in_genome_table(genome_table, grp, round_by=None):
+    """Calculate the mean (and SD) CAZyme to CAZy family ratio across the genomes for each group,
+    from a table of per genome counts (e.g. the genome_table of a ChunkedCazome)
+
+    :param genome_table: pandas df, one row per genome, with the columns 'Genome', grp,
+        'NumOfProteins' and 'NumOfFamilys'
+    :param grp: str, name of column to group genomes by
+    :param round_by: int, number of figures to round mean and sd by. If None do not round
+
+    Return
+    * dict of {grp: {genome: {'ratio': float}}}
+    * df, cols = [grp, 'MeanCAZymeToFamRatio', 'SdCAZymeToFamRatio', 'NumOfGenomes']
+    """
+    cazome_sizes = {}  # {grp: {genome: {'ratio': float}}}
+
+    for genome, grp_name, num_of_cazymes, num_of_families in zip(
+        genome_table['Genome'],
+        genome_table[grp],
+        genome_table['NumOfProteins'],
+        genome_table['NumOfFamilys'],
+    ):
+        try:
+            cazome_sizes[grp_name]
+        except KeyError:
+            cazome_sizes[grp_name] = {}
+
+        cazome_sizes[grp_name][genome] = {'ratio': int(num_of_cazymes) / int(num_of_families)}
+
+    cazome_ratio_df = summarise_cazyme_fam_ratios(cazome_sizes, grp, round_by=round_by)
+
+    return cazome_sizes, cazome_ratio_df
+
+
+def summarise_cazyme_fam_ratios(cazome_sizes, grp, round_by=None):
+    """Calculate the mean (and SD) CAZyme to CAZy family ratio per group
+
+    :param cazome_sizes: dict of {grp: {genome: {'ratio': float}}}
+    :param grp: str, name of column to group genomes by
+    :param round_by: int, number of figures to round mean and sd by. If None do not round
+
+    Return df, cols = [grp, 'MeanCAZymeToFamRatio', 'SdCAZymeToFamRatio', 'NumOfGenomes']
+    """
+    cazyme_ratio_data = []
+
+    for grp_name in tqdm(cazome_sizes, desc=f"Calculating CAZyme/CAZy family ratio"):
         ratios = []
         for genome in cazome_sizes[grp_name]:
             ratios.append(cazome_sizes[grp_name][genome]['ratio'])
@@ -292,5 +401,5 @@ def count_cazyme_fam_ratio(fgp_df, grp, round_by=None):
     
     cols = [grp, 'MeanCAZymeToFamRatio', 'SdCAZymeToFamRatio', 'NumOfGenomes']
     cazome_ratio_df = pd.DataFrame(cazyme_ratio_data, columns=cols)
-    
-    return cazome_sizes, cazome_ratio_df
+
+    return cazome_ratio_df
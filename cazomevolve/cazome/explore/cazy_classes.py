@@ -46,6 +46,9 @@ import re
 
 from tqdm import tqdm
 
+from cazomevolve.cazome.explore.chunked import ChunkedCazome
+from cazomevolve.cazome.explore.parse_data import unpack_dataset
+
 
 CAZY_CLASSES = ['GH', 'GT', 'PL', 'CE', 'AA', 'CBM']
 
@@ -55,7 +58,7 @@ def calculate_class_sizes(fgp_df, grp, round_by=None):
 
     Num of CAZymes is the number of unique protein accessions.
 
-    :param fgp_df: pandas df, columns = ['Family', 'Genome', 'Protein', 'Genus', 'Species']
+    :param fgp_df: CazomeDataset, ChunkedCazome, or pandas df, columns = ['Family', 'Genome', 'Protein', 'Genus', 'Species']
     :param grp: str, tax rank to group genomes by, e.g. 'Genus' or 'Species'
     :param round_by: int, num of dp to round the mean and sd to, if None does not round
 
@@ -63,6 +66,10 @@ def calculate_class_sizes(fgp_df, grp, round_by=None):
     * df columns ['CAZyClass', grp, 'MeanCazyClass', 'SdCazyClass', 'NumOfGenomes']
     * dict cazy_class_size_dict
     """
+    if isinstance(fgp_df, ChunkedCazome):
+        return calculate_class_sizes_in_genome_table(fgp_df.genome_table, grp, round_by=round_by)
+
+    fgp_df = unpack_dataset(fgp_df, 'fgp_df')
     cazy_class_size_dict = {}  # {class: {grp: {genome: {'proteins': set(protein id), 'numOfProteins': int}}}}
 
     # calculate total CAZymes per genome - used to calculate the percentage of the cazome
@@ -101,18 +108,93 @@ def calculate_class_sizes(fgp_df, grp, round_by=None):
             cazy_class_size_dict[cazy_class][grp_name][genome]['proteins'].add(protein_acc)
         except KeyError:
             cazy_class_size_dict[cazy_class][grp_name][genome] = {'proteins': {protein_acc}}
-            
+
+    for grp_name in cazome_sizes:
+        for genome in cazome_sizes[grp_name]:
+            cazome_sizes[grp_name][genome]['numOfCAZymes'] = len(cazome_sizes[grp_name][genome]['CAZymes'])
+
+    for cazy_class in cazy_class_size_dict:
+        for grp_name in cazy_class_size_dict[cazy_class]:
+            for genome in cazy_class_size_dict[cazy_class][grp_name]:
+                num_of_cazymes = len(cazy_class_size_dict[cazy_class][grp_name][genome]['proteins'])
+                cazy_class_size_dict[cazy_class][grp_name][genome]['numOfProteins'] = num_of_cazymes
+
+    class_df = summarise_class_sizes(cazy_class_size_dict, cazome_sizes, grp, round_by=round_by)
+    
+    return class_df, cazy_class_size_dict
+
+
+def calculate_class_sizes_in_genome_table(genome_table, grp, round_by=None):
+    """Calculate the mean (+- SD) of CAZymes per CAZy class per grp, from a table of per genome
+    counts (e.g. the genome_table of a ChunkedCazome)
+
+    :param genome_table: pandas df, one row per genome, with the columns 'Genome', grp, 
+        'NumOfProteins' and one column per CAZy class listing the number of CAZymes in the class
+    :param grp: str, tax rank to group genomes by, e.g. 'Genus' or 'Species'
+    :param round_by: int, num of dp to round the mean and sd to, if None does not round
+
+    Return
+    * df columns ['CAZyClass', grp, 'MeanCazyClass', 'SdCazyClass', 'NumOfGenomes']
+    * dict cazy_class_size_dict {class: {grp: {genome: {'numOfProteins': int}}}}
+    """
+    cazy_class_size_dict = {}  # {class: {grp: {genome: {'numOfProteins': int}}}}
+    cazome_sizes = {}  # {grp: {genome: {'numOfCAZymes': int}}}
+
+    cazy_classes = [cazy_class for cazy_class in CAZY_CLASSES if cazy_class in genome_table.columns]
+
+    for ri in tqdm(range(len(genome_table)), desc="Getting CAZy class sizes"):
+        row = genome_table.iloc[ri]
+        genome = row['Genome']
+        grp_name = row[grp]
+
+        try:
+            cazome_sizes[grp_name]
+        except KeyError:
+            cazome_sizes[grp_name] = {}
+        cazome_sizes[grp_name][genome] = {'numOfCAZymes': int(row['NumOfProteins'])}
+
+        for cazy_class in cazy_classes:
+            if row[cazy_class] == 0:
+                continue
+
+            try:
+                cazy_class_size_dict[cazy_class]
+            except KeyError:
+                cazy_class_size_dict[cazy_class] = {}
+
+            try:
+                cazy_class_size_dict[cazy_class][grp_name]
+            except KeyError:
+                cazy_class_size_dict[cazy_class][grp_name] = {}
+
+            cazy_class_size_dict[cazy_class][grp_name][genome] = {'numOfProteins': int(row[cazy_class])}
+
+    class_df = summarise_class_sizes(cazy_class_size_dict, cazome_sizes, grp, round_by=round_by)
+
+    return class_df, cazy_class_size_dict
+
+
+def summarise_class_sizes(cazy_class_size_dict, cazome_sizes, grp, round_by=None):
+    """Calculate the mean (+- SD) of CAZymes per CAZy class per grp, and the mean percentage of
+    the CAZome represented by each CAZy class per grp
+
+    :param cazy_class_size_dict: dict {class: {grp: {genome: {'numOfProteins': int}}}}
+    :param cazome_sizes: dict {grp: {genome: {'numOfCAZymes': int}}}, listing all genomes
+    :param grp: str, tax rank to group genomes by, e.g. 'Genus' or 'Species'
+    :param round_by: int, num of dp to round the mean and sd to, if None does not round
+
+    Return df columns ['CAZyClass', grp, 'MeanCazyClass', 'SdCazyClass', 'NumOfGenomes']
+    """
     cazy_class_data = []
-    grps = set(fgp_df[grp])
 
     for cazy_class in tqdm(CAZY_CLASSES, desc="Calculating CAZy class sizes"):
         
-        for grp_name in grps:
+        for grp_name in cazome_sizes:
             try:
                 cazy_class_size_dict[cazy_class][grp_name]
             except KeyError:
                 # cazy class is not in any genomes from the grp_name
-                num_genomes = len(set(fgp_df[fgp_df[grp] == grp_name]['Genome']))  # sample size
+                num_genomes = len(cazome_sizes[grp_name])  # sample size
                 cazy_class_data.append(
                     [cazy_class, grp_name, 0, 0, 0, 0, num_genomes]
                 )
@@ -124,9 +206,7 @@ def calculate_class_sizes(fgp_df, grp, round_by=None):
             # calculate the number of CAZyme in the class
             cazy_class_sizes = []
             for genome in cazy_class_size_dict[cazy_class][grp_name]:
-                num_of_cazymes = len(cazy_class_size_dict[cazy_class][grp_name][genome]['proteins'])
-                cazy_class_size_dict[cazy_class][grp_name][genome]['numOfProteins'] = num_of_cazymes
-                cazy_class_sizes.append(num_of_cazymes)
+                cazy_class_sizes.append(cazy_class_size_dict[cazy_class][grp_name][genome]['numOfProteins'])
                 
             mean_cazy_class = np.mean(cazy_class_sizes)
             sd_cazy_class = np.std(cazy_class_sizes)
@@ -138,8 +218,8 @@ def calculate_class_sizes(fgp_df, grp, round_by=None):
             # calculate the percentage of the CAZome represented by the CAZy class
             cazy_class_percentages = []
             for genome in cazy_class_size_dict[cazy_class][grp_name]:
-                total_cazymes = len(cazome_sizes[grp_name][genome]['CAZymes'])
-                num_class_cazymes = len(cazy_class_size_dict[cazy_class][grp_name][genome]['proteins'])
+                total_cazymes = cazome_sizes[grp_name][genome]['numOfCAZymes']
+                num_class_cazymes = cazy_class_size_dict[cazy_class][grp_name][genome]['numOfProteins']
                 percentage = (num_class_cazymes / total_cazymes) * 100
                 cazy_class_percentages.append(percentage)
                 
@@ -157,4 +237,4 @@ def calculate_class_sizes(fgp_df, grp, round_by=None):
     col_names = ['CAZyClass', grp, 'MeanCazyClass', 'SdCazyClass', 'MeanClassPerc', 'SdClassPerc', 'NumOfGenomes']
     class_df = pd.DataFrame(cazy_class_data, columns=col_names)
     
-    return class_df, cazy_class_size_dict
+    return class_df
@@ -40,14 +40,34 @@
 """Explore the sizes of CAZy family populations per genome"""
 
 
+import hashlib
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import seaborn as sns
 
+from pathlib import Path
+
 from matplotlib.patches import Patch
+from scipy import sparse
+from scipy.cluster import hierarchy
+from scipy.spatial.distance import pdist
+
+try:
+    import fastcluster
+except ImportError:  # fastcluster is optional, faster hierarchical clustering
+    fastcluster = None
+
+from cazomevolve.cazome.explore.chunked import ChunkedCazome
+from cazomevolve.cazome.explore.fam_matrix import SparseFamFreqMatrix, to_dense_df
+from cazomevolve.cazome.explore.parse_data import unpack_dataset
 
-from tqdm import tqdm
+
+# min fraction of genomes in which a family is present for each category of the CAZome
+CORE_THRESHOLD = 1.0
+SOFT_CORE_THRESHOLD = 0.95
+SHELL_THRESHOLD = 0.15
 
 
 def build_fam_freq_df(gfp_df, tax_ranks):
@@ -55,52 +75,49 @@ def build_fam_freq_df(gfp_df, tax_ranks):
     
     Each row represents a genome, each column a CAZy family
     
-    :param gfp_df: pandas df - tab delimit list of ['Family', 'Genome', 'Protein', 'tax1', 'tax2'...]
+    :param gfp_df: CazomeDataset, ChunkedCazome, or pandas df - tab delimit list of ['Family', 'Genome', 'Protein', 'tax1', 'tax2'...]
+        If a CazomeDataset is given that includes the tax ranks, its cached matrix is returned
     :param tax_ranks: list of tax ranks to include the matrix, one column generated per rank
         Must match columns names in gfp_df, e.g. ['Genus', 'Species']
     
     Return matrix as pandas df
     """
+    if isinstance(gfp_df, ChunkedCazome):
+        return gfp_df.get_fam_freq_df(tax_ranks)
+
+    if isinstance(gfp_df, pd.DataFrame) is False:
+        if list(tax_ranks) == gfp_df.tax_ranks:
+            return gfp_df.fam_freq_df
+        if set(tax_ranks).issubset(gfp_df.tax_ranks):
+            # select the requested tax ranks from the matrix shared between the ranks
+            return gfp_df.fam_freq_df[['Genome'] + list(tax_ranks) + gfp_df.families]
+        gfp_df = gfp_df.fgp_df
+
     # identify all families present in the dataset
     all_families = set(gfp_df['Family'])
     all_families = list(all_families)
     all_families.sort()
     print(f"The dataset contains {len(all_families)} CAZy families")
     
-    # identify all genomes i the dataset
-    all_genomes = set(gfp_df['Genome'])
-    
-    # define column names
-    col_names = ['Genome']
-    
-    for rank in tax_ranks:
-        col_names.append(rank)
-        
-    for fam in all_families:
-        col_names.append(fam)
-        
-    # gather fam freq data per genome
-    fam_df_data = []
-
-    for genome in tqdm(all_genomes, desc="Counting fam frequencies"):
-        row_data = [genome]
-
-        # get tax data
-        for rank in tax_ranks:
-            row_data.append(gfp_df[gfp_df['Genome'] == genome].iloc[0][rank])
+    # identify all genomes i the dataset, in order of appearance
+    all_genomes = list(gfp_df['Genome'].unique())
 
-        # gather all genome rows
-        g_rows = gfp_df[gfp_df['Genome'] == genome]
+    # count the number of unique proteins per family per genome
+    fam_freqs = gfp_df.groupby(['Genome', 'Family'], sort=False, observed=True)['Protein'].nunique(dropna=False)
+    fam_freqs = fam_freqs.unstack('Family', fill_value=0)
+    fam_freqs = fam_freqs.reindex(index=all_genomes, columns=all_families, fill_value=0)
 
-        # count number of proteins in the family
-        for fam in all_families:
-            fam_rows = g_rows[g_rows['Family'] == fam]
-            fam_freq = len(set(fam_rows['Protein']))
-            row_data.append(fam_freq)
+    # get tax data, from the first row of each genome
+    genome_taxs = gfp_df.drop_duplicates('Genome').set_index('Genome')
+    genome_taxs = genome_taxs.reindex(all_genomes)
 
-        fam_df_data.append(row_data)
-
-    fam_freq_df = pd.DataFrame(fam_df_data, columns=col_names)
+    fam_freq_df = pd.DataFrame({'Genome': all_genomes})
+    for rank in tax_ranks:
+        fam_freq_df[rank] = list(genome_taxs[rank])
+    fam_freq_df = pd.concat(
+        [fam_freq_df, pd.DataFrame(fam_freqs.to_numpy(dtype=int), columns=all_families)],
+        axis=1,
+    )
     
     return fam_freq_df
 
@@ -149,15 +166,21 @@ def build_family_clustermap(
     cmap=sns.cubehelix_palette(dark=1, light=0, reverse=True, as_cmap=True),
     cbar_pos=(0.02, 0.8, 0.05, 0.18),
     show=False,
+    row_linkage=None,
+    col_linkage=None,
+    rasterized=False,
+    max_labels=None,
+    max_fig_size=None,
 ):
     """Build a clustermap of the CAZy family frequencies per genome
     
-    :param df: df of CAZy family frequencies per genome
+    :param df: CazomeDataset, or df of CAZy family frequencies per genome
     :param row_colours: pandas map - used to define additional row colours. or list of maps for 
         multiple sets of row colours. If None, additional row colours are not plotted
     :param fig_size: tuple (width, height) of final figure. If None, decided by Seaborn
     :param file_path: path to save image to. If None, the figure is not written to a file
-    :param file_format: str, file format to save figure to. Default 'png'
+    :param file_format: str, file format to save figure to. Default 'png'. Or list of file formats,
+        to render the figure once and save it in each format (file_path with the format as suffix)
     :param font_scale: int, scale text - use if text is overlapping. <1 to reduce 
         text size
     :param dpi: dpi of saved figure
@@ -172,10 +195,22 @@ def build_family_clustermap(
     :param cmap: Seaborn cmap to be used for colour scheme of the heat/clustermap
     :param cbar_pos: from seaborn.clustermap, position and size of colour scale key/bar
         seaborn default=(0.02, 0.8, 0.05, 0.18) - left, bottom, width, height
+    :param row_linkage: linkage matrix of the rows (genomes), e.g. from calc_clustermap_linkages().
+        If None, calculated by seaborn
+    :param col_linkage: linkage matrix of the columns (families). If None, calculated by seaborn
+    :param rasterized: bool, rasterise the heatmap cells (and row colours), while keeping the labels,
+        dendrograms and legends as vector graphics. Keeps the file size of large clustermaps bounded
+    :param max_labels: int, max number of rows (or columns) to label. Above this number, the
+        labels are not drawn. If None, all rows and columns are labelled
+    :param max_fig_size: tuple (max width, max height) of the figure. If None, fig_size is not limited
     
     Return clustermap object
     """
+    df = to_dense_df(unpack_dataset(df, 'fam_freq_matrix'))
     sns.set(font_scale=font_scale)
+
+    if (fig_size is not None) and (max_fig_size is not None):
+        fig_size = (min(fig_size[0], max_fig_size[0]), min(fig_size[1], max_fig_size[1]))
     
     fam_clustermap = sns.clustermap(
         df,
@@ -183,10 +218,18 @@ def build_family_clustermap(
         figsize=fig_size,
         row_colors=row_colours,
         dendrogram_ratio=dendrogram_ratio,
-        yticklabels=True,
-        xticklabels=True,
+        yticklabels=(max_labels is None) or (len(df) <= max_labels),
+        xticklabels=(max_labels is None) or (len(df.columns) <= max_labels),
         cbar_pos=cbar_pos,
+        row_linkage=row_linkage,
+        col_linkage=col_linkage,
     );
+
+    if rasterized:
+        for ax in [fam_clustermap.ax_heatmap, fam_clustermap.ax_row_colors, fam_clustermap.ax_col_colors]:
+            if ax is not None:
+                for collection in ax.collections:
+                    collection.set_rasterized(True)
     
     if lut is not None:
         handles = [Patch(facecolor=lut[name]) for name in lut]
@@ -205,12 +248,7 @@ def build_family_clustermap(
         plt.show();
 
     if file_path is not None:
-        fam_clustermap.savefig(
-            file_path,
-            dpi=dpi,
-            bbox_inches='tight',
-            format=file_format,
-        )
+        save_clustermap(fam_clustermap, file_path, file_format, dpi)
 
     return fam_clustermap
 
@@ -235,7 +273,7 @@ def build_family_clustermap_multi_legend(
 ):
     """Build a clustermap of the CAZy family frequencies per genome
     
-    :param df: df of CAZy family frequencies per genome
+    :param df: CazomeDataset, or df of CAZy family frequencies per genome
     :param row_colours: List of maps for multiple sets of row colours
     :param luts: list of luts, in same order as row_colours
     :param legend_titles: list of legend titles, in same order as luts and row_colours
@@ -244,7 +282,8 @@ def build_family_clustermap_multi_legend(
     :param legend_cols: list of ints, number of cols to put in each legend. One int per legend
     :param fig_size: tuple (width, height) of final figure. If None, decided by Seaborn
     :param file_path: path to save image to. If None, the figure is not written to a file
-    :param file_format: str, file format to save figure to. Default 'png'
+    :param file_format: str, file format to save figure to. Default 'png'. Or list of file formats,
+        to render the figure once and save it in each format (file_path with the format as suffix)
     :param font_scale: int, scale text - use if text is overlapping. <1 to reduce 
         text size
     :param dpi: dpi of saved figure
@@ -259,6 +298,7 @@ def build_family_clustermap_multi_legend(
     
     Return clustermap object
     """
+    df = to_dense_df(unpack_dataset(df, 'fam_freq_matrix'))
     if legend_cols is None:
         legend_cols = [1] * len(luts)
     
@@ -315,14 +355,103 @@ def build_family_clustermap_multi_legend(
             )
         
     if file_path is not None:
+        save_clustermap(fam_clustermap, file_path, file_format, dpi)
+
+    return fam_clustermap
+
+
+def save_clustermap(fam_clustermap, file_path, file_format, dpi):
+    """Write a rendered clustermap to one or more file formats
+
+    :param fam_clustermap: seaborn ClusterGrid
+    :param file_path: path to save image to
+    :param file_format: str, file format, or list of file formats. When a list is given, the 
+        suffix of file_path is replaced with each format
+    :param dpi: dpi of saved figure
+
+    Return nothing
+    """
+    if isinstance(file_format, str):
+        fam_clustermap.savefig(file_path, dpi=dpi, bbox_inches='tight', format=file_format)
+        return
+
+    for fig_format in file_format:
         fam_clustermap.savefig(
-            file_path,
+            Path(file_path).with_suffix(f".{fig_format}"),
             dpi=dpi,
             bbox_inches='tight',
-            format=file_format,
+            format=fig_format,
         )
 
-    return fam_clustermap
+
+def calc_clustermap_linkages(df, method='average', metric='euclidean', cache_dir=None):
+    """Calculate the row (genome) and column (family) linkages for a clustermap, using the same 
+    method and metric as seaborn.clustermap, so the clustering is only performed once per dataset
+
+    The frequencies are held as float32. fastcluster is used if installed, otherwise scipy.
+    
+    :param df: df of CAZy family frequencies per genome, rows=genomes, cols=families
+    :param method: str, linkage method, see scipy.cluster.hierarchy.linkage
+    :param metric: str, distance metric, see scipy.spatial.distance.pdist
+    :param cache_dir: path to dir to cache linkages in, keyed by the hash of the matrix, the method
+        and the metric. If None, linkages are not cached
+    
+    Return row linkage and col linkage (numpy arrays)
+    """
+    values = np.ascontiguousarray(df.to_numpy(dtype=np.float32))
+
+    cache_path = None
+    if cache_dir is not None:
+        matrix_hash = hashlib.sha256(values.tobytes())
+        matrix_hash.update(f"{values.shape}-{method}-{metric}".encode())
+        cache_path = Path(cache_dir) / f"linkages_{matrix_hash.hexdigest()[:32]}.npz"
+
+        if cache_path.exists():
+            linkages = np.load(cache_path)
+            return linkages['row_linkage'], linkages['col_linkage']
+
+    row_linkage = calc_linkage(values, method=method, metric=metric)
+    col_linkage = calc_linkage(np.ascontiguousarray(values.T), method=method, metric=metric)
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(cache_path, row_linkage=row_linkage, col_linkage=col_linkage)
+
+    return row_linkage, col_linkage
+
+
+def calc_linkage(values, method='average', metric='euclidean'):
+    """Hierarchically cluster the rows of a matrix
+
+    :param values: 2D np array, rows are clustered
+    :param method: str, linkage method
+    :param metric: str, distance metric
+
+    Return linkage matrix (numpy array)
+    """
+    if fastcluster is None:
+        return hierarchy.linkage(values, method=method, metric=metric)
+
+    if (metric == 'euclidean') and (method in ['single', 'centroid', 'median', 'ward']):
+        # does not build the condensed distance matrix
+        return fastcluster.linkage_vector(values, method=method, metric=metric)
+
+    return fastcluster.linkage(pdist(values, metric=metric), method=method, preserve_input=False)
+
+
+def build_group_mean_fam_freq_df(df, grp):
+    """Collapse the CAZy family frequencies per genome to the mean frequency per group, e.g. to 
+    plot a clustermap of genera rather than of every genome
+
+    :param df: df, rows=genomes, cols=fam freqs and one column of the group of each genome (e.g. 'Genus')
+    :param grp: str, name of the column to group genomes by
+
+    Return df, index=groups (in order of first appearance), cols=mean fam freqs
+    """
+    group_mean_df = df.drop(grp, axis=1).groupby(df[grp].to_numpy(), sort=False, dropna=False).mean()
+    group_mean_df.index.name = grp
+
+    return group_mean_df
 
 
 ## For the core CAZome
@@ -331,16 +460,184 @@ def build_family_clustermap_multi_legend(
 def identify_core_cazome(df):
     """Identify families that are present in every genome
     
-    :param df: pandas df, matrix where each row is a genome, and each column a CAZy family
+    :param df: CazomeDataset, SparseFamFreqMatrix, or pandas df, matrix where each row is a genome, and each column a CAZy family
     
     Return set of CAZy families"""
-    core_cazome = set()
+    df = unpack_dataset(df, 'fam_freq_matrix')
 
-    for fam in tqdm(df.columns, desc="Identifying core CAZome"):
-            if 0 not in set(df[fam]):
-                core_cazome.add(fam)
+    if isinstance(df, SparseFamFreqMatrix):
+        genome_counts = df.genome_counts()
+        return set(genome_counts[genome_counts == len(df)].index)
 
-    return core_cazome
+    return set(df.columns[(df != 0).all(axis=0)])
+
+
+def calc_fam_prevalence(
+    fam_freq_df,
+    all_families,
+    ranks=None,
+    core=CORE_THRESHOLD,
+    soft_core=SOFT_CORE_THRESHOLD,
+    shell=SHELL_THRESHOLD,
+):
+    """Calculate the fraction of genomes in which each CAZy family is present, across all genomes 
+    and within every group at each tax rank, and classify each family as core, soft core, shell or cloud
+
+    The genome counts for all groups at all ranks are calculated in one pass over the presence/absence
+    matrix, by multiplying the matrix by a (sparse) matrix of group membership.
+    
+    :param fam_freq_df: CazomeDataset, SparseFamFreqMatrix (with genome_taxs), or df, rows=genomes,
+        cols=fam freqs and one column per tax rank to group genomes by (e.g. a 'Genus' column)
+    :param all_families: list of CAZy families to analyse
+    :param ranks: list of tax ranks (columns) to group genomes by. If None, only across all genomes
+    :param core: float, min fraction of genomes containing a family in the core CAZome
+    :param soft_core: float, min fraction of genomes containing a family in the soft core CAZome
+    :param shell: float, min fraction of genomes containing a family in the shell CAZome.
+        Families in fewer genomes (but at least one) are in the cloud CAZome
+    
+    Return df, columns ['Rank', 'Group', 'Family', 'Genomes', 'GroupSize', 'Prevalence', 'Category'].
+        The prevalence across all genomes is listed with Rank and Group 'All'
+    """
+    fam_freq_df = unpack_dataset(fam_freq_df, 'fam_freq_df')
+    if ranks is None:
+        ranks = []
+
+    if isinstance(fam_freq_df, SparseFamFreqMatrix):
+        families = [fam for fam in fam_freq_df.columns if fam in set(all_families)]
+        presence = fam_freq_df.to_presence().matrix[:, fam_freq_df.columns.get_indexer(families)]
+        tax_df = fam_freq_df.genome_taxs
+    else:
+        families = [
+            fam for fam in all_families
+            if fam not in ['Kingdom', 'Phylum', 'Class', 'Order', 'Family', 'Genus', 'Species', 'Genome', 'Genomes']
+        ]
+        presence = sparse.csr_matrix((fam_freq_df[families] > 0).to_numpy(dtype=np.int32))
+        tax_df = fam_freq_df
+
+    num_genomes = presence.shape[0]
+
+    # group membership: one row for all genomes, then one row per group at each rank
+    row_ranks, row_groups = ['All'], ['All']
+    member_rows, member_cols = [np.zeros(num_genomes, dtype=int)], [np.arange(num_genomes)]
+    for rank in ranks:
+        grp_codes, grps = pd.factorize(tax_df[rank], use_na_sentinel=False)
+        member_rows.append(grp_codes + len(row_groups))
+        member_cols.append(np.arange(num_genomes))
+        row_ranks += [rank] * len(grps)
+        row_groups += list(grps)
+
+    membership = sparse.csr_matrix(
+        (np.ones(num_genomes * (len(ranks) + 1), dtype=np.int32),
+         (np.concatenate(member_rows), np.concatenate(member_cols))),
+        shape=(len(row_groups), num_genomes),
+    )
+
+    fam_counts = (membership @ presence).toarray()
+    grp_sizes = np.asarray(membership.sum(axis=1)).ravel()
+
+    return build_fam_prevalence_df(
+        fam_counts,
+        grp_sizes,
+        row_ranks,
+        row_groups,
+        families,
+        core=core,
+        soft_core=soft_core,
+        shell=shell,
+    )
+
+
+def build_fam_prevalence_df(
+    fam_counts,
+    grp_sizes,
+    row_ranks,
+    row_groups,
+    families,
+    core=CORE_THRESHOLD,
+    soft_core=SOFT_CORE_THRESHOLD,
+    shell=SHELL_THRESHOLD,
+):
+    """Build the df of the prevalence and CAZome category of each family per group
+
+    :param fam_counts: 2D np array, rows=groups, cols=families, number of genomes containing the family
+    :param grp_sizes: 1D np array, number of genomes per group
+    :param row_ranks: list of tax ranks, one per group (row)
+    :param row_groups: list of group names, one per row
+    :param families: list of CAZy families, one per column
+    :param core: float, see calc_fam_prevalence()
+    :param soft_core: float, see calc_fam_prevalence()
+    :param shell: float, see calc_fam_prevalence()
+
+    Return df, columns ['Rank', 'Group', 'Family', 'Genomes', 'GroupSize', 'Prevalence', 'Category']
+    """
+    # categorical columns, as there is a row per family per group
+    num_fams = len(families)
+    rank_names = list(pd.unique(pd.Series(row_ranks, dtype=object)))
+    rank_codes = pd.Categorical(row_ranks, categories=rank_names).codes
+    grp_codes, grps = pd.factorize(pd.Series(row_groups, dtype=object))
+
+    prevalence_df = pd.DataFrame({
+        'Rank': pd.Categorical.from_codes(np.repeat(rank_codes, num_fams), categories=rank_names),
+        'Group': pd.Categorical.from_codes(np.repeat(grp_codes, num_fams), categories=grps),
+        'Family': pd.Categorical.from_codes(np.tile(np.arange(num_fams), len(row_groups)), categories=families),
+        'Genomes': np.asarray(fam_counts).ravel(),
+        'GroupSize': np.repeat(np.asarray(grp_sizes), num_fams),
+    })
+    prevalence_df['Prevalence'] = prevalence_df['Genomes'] / prevalence_df['GroupSize']
+    prevalence_df['Category'] = classify_fam_prevalence(
+        prevalence_df['Prevalence'],
+        core=core,
+        soft_core=soft_core,
+        shell=shell,
+    )
+
+    return prevalence_df
+
+
+def classify_fam_prevalence(prevalence, core=CORE_THRESHOLD, soft_core=SOFT_CORE_THRESHOLD, shell=SHELL_THRESHOLD):
+    """Classify CAZy families by the fraction of genomes they are present in
+
+    :param prevalence: pandas Series, fraction of genomes containing each family
+    :param core: float, min fraction of genomes containing a family in the core CAZome
+    :param soft_core: float, min fraction of genomes containing a family in the soft core CAZome
+    :param shell: float, min fraction of genomes containing a family in the shell CAZome
+
+    Return pandas Series of 'Core', 'SoftCore', 'Shell', 'Cloud' or 'Absent'
+    """
+    if not 0 < shell <= soft_core <= core <= 1:
+        raise ValueError(
+            f"CAZome thresholds must satisfy 0 < shell ({shell}) <= soft core ({soft_core}) <= core ({core}) <= 1"
+        )
+
+    prevalence = np.asarray(prevalence, dtype=float)
+    category_codes = np.select(
+        [prevalence >= core, prevalence >= soft_core, prevalence >= shell, prevalence > 0],
+        [0, 1, 2, 3],
+        default=4,
+    )
+
+    return pd.Series(pd.Categorical.from_codes(
+        category_codes,
+        categories=['Core', 'SoftCore', 'Shell', 'Cloud', 'Absent'],
+    ))
+
+
+def get_group_core_cazomes(prevalence_df, rank, category='Core'):
+    """Retrieve the families in a category of the CAZome of each group at a tax rank
+
+    :param prevalence_df: df returned by calc_fam_prevalence()
+    :param rank: str, tax rank, e.g. 'Genus'
+    :param category: str, 'Core', 'SoftCore', 'Shell' or 'Cloud'
+
+    Return dict {group: {fams}}
+    """
+    rank_df = prevalence_df[prevalence_df['Rank'] == rank]
+
+    grp_cazomes = {}
+    for grp_name, grp_df in rank_df.groupby('Group', sort=False, dropna=False, observed=True):
+        grp_cazomes[grp_name] = set(grp_df.loc[grp_df['Category'] == category, 'Family'])
+
+    return grp_cazomes
 
 
 def plot_fam_boxplot(
@@ -353,7 +650,7 @@ def plot_fam_boxplot(
 ):
     """Plot a one-dimensional boxplot of the frequencies of the CAZy families in the df
     
-    :param :param df: pandas df, matrix where each row is a genome, and each column a CAZy family
+    :param :param df: CazomeDataset, or pandas df, matrix where each row is a genome, and each column a CAZy family
     :param font_scale: int, >1 increase font size, <1 to reduce font size
     :param file_path: path to save image to. If None, the figure is not written to a file
     :param file_format: str, file format to save figure to. Default 'png'
@@ -362,6 +659,7 @@ def plot_fam_boxplot(
     
     Return nothing.
     """
+    df = to_dense_df(unpack_dataset(df, 'fam_freq_matrix'))
     sns.set(font_scale=font_scale)
     
     if fig_size is not None:
@@ -395,7 +693,7 @@ def build_fam_mean_freq_df(df, grp, round_by=None):
     DF 1: Family, tax rank (i.e. group), genome, freq
     DF 2: Family, tax rank (i.e. group), mean freq, sd freq
     
-    :param df: pandas df, each row is a genome and each column a CAZy family
+    :param df: CazomeDataset, or pandas df, each row is a genome and each column a CAZy family
         and one column with tax rank listed (e.g. a 'Genus' column)
         and index includes the genomic accession
     :param grp: str, name of tax rank to group data by, and matches a name of one 
@@ -404,93 +702,127 @@ def build_fam_mean_freq_df(df, grp, round_by=None):
     
     Return two dataframes
     """
+    if isinstance(df, pd.DataFrame) is False:
+        df = df.get_grouped_fam_freq_matrix(grp)
     families = list(df.columns)
     families.remove(grp)
     
-    df_1_data = []  # Family, tax rank (i.e. group), genome, freq
-    
-    for i in tqdm(range(len(df)), desc="Building [fam, grp, genome, freq] df"):
-        row = df.iloc[i]
-        
-        genome = row.name
-        grp_name = row[grp]
-        
-        for fam in families:
-            freq = row[fam]
-            df_1_data.append([fam, grp_name, genome, freq])
-            
-    df_1 = pd.DataFrame(df_1_data, columns=['Family', grp, 'Genome', 'Frequency'])
-    
-    # build second df of Family, tax rank (i.e. group), mean freq, sd freq
-    groups = set(df_1[grp])
-    
-    df_2_data = []
-    for grp_name in tqdm(groups, desc="Building [Fam, grp, mean freq, sd freq] df"):
-        grp_rows = df_1[df_1[grp] == grp_name]
-        
-        for fam in families:
-            fam_grp_rows = grp_rows[grp_rows['Family'] == fam]
-            mean = np.mean(fam_grp_rows['Frequency'])
-            sd = np.std(fam_grp_rows['Frequency'])
-
-            if round_by is not None:
-                mean = round(mean, round_by)
-                sd = round(sd, round_by)
-            
-            df_2_data.append([fam, grp_name, mean, sd])
-        
-    df_2 = pd.DataFrame(df_2_data, columns=['Family',grp,'MeanFreq','SdFreq'])
+    num_genomes, num_fams = len(df), len(families)
+
+    # DF 1: Family, tax rank (i.e. group), genome, freq
+    # melt lists the genomes per family, reorder to list the families per genome
+    df_1 = df.melt(
+        id_vars=[grp],
+        value_vars=families,
+        var_name='Family',
+        value_name='Frequency',
+        ignore_index=False,
+    )
+    df_1['Genome'] = df_1.index
+    genome_order = np.arange(num_genomes * num_fams).reshape(num_fams, num_genomes).T.ravel()
+    df_1 = df_1.iloc[genome_order][['Family', grp, 'Genome', 'Frequency']].reset_index(drop=True)
+
+    # DF 2: Family, tax rank (i.e. group), mean freq, sd freq (population SD, as np.std)
+    grouped = df[families].groupby(df[grp], sort=False, dropna=False)
+    means = grouped.mean()
+    sds = grouped.std(ddof=0)
+
+    df_2 = pd.DataFrame({
+        'Family': np.tile(np.asarray(families, dtype=object), len(means)),
+        grp: np.repeat(means.index.to_numpy(dtype=object), num_fams),
+        'MeanFreq': means.to_numpy(dtype=float).ravel(),
+        'SdFreq': sds.to_numpy(dtype=float).ravel(),
+    })
+
+    if round_by is not None:
+        df_2[['MeanFreq', 'SdFreq']] = df_2[['MeanFreq', 'SdFreq']].round(round_by)
     
     return df_1, df_2
 
 
-def get_group_specific_fams(fam_freq_df, group_by, all_families):
+def get_group_specific_fams(
+    fam_freq_df,
+    group_by,
+    all_families,
+    min_prevalence=None,
+    max_other_prevalence=None,
+):
     """Identify families that are present in only one group
     
     The taxonomic information needs to be contained in the row names, use index_df() from cazomevolve
+
+    By default a family is specific to a group when it is present in at least one genome in the group,
+    and in no genomes outside of the group. Use the prevalence thresholds to allow for incomplete
+    presence, e.g. families present in >= 90% of genomes in the group, and <= 5% of genomes outside
+    of the group: min_prevalence=0.9, max_other_prevalence=0.05
     
-    :param fam_freq_df: df, rows=genomes, cols=fam freqs and column containing data to group
+    :param fam_freq_df: CazomeDataset, or df, rows=genomes, cols=fam freqs and column containing data to group
         genomes by, e.g. a 'Genus' column
     :param group_by: str, name of column to group genomes by
     :param all_families: list of CAZy families to analyse
+    :param min_prevalence: float, minimum fraction of genomes in the group containing the family.
+        If None, the family must be present in at least one genome in the group
+    :param max_other_prevalence: float, maximum fraction of genomes outside of the group containing
+        the family. If None, the family must be absent from all genomes outside of the group
     
     Return dict {group: {only unique fams}} and dict {group: {all fams}}
     """
-    # Identify the families present in each group
-    group_fams = {}  # {group: {fams}}
-
-    # identify all fams in each group
-    for ri in tqdm(range(len(fam_freq_df)), desc=f"Identifying fams in each {group_by}"):
-        group = fam_freq_df.iloc[ri][group_by]
-
-        try:
-            group_fams[group]
-        except KeyError:
-            group_fams[group] = set()
-
-        for fam in all_families:
-            if fam in ['Kingdom', 'Phylum', 'Class', 'Order', 'Family', 'Genus', 'Species', 'Genome', 'Genomes']:
-                continue
-            if fam_freq_df.iloc[ri][fam] > 0:
-                group_fams[group].add(fam)
-
-    # identify fams found in only one group
-    unique_grp_fams = {}  # {grp: {fams}}
-    for group in tqdm(group_fams, desc=f"Identifying {group_by} specific fams"):
-        fams_in_grp = group_fams[group]
-        other_groups = list(group_fams.keys())
-        other_groups.remove(group)
-
-        for fam in fams_in_grp:
-            unique = True
-            for grp in other_groups:
-                if fam in group_fams[grp]:
-                    unique = False
-
-            if unique:
-                try:
-                    unique_grp_fams[group].add(fam)
-                except KeyError:
-                    unique_grp_fams[group] = {fam}
+    fam_freq_df = unpack_dataset(fam_freq_df, 'fam_freq_df')
+
+    families = [
+        fam for fam in all_families
+        if fam not in ['Kingdom', 'Phylum', 'Class', 'Order', 'Family', 'Genus', 'Species', 'Genome', 'Genomes']
+    ]
+
+    # number of genomes containing each family per group (rows: groups, cols: families)
+    presence = fam_freq_df[families] > 0
+    grouped_presence = presence.groupby(fam_freq_df[group_by], sort=False, dropna=False)
+    grp_fam_counts = grouped_presence.sum()
+    grp_sizes = grouped_presence.size()
+
+    return get_specific_fams_from_counts(
+        grp_fam_counts,
+        grp_sizes,
+        min_prevalence=min_prevalence,
+        max_other_prevalence=max_other_prevalence,
+    )
+
+
+def get_specific_fams_from_counts(grp_fam_counts, grp_sizes, min_prevalence=None, max_other_prevalence=None):
+    """Identify group specific families from the number of genomes containing each family per group
+
+    :param grp_fam_counts: df, rows=groups, cols=families, cells=num of genomes in the group containing the family
+    :param grp_sizes: Series, number of genomes per group, aligned to the rows of grp_fam_counts
+    :param min_prevalence: float, see get_group_specific_fams()
+    :param max_other_prevalence: float, see get_group_specific_fams()
+
+    Return dict {group: {only unique fams}} and dict {group: {all fams}}
+    """
+    groups = list(grp_fam_counts.index)
+    families = np.asarray(grp_fam_counts.columns, dtype=object)
+
+    counts = grp_fam_counts.to_numpy(dtype=float)
+    sizes = np.asarray(grp_sizes, dtype=float)[:, None]
+    present = counts > 0
+
+    specific = present.copy()
+    if min_prevalence is not None:
+        specific &= counts >= min_prevalence * sizes
+
+    # number of genomes outside of each group containing each family
+    other_counts = counts.sum(axis=0) - counts
+    if max_other_prevalence is None:
+        specific &= other_counts == 0
+    else:
+        other_sizes = sizes.sum() - sizes
+        other_prevalence = np.divide(
+            other_counts, other_sizes, out=np.zeros_like(other_counts), where=other_sizes > 0,
+        )
+        specific &= other_prevalence <= max_other_prevalence
+
+    group_fams = {group: set(families[row].tolist()) for group, row in zip(groups, present)}
+    unique_grp_fams = {
+        group: set(families[row].tolist()) for group, row in zip(groups, specific) if row.any()
+    }
 
     return unique_grp_fams, group_fams
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Summarise FGP files that are too large to load into memory, by reading them in chunks"""
+
+
+import numpy as np
+import pandas as pd
+
+from tqdm import tqdm
+
+from cazomevolve.cazome.explore.parse_data import FGP_COLUMNS
+
+
+class ChunkedCazome:
+    """Per-genome summaries of a FGP file, accumulated by reading the FGP file in chunks.
+
+    Can be passed to the CAZome size, CAZy class and build_fam_freq_df functions in place 
+    of the FGP dataframe.
+    """
+
+    def __init__(self, genome_table, fam_counts):
+        """Build the summaries
+
+        :param genome_table: pandas df, one row per genome, columns 'Genome', one column per tax rank,
+            'NumOfProteins' (num of unique protein IDs), 'NumOfFamilys' (num of CAZy families)
+            and one column per CAZy class listing the number of unique protein IDs in the class
+        :param fam_counts: pandas df, columns 'Genome', 'Family' and 'Frequency' (num of unique
+            protein IDs in the family in the genome)
+        """
+        self.genome_table = genome_table
+        self.fam_counts = fam_counts
+
+    def __len__(self):
+        return len(self.genome_table)
+
+    def get_fam_freq_df(self, tax_ranks):
+        """Build matrix of fam freq per genome, matching build_fam_freq_df()
+
+        :param tax_ranks: list of tax ranks to include the matrix, one column generated per rank
+
+        Return matrix as pandas df
+        """
+        all_families = sorted(set(self.fam_counts['Family']))
+        print(f"The dataset contains {len(all_families)} CAZy families")
+
+        fam_freqs = self.fam_counts.pivot(index='Genome', columns='Family', values='Frequency')
+        fam_freqs = fam_freqs.reindex(index=list(self.genome_table['Genome']), columns=all_families)
+        fam_freqs = fam_freqs.fillna(0).astype(int)
+
+        fam_freq_df = self.genome_table[['Genome'] + list(tax_ranks)].reset_index(drop=True)
+        fam_freq_df = pd.concat([fam_freq_df, fam_freqs.reset_index(drop=True)], axis=1)
+        fam_freq_df.columns.name = None
+
+        return fam_freq_df
+
+
+def build_chunked_cazome(fgp_file, chunk_size):
+    """Read the FGP file in chunks, and summarise the CAZome of each genome.
+
+    The rows of each genome must be listed together in the FGP file (as written by cazomevolve),
+    so that each genome is summarised once all of its rows have been read. Peak memory is set
+    by the chunk size (and the size of the largest CAZome).
+
+    :param fgp_file: str/Path, path to tab delimited FGP file
+    :param chunk_size: int, number of rows to read per chunk
+
+    Return ChunkedCazome, without tax data. Genomes are listed in order of appearance in the FGP file
+    """
+    genome_tables = []
+    fam_counts = []
+    summarised_genomes = set()
+
+    carried_rows = None  # rows of the last genome in a chunk, which may continue in the next chunk
+    reader = pd.read_table(fgp_file, header=None, usecols=[0, 1, 2], dtype=str, chunksize=chunk_size)
+
+    for chunk in tqdm(reader, desc="Summarising chunks of the FGP file"):
+        chunk.columns = FGP_COLUMNS
+        if carried_rows is not None:
+            chunk = pd.concat([carried_rows, chunk], ignore_index=True)
+
+        last_genome = chunk['Genome'].iloc[-1]
+        carried_rows = chunk[chunk['Genome'] == last_genome]
+        complete_rows = chunk[chunk['Genome'] != last_genome]
+
+        if len(complete_rows) != 0:
+            genome_table, genome_fam_counts = summarise_genomes(complete_rows, summarised_genomes)
+            genome_tables.append(genome_table)
+            fam_counts.append(genome_fam_counts)
+
+    if carried_rows is not None:
+        genome_table, genome_fam_counts = summarise_genomes(carried_rows, summarised_genomes)
+        genome_tables.append(genome_table)
+        fam_counts.append(genome_fam_counts)
+
+    if len(genome_tables) == 0:
+        raise ValueError(f"No CAZy family annotations were retrieved from {fgp_file}")
+
+    genome_table = pd.concat(genome_tables, ignore_index=True)
+    class_cols = [col for col in genome_table.columns if col not in ['Genome', 'NumOfProteins', 'NumOfFamilys']]
+    genome_table[class_cols] = genome_table[class_cols].fillna(0).astype(int)
+
+    return ChunkedCazome(genome_table, pd.concat(fam_counts, ignore_index=True))
+
+
+def summarise_genomes(fgp_rows, summarised_genomes):
+    """Summarise the CAZomes of genomes for which all rows have been read from the FGP file
+
+    :param fgp_rows: pandas df, columns ['Family', 'Genome', 'Protein'], all rows of the genomes.
+        Columns may be categoricals, in which case the rows are grouped by the category codes
+    :param summarised_genomes: set of genomes already summarised, the genomes in fgp_rows are added
+
+    Return
+    * pandas df, one row per genome (see ChunkedCazome)
+    * pandas df, columns 'Genome', 'Family' and 'Frequency'
+    """
+    genomes = list(fgp_rows['Genome'].unique())
+    repeated_genomes = summarised_genomes.intersection(genomes)
+    if len(repeated_genomes) != 0:
+        raise ValueError(
+            f"The rows of genomes {sorted(repeated_genomes)} are not listed together in the FGP file.\n"
+            "Sort the FGP file by genome to read it in chunks"
+        )
+    summarised_genomes.update(genomes)
+
+    genome_table = pd.DataFrame({'Genome': genomes}).set_index('Genome', drop=False)
+    genome_table['NumOfProteins'] = fgp_rows.drop_duplicates(['Genome', 'Protein']).groupby('Genome', observed=True).size()
+    genome_table['NumOfFamilys'] = fgp_rows.drop_duplicates(['Genome', 'Family']).groupby('Genome', observed=True).size()
+
+    # number of unique proteins per CAZy class, e.g. 'GH' from 'GH1' and 'CBM' from 'CBM50'
+    class_rows = fgp_rows.assign(CAZyClass=get_cazy_classes(fgp_rows['Family']))
+    class_sizes = class_rows.dropna(subset=['CAZyClass']).drop_duplicates(['Genome', 'CAZyClass', 'Protein'])
+    class_sizes = class_sizes.groupby(['Genome', 'CAZyClass'], observed=True).size().unstack(fill_value=0)
+    class_sizes.index = class_sizes.index.astype(str)
+    class_sizes.columns = class_sizes.columns.astype(str)
+    genome_table = genome_table.join(class_sizes)
+
+    fam_counts = fgp_rows.drop_duplicates(['Genome', 'Family', 'Protein'])
+    fam_counts = fam_counts.groupby(['Genome', 'Family'], sort=False, observed=True).size().reset_index(name='Frequency')
+    fam_counts = fam_counts.astype({'Genome': str, 'Family': str})
+
+    return genome_table.reset_index(drop=True), fam_counts
+
+
+def get_cazy_classes(families):
+    """Retrieve the CAZy class of each CAZy family, e.g. 'GH' from 'GH1' and 'CBM' from 'CBM50'
+
+    For a categorical column, the class is extracted once per category, and mapped to the rows 
+    by the category codes.
+
+    :param families: pandas Series of CAZy families
+
+    Return pandas Series of CAZy classes, NaN if no class was found
+    """
+    if isinstance(families.dtype, pd.CategoricalDtype) is False:
+        return families.str.extract(r'^(\D{2,3})', expand=False)
+
+    class_codes, classes = pd.factorize(
+        pd.Series(families.cat.categories.astype(str)).str.extract(r'^(\D{2,3})', expand=False)
+    )
+    fam_codes = families.cat.codes.to_numpy()
+    row_class_codes = np.where(fam_codes >= 0, class_codes[fam_codes], -1)
+
+    return pd.Series(pd.Categorical.from_codes(row_class_codes, classes), index=families.index)
+
+
+def summarise_fgp_df(fgp_df):
+    """Summarise the CAZome of each genome in a FGP dataframe loaded into memory
+
+    Tax rank columns in the FGP dataframe are added to the genome table.
+
+    :param fgp_df: pandas df, columns ['Family', 'Genome', 'Protein', 'tax1', 'tax2'...]
+
+    Return ChunkedCazome. Genomes are listed in order of appearance in the FGP dataframe
+    """
+    tax_ranks = [col for col in fgp_df.columns if col not in FGP_COLUMNS]
+
+    # categorical columns are grouped by their codes, so the FGP columns are not copied as strings
+    genome_table, fam_counts = summarise_genomes(fgp_df[FGP_COLUMNS], set())
+    class_cols = [col for col in genome_table.columns if col not in ['Genome', 'NumOfProteins', 'NumOfFamilys']]
+    genome_table[class_cols] = genome_table[class_cols].fillna(0).astype(int)
+
+    if len(tax_ranks) != 0:
+        genome_taxs = fgp_df[['Genome'] + tax_ranks].drop_duplicates('Genome').astype(object)
+        genome_taxs['Genome'] = genome_taxs['Genome'].astype(str)
+        genome_table = genome_table.merge(genome_taxs, on='Genome', how='left')
+        other_cols = [col for col in genome_table.columns if col not in ['Genome'] + tax_ranks]
+        genome_table = genome_table[['Genome'] + tax_ranks + other_cols]
+
+    return ChunkedCazome(genome_table, fam_counts)
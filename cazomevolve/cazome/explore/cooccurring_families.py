@@ -40,7 +40,7 @@
 """Functions to identify CAZy families that are always present together"""
 
 
-import logging
+import numpy as np
 import pandas as pd
 
 from copy import copy
@@ -51,6 +51,13 @@ import upsetplot
 
 from tqdm import tqdm
 
+from cazomevolve.cazome.explore.fam_matrix import SparseFamFreqMatrix, to_dense_df
+from cazomevolve.cazome.explore.parse_data import unpack_dataset
+
+
+# number of set bits in each byte value
+BYTE_POPCOUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
 
 #
 # Using a correlation matrix
@@ -60,7 +67,7 @@ def identify_cooccurring_fams_corrM(df, all_families, core_cazome=[], corrM_path
     """Build a correlation matrix of the CAZy fam frequencies to identify co-occurring families
     i.e. CAZy families that are always present together
     
-    :param df: fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
+    :param df: CazomeDataset, or fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
         contain CAZy fam frequency
     :param all_families: set of all CAZy families to be analysed
     :param core_cazome: list of CAZy families in the core cazome, provide no list if you want to
@@ -73,6 +80,7 @@ def identify_cooccurring_fams_corrM(df, all_families, core_cazome=[], corrM_path
     Return set of tuples, one tuple per group of co-occuring families
     and the filled correlation matrix
     """
+    df = to_dense_df(unpack_dataset(df, 'presence_matrix'))
     # convert CAZy fam freq df to binary presence/absence
     binary_fam_df = copy(df)
     
@@ -142,7 +150,7 @@ def calc_cooccuring_fam_freqs(df, all_families, exclude_core_cazome=False, core_
     and fam3 is always present with fam1 {fam1, fam3} then fam2 and fam3 must always
     be present together because both are always present with fam1.
     
-    :param df: fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
+    :param df: CazomeDataset, SparseFamFreqMatrix, or fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
         contain CAZy fam frequency
     :param all_families: set of all CAZy families to be analysed
     :param exclude_core_cazome: whether to exlude the core cazome, default: False - 
@@ -153,34 +161,100 @@ def calc_cooccuring_fam_freqs(df, all_families, exclude_core_cazome=False, core_
     - returns set of frequencies in case different numbers are produced for each inital pair 
     of co-occurring families
     """
-    cooccuring_fams_dict = identify_cooccurring_fam_pairs(df, all_families, exclude_core_cazome=exclude_core_cazome)
-    
+    df = unpack_dataset(df, 'presence_matrix')
+    cooccuring_fams_dict = identify_cooccurring_fam_pairs(
+        df,
+        all_families,
+        exclude_core_cazome=exclude_core_cazome,
+        core_cazome=core_cazome,
+    )
+
+    return merge_cooccurring_fam_pairs(cooccuring_fams_dict)
+
+
+def calc_grouped_cooccuring_fam_freqs(fam_freq_df, group_by, all_families, exclude_core_cazome=False, core_cazome=[]):
+    """Identify groups of CAZy families that are always present together in the genomes of each group 
+    (e.g. each genus), and count in how many genomes the families are present together
+
+    The presence/absence bitsets of the families are built for all groups in one pass over the matrix, 
+    with the genomes of each group packed into their own bytes. The co-occurring families of each group 
+    are then found by bucketing the bitsets of the group, as in calc_cooccuring_fam_freqs.
+
+    :param fam_freq_df: CazomeDataset, SparseFamFreqMatrix (with genome_taxs), or df, rows=genomes,
+        cols=fam freqs and one column per tax rank to group genomes by (e.g. a 'Genus' column)
+    :param group_by: str, tax rank (column) to group genomes by, e.g. 'Genus'
+    :param all_families: set of all CAZy families to be analysed
+    :param exclude_core_cazome: whether to exlude the core cazome, default: False - 
+        include the core CAZome
+    :param core_cazome: list of core CAZome families if to be excluded
+
+    Return dict {grp: {grp_num: {'fams': {co-occurring fams}, 'freqs': {num of genomes}}}}, groups 
+    listed in order of appearance
+    """
+    fam_freq_df = unpack_dataset(fam_freq_df, 'fam_freq_df')
+
+    if isinstance(fam_freq_df, SparseFamFreqMatrix):
+        grp_codes, grps = pd.factorize(fam_freq_df.genome_taxs[group_by], use_na_sentinel=False)
+    else:
+        grp_codes, grps = pd.factorize(fam_freq_df[group_by], use_na_sentinel=False)
+
+    grp_fam_bitsets = get_grouped_fam_presence_bitsets(fam_freq_df, grp_codes, all_families)
+
+    grp_cooccurring_fams = {}  # {grp: {grp_num: {'fams': {fams}, 'freqs': {ints}}}}
+    for grp, fam_bitsets in tqdm(
+        zip(grps, grp_fam_bitsets),
+        desc=f"Identifying co-occurring families per {group_by}",
+        total=len(grps),
+    ):
+        cooccuring_fams_dict = pair_cooccurring_fams(
+            fam_bitsets,
+            exclude_core_cazome=exclude_core_cazome,
+            core_cazome=core_cazome,
+        )
+        grp_cooccurring_fams[grp] = merge_cooccurring_fam_pairs(cooccuring_fams_dict)
+
+    return grp_cooccurring_fams
+
+
+def merge_cooccurring_fam_pairs(cooccuring_fams_dict):
+    """Merge overlapping pairs of co-occurring CAZy families into groups of co-occurring families
+
+    :param cooccuring_fams_dict: dict {str(tuple(fams)): {'fams': tuple(fams), 'freq': int(num of genomes)}}
+
+    Return dict {grp_num: {'fams': {co-occurring fams}, 'freqs': {num of genomes}}
+    """
+    # merge overlapping pairs using a disjoint set (union-find) of families, so each connected 
+    # group of families ends up in one group regardless of the order of the pairs
+    parents = {}  # {fam: parent fam}, families not in the dict are the root of their group
+    grp_sizes = {}  # {root fam: number of fams in the group}
+    for cofams in cooccuring_fams_dict:
+        fams = cooccuring_fams_dict[cofams]['fams']
+        root_0 = find_fam_root(parents, fams[0])
+        root_1 = find_fam_root(parents, fams[1])
+        if root_0 == root_1:
+            continue  # already in the same group
+
+        # attach the smaller group to the larger group
+        if grp_sizes.get(root_0, 1) < grp_sizes.get(root_1, 1):
+            root_0, root_1 = root_1, root_0
+        parents[root_1] = root_0
+        grp_sizes[root_0] = grp_sizes.get(root_0, 1) + grp_sizes.pop(root_1, 1)
+
+    # number the groups in the order their first pair was found
     cooccurring_groups = {}
-    grp_num = 0
-    
-    for cofams in tqdm(cooccuring_fams_dict, desc='Combining pairs of co-occurring families'):
+    root_grp_nums = {}  # {root fam: grp_num}
+    for cofams in cooccuring_fams_dict:
         fams = cooccuring_fams_dict[cofams]['fams']
-        
-        added = False
-        for grp in cooccurring_groups:
-            if fams[0] in cooccurring_groups[grp]['fams']:
-                cooccurring_groups[grp]['fams'].add(fams[1])
-                cooccurring_groups[grp]['freqs'].add(cooccuring_fams_dict[cofams]['freq'])
-                added = True
-
-        if added is False:
-            for grp in cooccurring_groups:
-                if fams[1] in cooccurring_groups[grp]['fams']:
-                    cooccurring_groups[grp]['fams'].add(fams[0])
-                    cooccurring_groups[grp]['freqs'].add(cooccuring_fams_dict[cofams]['freq'])
-                    added = True
+        root = find_fam_root(parents, fams[0])
+        try:
+            grp_num = root_grp_nums[root]
+        except KeyError:
+            grp_num = len(root_grp_nums)
+            root_grp_nums[root] = grp_num
+            cooccurring_groups[grp_num] = {'fams': set(), 'freqs': set()}
 
-        if added is False:
-            cooccurring_groups[grp_num] = {
-                'fams': {fams[0], fams[1]},
-                'freqs': {cooccuring_fams_dict[cofams]['freq']}
-            }
-            grp_num+=1
+        cooccurring_groups[grp_num]['fams'].update(fams)
+        cooccurring_groups[grp_num]['freqs'].add(cooccuring_fams_dict[cofams]['freq'])
 
     for grp in cooccurring_groups:
         if len(cooccurring_groups[grp]['freqs']) > 1:
@@ -189,72 +263,82 @@ def calc_cooccuring_fam_freqs(df, all_families, exclude_core_cazome=False, core_
     return cooccurring_groups
     
     
+def find_fam_root(parents, fam):
+    """Find the root family of the group of co-occurring families containing fam, and point 
+    every family on the path straight at the root (path compression)
+
+    :param parents: dict {fam: parent fam}, families not in the dict are the root of their group
+    :param fam: str, CAZy family
+
+    Return str, root family
+    """
+    root = fam
+    while root in parents:
+        root = parents[root]
+
+    while fam != root:
+        next_fam = parents[fam]
+        parents[fam] = root
+        fam = next_fam
+
+    return root
+
+
 def identify_cooccurring_fam_pairs(df, all_families, exclude_core_cazome=False, core_cazome=[]):
     """Identify pairs of CAZy families that are always present together in the same genome
+
+    Two families are always present together when they are present in exactly the same genomes, 
+    so the presence/absence of each family across the genomes is packed into a bitset, and 
+    families with identical bitsets are bucketed together. The number of genomes containing 
+    each pair is the number of set bits in the bitset.
     
-    :param df: fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
+    :param df: CazomeDataset, SparseFamFreqMatrix, or fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
         contain CAZy fam frequency
     :param all_families: set of all CAZy families to be analysed
     :param exclude_core_cazome: whether to exlude the core cazome, default: False - 
         include the core CAZome
+    :param core_cazome: list of core CAZome families if to be excluded
         
     Return dict {str(tuple(fams)): {'fams': tuple(fams), 'freq': int(num of genomes)}}
     """
-    logger = logging.getLogger(__name__)
+    fam_bitsets = get_fam_presence_bitsets(df, all_families)
+
+    return pair_cooccurring_fams(
+        fam_bitsets,
+        exclude_core_cazome=exclude_core_cazome,
+        core_cazome=core_cazome,
+    )
+
+
+def pair_cooccurring_fams(fam_bitsets, exclude_core_cazome=False, core_cazome=[]):
+    """Identify pairs of CAZy families with identical presence/absence bitsets
+
+    :param fam_bitsets: dict {fam: bytes}, presence/absence bitset of each family present in the genomes
+    :param exclude_core_cazome: whether to exlude the core cazome, default: False - 
+        include the core CAZome
+    :param core_cazome: list of core CAZome families if to be excluded
+
+    Return dict {str(tuple(fams)): {'fams': tuple(fams), 'freq': int(num of genomes)}}
+    """
+    # bucket families that are present in exactly the same genomes
+    bitset_fams = {}  # {bitset: [fams]}
+    for fam, bitset in fam_bitsets.items():
+        try:
+            bitset_fams[bitset].append(fam)
+        except KeyError:
+            bitset_fams[bitset] = [fam]
+
     cooccuring_fams_dict = {}  # {str(tuple(fams)): {'fams': tuple(fams), 'freq': int(num of genomes)}}
-    
-    for current_fam in tqdm(all_families, desc="Identifying pairs of co-occurring families"):
-        other_fams = copy(all_families)
-        other_fams.remove(current_fam)
 
-        current_fam_freqs = list(df[current_fam])
+    for current_fam in fam_bitsets:
+        bitset = fam_bitsets[current_fam]
+        if len(bitset_fams[bitset]) == 1:
+            continue  # no other family is present in the same genomes
 
-        bin_current_freqs = []
-        for value in current_fam_freqs:
-            if value > 1:
-                bin_current_freqs.append(1)
-            else:
-                bin_current_freqs.append(value)
-
-        if 1 not in bin_current_freqs:
-            continue  # fam not in this data set
-
-        for other_fam in other_fams:
-            other_fam_freqs = list(df[other_fam])
-
-            bin_other_freqs = []
-            for value in other_fam_freqs:
-                if value > 1:
-                    bin_other_freqs.append(1)
-                else:
-                    bin_other_freqs.append(value)
-
-            if 1 not in bin_other_freqs:
-                continue  # other_fam not in this data set
-
-            # test that when one is present the other is
-            cooccurring = True
-            for i in range(len(df)):
-                if (current_fam_freqs[i] != 0) and (other_fam_freqs[i] == 0):
-                    cooccurring = False
-                    break
-                elif (current_fam_freqs[i] == 0) and (other_fam_freqs[i] != 0):
-                    cooccurring = False
-                    break
-
-            if cooccurring is False:
-                continue  # on to the next other_fam
-
-            # count_genomes
-            freq = 0
-            for i in range(len(bin_current_freqs)):
-                if (bin_current_freqs[i] == 1) and (bin_other_freqs[i] == 1):
-                    freq += 1
-
-            if freq == 0:
-                continue  # on to the next other_fam
-
-            # check if one family is always absend when the other family is absent
+        freq = count_set_bits(bitset)
+        for other_fam in bitset_fams[bitset]:
+            if other_fam == current_fam:
+                continue
             if exclude_core_cazome:
                 if (current_fam in core_cazome) and (other_fam in core_cazome):
                     continue  # core cazome
@@ -262,21 +346,399 @@ def identify_cooccurring_fam_pairs(df, all_families, exclude_core_cazome=False,
             families = [current_fam, other_fam]
             families.sort()
             families = tuple(families)
-            try:
-                cooccuring_fams_dict[str(families)]
-                if cooccuring_fams_dict[str(families)]['freq'] != freq:
-                    logger.warning(
-                        f'Found {current_fam} and {other_fam} previously with '
-                        f'freq {cooccuring_fams_dict[str(families)]["freq"]}\n'
-                        f'but calculated new freq of {freq}.\n'
-                        'Using original calculated freq'
-                    )
-            except KeyError:
+            if str(families) not in cooccuring_fams_dict:
                 cooccuring_fams_dict[str(families)] = {'fams': families, 'freq': freq}
 
     return cooccuring_fams_dict
 
 
+def get_fam_presence_bitsets(df, all_families):
+    """Pack the presence/absence of each CAZy family across the genomes into a bitset,
+    one bit per genome
+
+    :param df: CazomeDataset, SparseFamFreqMatrix, or fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
+        contain CAZy fam frequency
+    :param all_families: set of all CAZy families to be analysed
+
+    Return dict {fam: bytes}, families listed in the order of all_families. Families that are 
+    absent from the data set are not included
+    """
+    df = unpack_dataset(df, 'presence_matrix')
+    grp_fam_bitsets = get_grouped_fam_presence_bitsets(df, np.zeros(df.shape[0], dtype=int), all_families)
+    if len(grp_fam_bitsets) == 0:
+        return {}  # no genomes
+    return grp_fam_bitsets[0]
+
+
+def get_grouped_fam_presence_bitsets(df, grp_codes, all_families):
+    """Pack the presence/absence of each CAZy family across the genomes of each group into a bitset,
+    one bit per genome, in one pass over the matrix
+
+    The genomes are ordered by group, and the genomes of each group are padded to a whole number 
+    of bytes, so the bitset of each group is a contiguous slice of the packed bytes.
+
+    :param df: SparseFamFreqMatrix, or fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
+        contain CAZy fam frequency
+    :param grp_codes: array of ints, the group (numbered from 0) of each genome (row)
+    :param all_families: set of all CAZy families to be analysed
+
+    Return list of dicts {fam: bytes}, one dict per group code. Families listed in the order of 
+    all_families, and families that are absent from the genomes of the group are not included
+    """
+    if isinstance(df, SparseFamFreqMatrix):
+        fam_columns = {fam: i for i, fam in enumerate(df.families)}
+    else:
+        fam_columns = {fam: i for i, fam in enumerate(df.columns)}
+    families = [fam for fam in dict.fromkeys(all_families) if fam in fam_columns]
+
+    # the position of the bit of each genome, the genomes of each group start at a new byte
+    grp_codes = np.asarray(grp_codes, dtype=np.int64)
+    grp_sizes = np.bincount(grp_codes)
+    grp_byte_ends = np.cumsum((grp_sizes + 7) // 8)
+    grp_byte_starts = grp_byte_ends - (grp_sizes + 7) // 8
+    order = np.argsort(grp_codes, kind='stable')
+    bit_positions = np.empty(len(grp_codes), dtype=np.int64)
+    bit_positions[order] = np.arange(len(grp_codes)) - np.repeat(np.cumsum(grp_sizes) - grp_sizes, grp_sizes)
+    bit_positions += grp_byte_starts[grp_codes] * 8
+    num_of_bits = int(grp_byte_ends[-1]) * 8 if len(grp_sizes) > 0 else 0
+
+    if isinstance(df, SparseFamFreqMatrix):
+        # set the bits of one family at a time, so the dense matrix is never built
+        presence = df.matrix.tocsc()
+        packed_bitsets = np.empty((len(families), num_of_bits // 8), dtype=np.uint8)
+        for i, fam in enumerate(families):
+            col = fam_columns[fam]
+            fam_presence = np.zeros(num_of_bits, dtype=bool)
+            fam_presence[bit_positions[presence.indices[presence.indptr[col]:presence.indptr[col + 1]]]] = True
+            packed_bitsets[i] = np.packbits(fam_presence)
+    else:
+        presence = np.zeros((len(families), num_of_bits), dtype=bool)
+        presence[:, bit_positions] = (df[families].to_numpy() != 0).T
+        packed_bitsets = np.packbits(presence, axis=1)
+
+    grp_fam_bitsets = []  # [{fam: bytes}]
+    for byte_start, byte_end in zip(grp_byte_starts, grp_byte_ends):
+        grp_packed_bitsets = packed_bitsets[:, byte_start:byte_end]
+        present = grp_packed_bitsets.any(axis=1)
+        grp_fam_bitsets.append({
+            fam: grp_packed_bitsets[i].tobytes() for i, fam in enumerate(families) if present[i]
+        })
+
+    return grp_fam_bitsets
+
+
+def count_set_bits(bitset):
+    """Count the number of set bits in a bitset, e.g. the number of genomes containing a family
+
+    :param bitset: bytes
+
+    Return int
+    """
+    return int(BYTE_POPCOUNTS[np.frombuffer(bitset, dtype=np.uint8)].sum(dtype=np.int64))
+
+
+#
+# Approximate near co-occurrence, using MinHash and locality sensitive hashing (LSH)
+# to find families that are present together in most, but not necessarily all, genomes
+#
+
+def identify_near_cooccurring_fam_pairs(df, all_families, threshold=0.9, num_perm=128, bands=None, seed=1):
+    """Identify pairs of CAZy families that are (nearly) always present together, i.e. the Jaccard 
+    similarity of the sets of genomes containing each family is at least the threshold
+
+    Families present in exactly the same genomes are bucketed together (as in 
+    identify_cooccurring_fam_pairs). The set of genomes containing each bucket of families is 
+    sketched using MinHash, and candidate pairs are found using LSH banding of the sketches, so 
+    not all pairs of families are compared. The Jaccard similarity of every candidate pair is 
+    then calculated exactly from the bitsets, so no pair below the threshold is returned.
+
+    :param df: CazomeDataset, SparseFamFreqMatrix, or fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
+        contain CAZy fam frequency
+    :param all_families: set of all CAZy families to be analysed
+    :param threshold: float, min Jaccard similarity (0-1] of the genomes containing each family
+    :param num_perm: int, number of permutations (hash functions) in each MinHash sketch
+    :param bands: int, number of LSH bands, must be a divisor of num_perm. If None, chosen 
+        using get_lsh_bands
+    :param seed: int, seed for the random permutations
+
+    Return dict {str(tuple(fams)): {'fams': tuple(fams), 'freq': int(num of genomes containing both), 
+        'jaccard': float}}
+    """
+    bitset_fams, packed_bitsets, pairs_i, pairs_j, num_shared, num_any = find_near_cooccurring_bitsets(
+        get_fam_presence_bitsets(df, all_families),
+        threshold=threshold,
+        num_perm=num_perm,
+        bands=bands,
+        seed=seed,
+    )
+
+    near_cooccurring_pairs = []  # [(fam, fam, freq, jaccard)]
+    # families present in exactly the same genomes
+    fam_sizes = count_packed_set_bits(packed_bitsets)
+    for fams, fam_size in zip(bitset_fams, fam_sizes):
+        for i in range(len(fams)):
+            for j in range(i + 1, len(fams)):
+                near_cooccurring_pairs.append((fams[i], fams[j], int(fam_size), 1.0))
+    # families present in similar sets of genomes
+    for i, j, shared, any_fam in zip(pairs_i, pairs_j, num_shared, num_any):
+        for fam_i in bitset_fams[i]:
+            for fam_j in bitset_fams[j]:
+                near_cooccurring_pairs.append((fam_i, fam_j, int(shared), shared / any_fam))
+
+    near_cooccurring_fams_dict = {}  # {str(tuple(fams)): {'fams': tuple(fams), 'freq': int, 'jaccard': float}}
+    for fam_i, fam_j, freq, jaccard in near_cooccurring_pairs:
+        families = [fam_i, fam_j]
+        families.sort()
+        families = tuple(families)
+        near_cooccurring_fams_dict[str(families)] = {'fams': families, 'freq': freq, 'jaccard': jaccard}
+
+    return near_cooccurring_fams_dict
+
+
+def calc_near_cooccurring_fam_modules(df, all_families, threshold=0.9, num_perm=128, bands=None, seed=1):
+    """Identify modules of CAZy families that are (nearly) always present together, and count the 
+    number of genomes supporting each module
+
+    Pairs of families with a Jaccard similarity of at least the threshold (see 
+    identify_near_cooccurring_fam_pairs) are merged into modules using a disjoint set (union-find), 
+    so every family in a module is linked to another family in the module by a pair above the threshold.
+
+    :param df: CazomeDataset, SparseFamFreqMatrix, or fam freq df, pandas df, columns are CAZy families, rows are genomes, cells 
+        contain CAZy fam frequency
+    :param all_families: set of all CAZy families to be analysed
+    :param threshold: float, min Jaccard similarity (0-1] of the genomes containing each family
+    :param num_perm: int, number of permutations (hash functions) in each MinHash sketch
+    :param bands: int, number of LSH bands, must be a divisor of num_perm. If None, chosen 
+        using get_lsh_bands
+    :param seed: int, seed for the random permutations
+
+    Return dict {module_num: {'fams': {fams}, 'support': int(num of genomes containing all fams), 
+        'genomes': int(num of genomes containing at least one fam)}}, modules numbered in the 
+        order of all_families
+    """
+    return merge_near_cooccurring_bitsets(
+        get_fam_presence_bitsets(df, all_families),
+        threshold=threshold,
+        num_perm=num_perm,
+        bands=bands,
+        seed=seed,
+    )
+
+
+def merge_near_cooccurring_bitsets(fam_bitsets, threshold=0.9, num_perm=128, bands=None, seed=1):
+    """Merge the families with (nearly) identical presence/absence bitsets into modules, and count 
+    the number of genomes supporting each module
+
+    :param fam_bitsets: dict {fam: bytes}, presence/absence bitset of each family present in the genomes
+    :param threshold: float, min Jaccard similarity (0-1] of the genomes containing each family
+    :param num_perm: int, number of permutations (hash functions) in each MinHash sketch
+    :param bands: int, number of LSH bands, must be a divisor of num_perm. If None, chosen 
+        using get_lsh_bands
+    :param seed: int, seed for the random permutations
+
+    Return dict {module_num: {'fams': {fams}, 'support': int(num of genomes containing all fams), 
+        'genomes': int(num of genomes containing at least one fam)}}, modules numbered in the 
+        order of fam_bitsets
+    """
+    bitset_fams, packed_bitsets, pairs_i, pairs_j, num_shared, num_any = find_near_cooccurring_bitsets(
+        fam_bitsets,
+        threshold=threshold,
+        num_perm=num_perm,
+        bands=bands,
+        seed=seed,
+    )
+
+    # merge the pairs of bitsets using a disjoint set (union-find)
+    parents = {}  # {bitset index: parent bitset index}
+    for i, j in zip(pairs_i, pairs_j):
+        root_i = find_fam_root(parents, int(i))
+        root_j = find_fam_root(parents, int(j))
+        if root_i != root_j:
+            parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    module_bitsets = {}  # {root bitset index: [bitset indexes]}
+    for i in range(len(bitset_fams)):
+        try:
+            module_bitsets[find_fam_root(parents, i)].append(i)
+        except KeyError:
+            module_bitsets[find_fam_root(parents, i)] = [i]
+
+    near_cooccurring_modules = {}
+    for members in module_bitsets.values():
+        fams = [fam for i in members for fam in bitset_fams[i]]
+        if len(fams) == 1:
+            continue  # no other family is present in nearly the same genomes
+
+        near_cooccurring_modules[len(near_cooccurring_modules)] = {
+            'fams': set(fams),
+            'support': int(count_packed_set_bits(np.bitwise_and.reduce(packed_bitsets[members], axis=0))),
+            'genomes': int(count_packed_set_bits(np.bitwise_or.reduce(packed_bitsets[members], axis=0))),
+        }
+
+    return near_cooccurring_modules
+
+
+def find_near_cooccurring_bitsets(fam_bitsets, threshold=0.9, num_perm=128, bands=None, seed=1):
+    """Find pairs of distinct presence/absence bitsets with a Jaccard similarity of at least the threshold
+
+    :param fam_bitsets: dict {fam: bytes}, presence/absence bitset of each family present in the genomes
+    :param threshold: float, min Jaccard similarity (0-1]
+    :param num_perm: int, number of permutations (hash functions) in each MinHash sketch
+    :param bands: int, number of LSH bands. If None, chosen using get_lsh_bands
+    :param seed: int, seed for the random permutations
+
+    Return list of lists of families, one list per distinct bitset (in the order of fam_bitsets)
+        2D np array of the packed bitsets, one row per distinct bitset
+        and np arrays of the indexes (i < j) of the bitsets in each pair, the number of genomes 
+        containing both families and the number of genomes containing either family
+    """
+    if (threshold <= 0) or (threshold > 1):
+        raise ValueError(f"The Jaccard similarity threshold must be in the range (0, 1], not {threshold}")
+    if bands is None:
+        bands = get_lsh_bands(num_perm, threshold)
+    if num_perm % bands != 0:
+        raise ValueError(f"The number of LSH bands ({bands}) must be a divisor of num_perm ({num_perm})")
+
+    # bucket families that are present in exactly the same genomes
+    bitset_fams = {}  # {bitset: [fams]}
+    for fam, bitset in fam_bitsets.items():
+        try:
+            bitset_fams[bitset].append(fam)
+        except KeyError:
+            bitset_fams[bitset] = [fam]
+
+    empty_pairs = np.zeros(0, dtype=np.int64)
+    if len(bitset_fams) == 0:
+        return [], np.zeros((0, 0), dtype=np.uint8), empty_pairs, empty_pairs, empty_pairs, empty_pairs
+
+    packed_bitsets = np.frombuffer(b''.join(bitset_fams), dtype=np.uint8).reshape(len(bitset_fams), -1)
+    bitset_fams = list(bitset_fams.values())
+
+    signatures = calc_minhash_signatures(packed_bitsets, num_perm=num_perm, seed=seed)
+    pairs_i, pairs_j = find_lsh_candidate_pairs(signatures, bands)
+
+    # verify each candidate pair exactly
+    num_shared, num_any = calc_bitset_overlaps(packed_bitsets, pairs_i, pairs_j)
+    similar = num_shared >= threshold * num_any
+
+    return bitset_fams, packed_bitsets, pairs_i[similar], pairs_j[similar], num_shared[similar], num_any[similar]
+
+
+def get_lsh_bands(num_perm, threshold, min_recall=0.95):
+    """Choose the number of LSH bands for a Jaccard similarity threshold
+
+    A pair with Jaccard similarity s is a candidate with probability 1 - (1 - s^r)^b, for b bands 
+    of r rows. The number of bands with the most rows per band (i.e. the fewest false candidates)
+    for which a pair at the threshold is a candidate with a probability of at least min_recall
+    is chosen.
+
+    :param num_perm: int, number of permutations (hash functions) in each MinHash sketch
+    :param threshold: float, min Jaccard similarity
+    :param min_recall: float, min probability of a pair at the threshold being a candidate
+
+    Return int, number of bands
+    """
+    for rows in range(num_perm, 0, -1):
+        if num_perm % rows != 0:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= min_recall:
+            return bands
+    return num_perm
+
+
+def calc_minhash_signatures(packed_bitsets, num_perm=128, seed=1):
+    """Sketch the set of genomes containing each family using MinHash
+
+    The genomes are randomly permuted num_perm times, and the signature of a family is the lowest 
+    rank of the genomes containing the family in each permutation.
+
+    :param packed_bitsets: 2D np array of uint8, one row of packed presence/absence bits per family
+    :param num_perm: int, number of permutations
+    :param seed: int, seed for the random permutations
+
+    Return 2D np array of uint32, one row per family, one column per permutation
+    """
+    rng = np.random.default_rng(seed)
+    num_of_bits = packed_bitsets.shape[1] * 8
+
+    # the rank of each genome in each permutation, one row per genome
+    genome_ranks = np.empty((num_of_bits, num_perm), dtype=np.uint32)
+    for perm in range(num_perm):
+        genome_ranks[:, perm] = rng.permutation(num_of_bits)
+
+    signatures = np.empty((len(packed_bitsets), num_perm), dtype=np.uint32)
+    for i in tqdm(range(len(packed_bitsets)), desc="Building MinHash signatures"):
+        genomes = np.flatnonzero(np.unpackbits(packed_bitsets[i]))
+        signatures[i] = genome_ranks[genomes].min(axis=0)
+
+    return signatures
+
+
+def find_lsh_candidate_pairs(signatures, bands):
+    """Find candidate pairs of similar signatures using LSH banding: the signatures are split 
+    into bands, and rows that are identical in at least one band are candidates
+
+    :param signatures: 2D np array, one MinHash signature per row
+    :param bands: int, number of bands, must be a divisor of the signature length
+
+    Return two np arrays of ints, indexes of the rows (i < j) of each candidate pair
+    """
+    rows_per_band = signatures.shape[1] // bands
+
+    candidate_pairs = set()  # {(i, j)}
+    for band in range(bands):
+        band_signatures = np.ascontiguousarray(signatures[:, band * rows_per_band:(band + 1) * rows_per_band])
+
+        buckets = {}  # {band signature: [row indexes]}
+        for i, band_signature in enumerate(band_signatures):
+            try:
+                buckets[band_signature.tobytes()].append(i)
+            except KeyError:
+                buckets[band_signature.tobytes()] = [i]
+
+        for rows in buckets.values():
+            for i in range(len(rows)):
+                for j in range(i + 1, len(rows)):
+                    candidate_pairs.add((rows[i], rows[j]))
+
+    candidate_pairs = np.array(sorted(candidate_pairs), dtype=np.int64).reshape(-1, 2)
+    return candidate_pairs[:, 0], candidate_pairs[:, 1]
+
+
+def calc_bitset_overlaps(packed_bitsets, pairs_i, pairs_j, chunk_size=1024):
+    """Count the genomes containing both, and either, of the families in each pair, from the popcounts 
+    of the AND and OR of their bitsets
+
+    :param packed_bitsets: 2D np array of uint8, one row of packed presence/absence bits per family
+    :param pairs_i: np array of ints, index of the first family of each pair
+    :param pairs_j: np array of ints, index of the second family of each pair
+    :param chunk_size: int, number of pairs to compare at a time
+
+    Return two np arrays of ints, number of genomes containing both families, and containing either family
+    """
+    num_shared = np.empty(len(pairs_i), dtype=np.int64)
+    num_any = np.empty(len(pairs_i), dtype=np.int64)
+    for start in range(0, len(pairs_i), chunk_size):
+        end = start + chunk_size
+        bitsets_i = packed_bitsets[pairs_i[start:end]]
+        bitsets_j = packed_bitsets[pairs_j[start:end]]
+        num_shared[start:end] = count_packed_set_bits(bitsets_i & bitsets_j)
+        num_any[start:end] = count_packed_set_bits(bitsets_i | bitsets_j)
+
+    return num_shared, num_any
+
+
+def count_packed_set_bits(packed_bitsets):
+    """Count the number of set bits in each row of packed bits
+
+    :param packed_bitsets: np array of uint8, packed bits along the last axis
+
+    Return np array of ints (or an int for a 1D array)
+    """
+    return BYTE_POPCOUNTS[packed_bitsets].sum(axis=-1, dtype=np.int64)
+
+
 #
 # Build upset plots
 #
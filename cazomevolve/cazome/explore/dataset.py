@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Hold the CAZome data set, and lazily build and cache the matrices derived from it"""
+
+
+import pandas as pd
+
+from functools import cached_property
+
+from cazomevolve.cazome.explore.cazy_families import build_fam_freq_df
+from cazomevolve.cazome.explore.fam_matrix import SparseFamFreqMatrix
+
+
+class CazomeDataset:
+    """The CAZy family annotations of a set of genomes, and the matrices derived from them.
+
+    The derived matrices (e.g. the family frequency matrix and its presence/absence version) are
+    only built when first accessed, and are then cached. The caches are cleared when genomes are
+    added to or filtered from the data set.
+
+    All explore functions accept a CazomeDataset in place of the dataframe they analyse.
+    The dataframes returned by the dataset are shared between calls, copy them before editing.
+    """
+
+    _cached_attributes = (
+        'genomes',
+        'families',
+        'fam_freq_df',
+        'fam_freq_matrix',
+        'presence_matrix',
+        'sparse_fam_freq_matrix',
+    )
+
+    def __init__(self, fgp_df, tax_ranks):
+        """Build a data set
+
+        :param fgp_df: pandas df, columns ['Family', 'Genome', 'Protein', 'tax1', 'tax2'...]
+        :param tax_ranks: list of tax ranks to include in the family frequency matrices.
+            Must match columns names in fgp_df, e.g. ['Genus', 'Species']
+        """
+        self._fgp_df = fgp_df.reset_index(drop=True)
+        self.tax_ranks = list(tax_ranks)
+        self._grouped_fam_freq_matrices = {}  # {grp: df}
+        self._group_fam_freq_dfs = {}  # {grp: {grp_name: df}}
+
+    def __len__(self):
+        return len(self.genomes)
+
+    def __repr__(self):
+        return (
+            f"CazomeDataset({len(self.genomes)} genomes, {len(self.families)} CAZy families, "
+            f"tax ranks {self.tax_ranks})"
+        )
+
+    @property
+    def fgp_df(self):
+        """pandas df of cazy family, genome, protein id, and one col per tax rank"""
+        return self._fgp_df
+
+    @cached_property
+    def genomes(self):
+        """List of genomes, in the order they are listed in the fgp_df"""
+        return list(self._fgp_df['Genome'].unique())
+
+    @cached_property
+    def families(self):
+        """Sorted list of CAZy families in the data set"""
+        return sorted(set(self._fgp_df['Family']))
+
+    @cached_property
+    def fam_freq_df(self):
+        """Family frequency df, one row per genome, with a 'Genome' column, one column per 
+        tax rank and one column per CAZy family"""
+        return build_fam_freq_df(self._fgp_df, self.tax_ranks)
+
+    @cached_property
+    def fam_freq_matrix(self):
+        """Family frequency matrix, the genome and tax ranks are the row index, and each 
+        column is a CAZy family"""
+        return self.fam_freq_df.set_index(['Genome'] + self.tax_ranks)
+
+    @cached_property
+    def presence_matrix(self):
+        """Family presence (1) / absence (0) matrix, indexed as fam_freq_matrix"""
+        return (self.fam_freq_matrix > 0).astype(int)
+
+    @cached_property
+    def sparse_fam_freq_matrix(self):
+        """SparseFamFreqMatrix of family frequencies, rows labelled by genome and tax ranks.
+        Built directly from the fgp_df, without building the dense family frequency df"""
+        return SparseFamFreqMatrix.from_fgp_df(self._fgp_df, self.tax_ranks)
+
+    def get_grouped_fam_freq_matrix(self, grp):
+        """Family frequency matrix with the genome as the row index, one column per CAZy family
+        and one column listing the tax rank used to group genomes (e.g. the 'Genus' column)
+
+        :param grp: str, tax rank to group genomes by, e.g. 'Genus'
+
+        Return pandas df
+        """
+        try:
+            return self._grouped_fam_freq_matrices[grp]
+        except KeyError:
+            pass
+
+        other_ranks = [rank for rank in self.tax_ranks if rank != grp]
+        grouped_df = self.fam_freq_df.drop(other_ranks, axis=1).set_index('Genome')
+        # list the group after the families
+        grouped_df = grouped_df[self.families + [grp]]
+
+        self._grouped_fam_freq_matrices[grp] = grouped_df
+        return grouped_df
+
+    def get_group_fam_freq_dfs(self, grp):
+        """Split the family frequency df by group
+
+        :param grp: str, tax rank to group genomes by, e.g. 'Genus'
+
+        Return dict {group: fam freq df of genomes in the group}
+        """
+        try:
+            return self._group_fam_freq_dfs[grp]
+        except KeyError:
+            pass
+
+        group_dfs = {}
+        for grp_name, grp_df in self.fam_freq_df.groupby(grp, observed=True, sort=False):
+            group_dfs[grp_name] = grp_df
+
+        self._group_fam_freq_dfs[grp] = group_dfs
+        return group_dfs
+
+    def add_genomes(self, fgp_df):
+        """Add the annotations of new genomes to the data set, and clear the cached matrices
+
+        Genomes already in the data set are not added again.
+
+        :param fgp_df: pandas df, columns ['Family', 'Genome', 'Protein', 'tax1', 'tax2'...]
+
+        Return nothing
+        """
+        existing_genomes = set(self.genomes).intersection(fgp_df['Genome'])
+        if len(existing_genomes) != 0:
+            print(
+                f"{len(existing_genomes)} genomes are already in the data set and will not be added again:\n"
+                f"{sorted(existing_genomes)}"
+            )
+            fgp_df = fgp_df[~fgp_df['Genome'].isin(existing_genomes)]
+
+        categorical_cols = [
+            col for col in self._fgp_df.columns
+            if isinstance(self._fgp_df[col].dtype, pd.CategoricalDtype)
+        ]
+        new_fgp_df = pd.concat([self._fgp_df, fgp_df], ignore_index=True)
+        for col in categorical_cols:
+            new_fgp_df[col] = new_fgp_df[col].astype('category')
+
+        self._fgp_df = new_fgp_df
+        self.clear_cache()
+
+    def filter_genomes(self, genomes):
+        """Only retain the listed genomes in the data set, and clear the cached matrices
+
+        :param genomes: list/set of genomic accessions to retain
+
+        Return nothing
+        """
+        self._fgp_df = self._fgp_df[self._fgp_df['Genome'].isin(genomes)].reset_index(drop=True)
+        for col in self._fgp_df.columns:
+            if isinstance(self._fgp_df[col].dtype, pd.CategoricalDtype):
+                self._fgp_df[col] = self._fgp_df[col].cat.remove_unused_categories()
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Clear all cached matrices, so they are rebuilt from the fgp_df when next used"""
+        for attribute in self._cached_attributes:
+            self.__dict__.pop(attribute, None)
+        self._grouped_fam_freq_matrices = {}
+        self._group_fam_freq_dfs = {}
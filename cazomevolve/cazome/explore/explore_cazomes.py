@@ -50,6 +50,7 @@ import pandas as pd
 import sys
 
 from copy import copy
+from pathlib import Path
 from typing import List, Optional
 from saintBioutils.utilities.file_io import make_output_directory
 
@@ -59,7 +60,11 @@ from cazomevolve.cazome.explore.parse_data import (
     load_tax_data,
     add_tax_data_from_tax_df,
     add_tax_column_from_row_index,
+    unpack_dataset,
 )
+from cazomevolve.cazome.explore.chunked import ChunkedCazome, build_chunked_cazome, summarise_fgp_df
+from cazomevolve.cazome.explore.dataset import CazomeDataset
+from cazomevolve.cazome.explore.incremental import STATE_FILE, CazomeState
 
 # functions for exploring the sizes of CAZomes
 from cazomevolve.cazome.explore.cazome_sizes import (
@@ -77,14 +82,21 @@ from cazomevolve.cazome.explore.cazy_families import (
     build_fam_freq_df,
     build_row_colours,
     build_family_clustermap,
+    build_group_mean_fam_freq_df,
+    calc_clustermap_linkages,
     identify_core_cazome,
     build_fam_mean_freq_df,
     get_group_specific_fams,
+    calc_fam_prevalence,
+    get_group_core_cazomes,
 )
 
 # functions to identify and explore CAZy families that are always present together
 from cazomevolve.cazome.explore.cooccurring_families import (
     calc_cooccuring_fam_freqs,
+    calc_grouped_cooccuring_fam_freqs,
+    calc_near_cooccurring_fam_modules,
+    merge_near_cooccurring_bitsets,
     add_to_upsetplot_membership,
     build_upsetplot,
     get_upsetplot_grps,
@@ -101,9 +113,13 @@ from cazomevolve.cazome.explore.pca import (
     plot_loadings,
 )
 from cazomevolve import closing_message
+from cazomevolve.utilities.caching import get_cache_path, load_cached_df, write_cached_df
 
 
 def main(args: Optional[List[str]] = None, logger: Optional[logging.Logger] = None):
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
     # make parent output directory
     if str(args.output_dir.parent) != ".":
         make_output_directory(args.output_dir, args.force, args.nodelete)
@@ -128,23 +144,59 @@ def main(args: Optional[List[str]] = None, logger: Optional[logging.Logger] = No
         logger.warning("Must specify at least one rank of lineage. These are the taxonomic ranks listed in the Taxonomy CSV file")
         sys.exit(1)
 
-    fgp_df = load_data(args)
+    ranks = get_group_by_ranks(args)
+
+    if args.update:
+        # add the new genomes to the running statistics of the saved data set of each rank
+        states = update_state(args)
+        cazome, dataset = None, None
+
+    elif args.chunk_size is None:
+        fgp_df = load_data(args)
+
+        # build the derived matrices once, and share them between the analyses and ranks
+        dataset = CazomeDataset(fgp_df, ranks)
+        # summarise each genome once, and aggregate the summaries at each rank
+        cazome = summarise_fgp_df(fgp_df)
+
+    else:
+        # summarise each genome while reading the FGP file in chunks
+        dataset = load_chunked_data(args)
+        cazome = dataset
+
+    if (args.state_dir is not None) and (args.update is False):
+        save_state(cazome, args)
 
-    compare_cazome_sizes(fgp_df, args)
+    for rank in ranks:
+        rank_args = get_rank_args(args, rank)
+        if len(ranks) > 1:
+            logger.warning(f"Comparing CAZomes grouped by {rank}, writing output to {rank_args.output_dir}")
+            make_output_directory(rank_args.output_dir, force=True, nodelete=True)
 
-    compare_cazy_classes(fgp_df, args)
+        if args.update:
+            cazome = dataset = states[rank]
 
-    fam_freq_df, fam_freq_df_ggs, all_families = compare_cazy_families(fgp_df, args)
+        compare_cazome_sizes(cazome, rank_args)
 
-    compare_core_cazomes(fam_freq_df, fam_freq_df_ggs, all_families, args)
+        compare_cazy_classes(cazome, rank_args)
 
-    find_always_cooccurring_families(fam_freq_df, fam_freq_df_ggs, all_families, args)
+        fam_freq_df, fam_freq_df_ggs, all_families = compare_cazy_families(dataset, rank_args)
+
+        state = dataset if isinstance(dataset, CazomeState) else None
+
+        compare_core_cazomes(fam_freq_df, fam_freq_df_ggs, all_families, rank_args, state=state)
+
+        find_always_cooccurring_families(fam_freq_df, fam_freq_df_ggs, all_families, rank_args, state=state)
 
     closing_message('Explore CAZomes', args)
 
 
 def load_data(args):
     """Load in all data required for the analysis
+
+    The merged dataframe is cached as a Feather file next to the FGP file, keyed by the hashes of 
+    the FGP file and the tax CSV file, and the selected tax ranks. Later runs memory map the cached 
+    file instead of parsing and merging the input files, unless args.no_cache is True.
     
     :param args: CLI args parser
 
@@ -152,12 +204,59 @@ def load_data(args):
     """
     logger = logging.getLogger(__name__)
 
-    # Load cazy family annotations
-    fgp_df = load_fgp_data(args.fgp_file)
+    rank_flags = {
+        'kingdom': args.kingdom,
+        'phylum': args.phylum,
+        'tax_class': args.tax_class,
+        'tax_order': args.tax_order,
+        'tax_family': args.tax_family,
+        'genus': args.genus,
+        'species': args.species,
+    }
+
+    fgp_df = None
+    if args.no_cache is False:
+        cache_path = get_cache_path(
+            [Path(args.fgp_file), Path(args.tax_csv_path)],
+            [f"{rank}={flag}" for rank, flag in rank_flags.items()],
+        )
+        fgp_df = load_cached_df(cache_path)
+
+    if fgp_df is None:
+        # Load cazy family annotations
+        fgp_df = load_fgp_data(args.fgp_file)
+
+        # load tax data
+        tax_df = load_tax_data(args.tax_csv_path, **rank_flags)
+
+        # compile data into a single dataframe
+        fgp_df = add_tax_data_from_tax_df(fgp_df, tax_df, **rank_flags)
+
+        if args.no_cache is False:
+            write_cached_df(fgp_df, cache_path)
+
     logger.warning(
         f"Total CAZymes (i.e. the number of unique protein IDs): {len(set(fgp_df['Protein']))}"
     )
 
+    return fgp_df
+
+
+def load_chunked_data(args):
+    """Read the FGP file in chunks, summarising the CAZome of each genome, and add the tax data
+
+    :param args: CLI args parser
+
+    Return ChunkedCazome
+    """
+    logger = logging.getLogger(__name__)
+
+    chunked_cazome = build_chunked_cazome(args.fgp_file, args.chunk_size)
+    logger.warning(
+        "Total CAZymes (i.e. the number of unique protein IDs per genome, summed across genomes): "
+        f"{chunked_cazome.genome_table['NumOfProteins'].sum()}"
+    )
+
     # load tax data
     tax_df = load_tax_data(
         args.tax_csv_path,
@@ -170,15 +269,131 @@ def load_data(args):
         species=args.species,
     )
 
-    # compile data into a single dataframe
-    fgp_df = add_tax_data_from_tax_df(
-        fgp_df,
+    chunked_cazome.genome_table = add_tax_data_from_tax_df(
+        chunked_cazome.genome_table,
         tax_df,
-        genus=True,
-        species=True,
+        kingdom=args.kingdom,
+        phylum=args.phylum,
+        tax_class=args.tax_class,
+        tax_order=args.tax_order,
+        tax_family=args.tax_family,
+        genus=args.genus,
+        species=args.species,
     )
 
-    return fgp_df
+    return chunked_cazome
+
+
+def get_group_by_ranks(args):
+    """Retrieve the tax ranks to group genomes by
+
+    :param args: CLI args parser
+
+    Return list of tax ranks
+    """
+    if isinstance(args.group_by, str):
+        return [args.group_by]
+    return list(args.group_by)
+
+
+def get_rank_args(args, rank):
+    """Build the args to analyse the data set grouped by one tax rank
+
+    When grouping genomes by multiple ranks, the output (and saved data set) of each rank 
+    is written to a subdirectory named after the rank.
+
+    :param args: CLI args parser
+    :param rank: str, tax rank to group genomes by
+
+    Return copy of args, with group_by set to the rank
+    """
+    rank_args = copy(args)
+    rank_args.group_by = rank
+
+    if len(get_group_by_ranks(args)) > 1:
+        rank_args.output_dir = args.output_dir / rank
+        if args.state_dir is not None:
+            rank_args.state_dir = args.state_dir / rank
+
+    return rank_args
+
+
+def load_state(args):
+    """Load the data set saved in the state dir, checking it is grouped by args.group_by
+
+    :param args: CLI args parser, with group_by set to a single tax rank
+
+    Return CazomeState
+    """
+    logger = logging.getLogger(__name__)
+
+    if (args.state_dir is None) or ((args.state_dir / STATE_FILE).exists() is False):
+        logger.warning(
+            "No saved data set found. To use --update, provide the --state_dir of a previous run of explore_cazomes"
+        )
+        sys.exit(1)
+
+    state = CazomeState.load(args.state_dir)
+    if state.group_by != args.group_by:
+        logger.warning(
+            f"The saved data set is grouped by {state.group_by}, but --group_by is {args.group_by}\n"
+            f"Use --group_by {state.group_by} to update the saved data set"
+        )
+        sys.exit(1)
+    logger.warning(f"Loaded saved data set of {len(state)} genomes from {args.state_dir}")
+
+    return state
+
+
+def update_state(args):
+    """Load the data set saved in the state dir for each rank, and add the genomes in the FGP file
+
+    The new genomes are summarised once, and added to the data set of every rank.
+
+    :param args: CLI args parser
+
+    Return dict {rank: CazomeState}
+    """
+    logger = logging.getLogger(__name__)
+
+    # check all saved data sets before adding genomes to any of them
+    states = {}
+    for rank in get_group_by_ranks(args):
+        states[rank] = load_state(get_rank_args(args, rank))
+
+    if args.chunk_size is None:
+        new_cazome = summarise_fgp_df(load_data(args))
+    else:
+        new_cazome = load_chunked_data(args)
+
+    for state in states.values():
+        num_of_genomes = state.add_genomes(new_cazome)
+        state.save()
+        logger.warning(f"Added {num_of_genomes} genomes to the saved data set in {state.state_dir}")
+
+    return states
+
+
+def save_state(dataset, args):
+    """Save the summaries of the genomes and the running statistics per group, so that
+    genomes can be added in later runs using --update
+
+    :param dataset: CazomeDataset or ChunkedCazome
+    :param args: CLI args parser
+    """
+    logger = logging.getLogger(__name__)
+
+    if isinstance(dataset, ChunkedCazome) is False:
+        dataset = summarise_fgp_df(unpack_dataset(dataset, 'fgp_df'))
+
+    for rank in get_group_by_ranks(args):
+        rank_args = get_rank_args(args, rank)
+
+        state = CazomeState(rank_args.state_dir, rank)
+        state.add_genomes(dataset)
+        state.save()
+
+        logger.warning(f"Saved the data set of {len(state)} genomes to {rank_args.state_dir}")
 
 
 def compare_cazome_sizes(fgp_df, args):
@@ -190,7 +405,7 @@ def compare_cazome_sizes(fgp_df, args):
 
     The number of CAZymes is the number of unique protein IDs
 
-    :param fgp_df: pandas df of cazy family, genome, protein id, and one col per tax rank
+    :param fgp_df: CazomeDataset, ChunkedCazome, CazomeState, or pandas df of cazy family, genome, protein id, and one col per tax rank
     :param args: CLI args parser
     """
     logger = logging.getLogger(__name__)
@@ -198,7 +413,23 @@ def compare_cazome_sizes(fgp_df, args):
     make_output_directory(outdir, force=True, nodelete=True)
     outpath = outdir / "cazome_sizes.csv"
 
-    logger.warning(f"Examining {len(set(fgp_df['Genome']))} genomes")
+    if isinstance(fgp_df, CazomeState):
+        logger.warning(f"Examining {len(fgp_df)} genomes")
+        # summarise from the running statistics, the proteomes of the saved genomes are not recounted
+        if args.proteome_dir is not None:
+            logger.warning("The percentage of the proteome represented by the CAZome is not calculated with --update")
+        all_df = pd.concat(fgp_df.get_cazome_size_dfs(round_by=args.round_by), axis=1, join='inner')
+        logger.warning(
+            f"Writing out dataframe summarising CAZome sizes (with means and SD per {args.group_by})\n"
+            f"to: {outpath}"
+        )
+        all_df.to_csv(outpath)
+        return
+
+    if isinstance(fgp_df, ChunkedCazome):
+        logger.warning(f"Examining {len(fgp_df)} genomes")
+    else:
+        logger.warning(f"Examining {len(set(unpack_dataset(fgp_df, 'fgp_df')['Genome']))} genomes")
 
     # count number of CAZymes
     cazome_sizes_dict, cazome_sizes_df = count_items_in_cazome(
@@ -259,7 +490,7 @@ def compare_cazy_classes(fgp_df, args):
     Compare the number of CAZymes (i.e. unique protein IDs) per CAZy class 
     and the percentage of the CAZome encapsulated by each CAZy class.
     
-    :param fgp_df: pandas df of cazy family, genome, protein id, and one col per tax rank
+    :param fgp_df: CazomeDataset, ChunkedCazome, CazomeState, or pandas df of cazy family, genome, protein id, and one col per tax rank
     :param args: CLI args parser
     """
     logger = logging.getLogger(__name__)
@@ -267,11 +498,14 @@ def compare_cazy_classes(fgp_df, args):
     make_output_directory(outdir, force=True, nodelete=True)
     outpath = outdir / "cazy_classes.csv"
 
-    class_df, class_size_dict = calculate_class_sizes(
-        fgp_df,
-        args.group_by,
-        round_by=args.round_by,
-    )
+    if isinstance(fgp_df, CazomeState):
+        class_df = fgp_df.get_class_df(round_by=args.round_by)
+    else:
+        class_df, class_size_dict = calculate_class_sizes(
+            fgp_df,
+            args.group_by,
+            round_by=args.round_by,
+        )
 
     logger.warning(f"Writing out dataframe of CAZy class frequencies to {outpath}")
     class_df.to_csv(outpath)
@@ -282,16 +516,42 @@ def compare_cazy_families(fgp_df, args):
     
     Compare the number of CAZymes (i.e. unique protein IDs) per CAZy families
     
-    :param fgp_df: pandas df of cazy family, genome, protein id, and one col per tax rank
+    :param fgp_df: CazomeDataset, ChunkedCazome, CazomeState, or pandas df of cazy family, genome, protein id, and one col per tax rank
     :param args: CLI args parser
+
+    Return the fam freq df, the fam freq df indexed by genome and group, and the list of all CAZy families.
+    The dfs are None if a CazomeState is given and args.rebuild_fam_freqs is False
     """
     logger = logging.getLogger(__name__)
     outdir = args.output_dir / "cazy_families"
     make_output_directory(outdir, force=True, nodelete=True)
     outpath = outdir / "cazy_family_frequencies.csv"
 
+    if isinstance(fgp_df, CazomeState) and (args.rebuild_fam_freqs is False):
+        # the remaining analyses only need the running statistics and family bitsets of the state
+        if outpath.exists():
+            outpath.unlink()
+            logger.warning(
+                f"Deleted the CAZy family frequencies per genome of the previous run ({outpath}), "
+                "as they do not include the new genomes. Use --rebuild_fam_freqs to rebuild them"
+            )
+
+        # plot the mean frequency of each family per group, from the running statistics
+        clustermap_df = fgp_df.get_group_mean_fam_freq_df()
+        outpath_means = outdir / f"{args.group_by}_mean_cazy_family_frequencies.csv"
+        logger.warning(f"Writing out the mean CAZy family frequencies per {args.group_by} to {outpath_means}")
+        clustermap_df.to_csv(outpath_means)
+
+        clustermap_df[args.group_by] = list(clustermap_df.index)
+        write_fam_clustermap(clustermap_df, outdir, args)
+
+        fam_freq_df, fam_freq_df_ggs, all_families = None, None, fgp_df.families
+        write_group_specific_fams(fgp_df, fam_freq_df, all_families, outdir, args)
+        return fam_freq_df, fam_freq_df_ggs, all_families
+
     fam_freq_df = build_fam_freq_df(
-        fgp_df, [args.group_by]
+        fgp_df.load_cazome() if isinstance(fgp_df, CazomeState) else fgp_df,
+        [args.group_by],
     )
 
     logger.warning(f"Writing out dataframe of CAZy family frequencies per genome to {outpath}")
@@ -301,68 +561,110 @@ def compare_cazy_families(fgp_df, args):
 
     # index the taxonomy data and genome (ggs=genome_genus_species)
     fam_freq_df_ggs = copy(fam_freq_df)  # so does not alter fam_freq_df
-    index = ['Genome']
-    if args.kingdom:
-        index.append('Kingdom')
-    if args.phylum:
-        index.append('Phylum')
-    if args.tax_class:
-        index.append('Class')
-    if args.tax_order:
-        index.append('Order')
-    if args.tax_family:
-        index.append('Family')
-    if args.genus:
-        index.append('Genus')
-    if args.species:
-        index.append('Species')
-
-    fam_freq_df_ggs = fam_freq_df_ggs.set_index(index)
+    fam_freq_df_ggs = fam_freq_df_ggs.set_index(['Genome', args.group_by])
     # define a colour scheme to colour code rows by genus
     fam_freq_df_ggs[args.group_by] = list(fam_freq_df[args.group_by])  # add column to use for colour scheme, is removed
-    fam_freq_genus_row_colours, fam_g_lut = build_row_colours(fam_freq_df_ggs, args.group_by, 'Set2')
 
-    for file_format in args.formats:
-        outpath_cm = outdir / f"cazy_family_clustermap.{file_format}"
-        logger.warning(
-            f"Writing out clustermap of CAZy family frequencies in {file_format} format to:\n"
-            f"{outpath_cm}"
-        )
-        build_family_clustermap(
-            fam_freq_df_ggs,
-            row_colours=fam_freq_genus_row_colours,
-            fig_size=(len(fam_freq_df_ggs.columns)*0.4, len(fam_freq_df_ggs)*0.4),
-            file_path=outpath_cm,
-            file_format=format,
-            lut=fam_g_lut,
-            legend_title=args.group_by,
-            dendrogram_ratio=(0.2, 0.05),
-            title_fontsize=28,
-            legend_fontsize=24,
-            cbar_pos=(0, 0.95, 0.05, 0.05),
-            show=args.show_plots,
-        )
+    if args.clustermap_group_means:
+        # plot the mean frequency of each family per group, rather than one row per genome
+        clustermap_df = build_group_mean_fam_freq_df(fam_freq_df_ggs, args.group_by)
+        clustermap_df[args.group_by] = list(clustermap_df.index)
+        fam_freq_df_ggs = fam_freq_df_ggs.drop(args.group_by, axis=1)
+    else:
+        clustermap_df = fam_freq_df_ggs
+    write_fam_clustermap(clustermap_df, outdir, args)
+
+    all_families = list(fam_freq_df.columns)[2:]
+    write_group_specific_fams(fgp_df, fam_freq_df, all_families, outdir, args)
+
+    return fam_freq_df, fam_freq_df_ggs, all_families
+
+
+def write_fam_clustermap(clustermap_df, outdir, args):
+    """Build a clustermap of CAZy family frequencies, with rows colour coded by group
+
+    :param clustermap_df: df, one row per genome (or group), one column per CAZy family, and a column 
+        named args.group_by used to colour the rows, which is removed
+    :param outdir: Path, output directory
+    :param args: CLI args parser
+    """
+    logger = logging.getLogger(__name__)
+
+    fam_freq_genus_row_colours, fam_g_lut = build_row_colours(clustermap_df, args.group_by, 'Set2')
+
+    # cluster once, reusing cached linkages for unchanged data, and render once for all formats
+    linkage_cache = None if args.no_cache else outdir / "linkage_cache"
+    row_linkage, col_linkage = calc_clustermap_linkages(clustermap_df, cache_dir=linkage_cache)
+
+    outpath_cm = outdir / "cazy_family_clustermap"
+    logger.warning(
+        f"Writing out clustermap of CAZy family frequencies in {', '.join(args.formats)} format(s) to:\n"
+        f"{outpath_cm}"
+    )
+    build_family_clustermap(
+        clustermap_df,
+        row_colours=fam_freq_genus_row_colours,
+        fig_size=(len(clustermap_df.columns)*0.4, len(clustermap_df)*0.4),
+        file_path=outpath_cm,
+        file_format=list(args.formats),
+        lut=fam_g_lut,
+        legend_title=args.group_by,
+        dendrogram_ratio=(0.2, 0.05),
+        title_fontsize=28,
+        legend_fontsize=24,
+        cbar_pos=(0, 0.95, 0.05, 0.05),
+        show=args.show_plots,
+        row_linkage=row_linkage,
+        col_linkage=col_linkage,
+        rasterized=len(clustermap_df) > args.clustermap_max_labels,
+        max_labels=args.clustermap_max_labels,
+        max_fig_size=(args.clustermap_max_size, args.clustermap_max_size),
+    )
+
+
+def write_group_specific_fams(fgp_df, fam_freq_df, all_families, outdir, args):
+    """Find the families only present in one group, and write them to a JSON file
+
+    :param fgp_df: CazomeDataset, ChunkedCazome, CazomeState, or pandas df of cazy family, genome, protein id, and one col per tax rank
+    :param fam_freq_df: dataframe of CAZy fam freqs, genome per row, fam per column, and tax columns.
+        Not used if fgp_df is a CazomeState
+    :param all_families: list of all CAZy families in the genomes
+    :param outdir: Path, output directory
+    :param args: CLI args parser
+    """
+    logger = logging.getLogger(__name__)
 
-    # find group specific families
     outpath_dic = outdir / f"{args.group_by}_specific_cazy_families.json"
-    all_families = list(fam_freq_df.columns)[3:]
-    unique_grp_fams, group_fams = get_group_specific_fams(fam_freq_df, args.group_by, all_families)
+    if isinstance(fgp_df, CazomeState):
+        # from the number of genomes per group containing each family
+        unique_grp_fams, group_fams = fgp_df.get_group_specific_fams(
+            min_prevalence=args.min_group_prevalence,
+            max_other_prevalence=args.max_other_prevalence,
+        )
+    else:
+        unique_grp_fams, group_fams = get_group_specific_fams(
+            fam_freq_df,
+            args.group_by,
+            all_families,
+            min_prevalence=args.min_group_prevalence,
+            max_other_prevalence=args.max_other_prevalence,
+        )
     for grp in unique_grp_fams:
         unique_grp_fams[grp] = list(unique_grp_fams[grp])
     logger.warning(f"Writing out {args.group_by} specific CAZy families to {outpath_dic}")
     with open(outpath_dic, "w") as fh:
         json.dump(unique_grp_fams, fh)
 
-    return fam_freq_df, fam_freq_df_ggs, all_families
-
 
-def compare_core_cazomes(fam_freq_df, fam_freq_df_ggs, all_families, args):
+def compare_core_cazomes(fam_freq_df, fam_freq_df_ggs, all_families, args, state=None):
     """Comprae core CAZome across the entire data set and per group
     
     :param fam_freq_df: dataframe of CAZy fam freqs, genome per row, fam per column, and tax columns
     :param fam_Freq_df_ggs: same as fam_freq_df by tax data and genome are the row index
     :param all_families: list of all CAZy families in the genomes
     :param args: CLI args parser
+    :param state: CazomeState, if given the core CAZome and the mean frequencies of its families
+        are derived from the running statistics of the state
     """
     logger = logging.getLogger(__name__)
     outdir = args.output_dir / "core_cazome"
@@ -385,12 +687,14 @@ def compare_core_cazomes(fam_freq_df, fam_freq_df_ggs, all_families, args):
     if args.species:
         index.append('Species')
 
-    try:
-        fam_freq_df_ggs = fam_freq_df_ggs.set_index(index)
-    except KeyError:
-        pass
-    
-    core_cazome = identify_core_cazome(fam_freq_df_ggs)
+    if state is not None:
+        core_cazome = state.get_core_cazome()
+    else:
+        try:
+            fam_freq_df_ggs = fam_freq_df_ggs.set_index(index)
+        except KeyError:
+            pass
+        core_cazome = identify_core_cazome(fam_freq_df_ggs)
     with open(outpath, "w") as fh:
         fh.write(
             f"Total families across all genomes: {len(all_families)}\nThe core CAZyme families are:"
@@ -402,13 +706,16 @@ def compare_core_cazomes(fam_freq_df, fam_freq_df_ggs, all_families, args):
     logger.warning(f"The core CAZome was written to {outpath}")
 
     # get fam freqs by group
-    core_cazome_df = fam_freq_df_ggs[core_cazome]
-    core_cazome_df_grped = add_tax_column_from_row_index(core_cazome_df, args.group_by, 1)
-    core_cazome_fggf_df, core_cazome_mean_freq_df = build_fam_mean_freq_df(
-        core_cazome_df_grped,
-        args.group_by,
-        round_by=args.round_by,
-    )
+    if state is not None:
+        core_cazome_mean_freq_df = state.get_fam_mean_freq_df(sorted(core_cazome), round_by=args.round_by)
+    else:
+        core_cazome_df = fam_freq_df_ggs[sorted(core_cazome)]
+        core_cazome_df_grped = add_tax_column_from_row_index(core_cazome_df, args.group_by, 1)
+        core_cazome_fggf_df, core_cazome_mean_freq_df = build_fam_mean_freq_df(
+            core_cazome_df_grped,
+            args.group_by,
+            round_by=args.round_by,
+        )
     outpath_df = outdir / "core_cazome_freqs.csv"
     logger.warning(
         "Writing the mean (and SD) frequency per family in the core "
@@ -416,14 +723,45 @@ def compare_core_cazomes(fam_freq_df, fam_freq_df_ggs, all_families, args):
     )
     core_cazome_mean_freq_df.to_csv(outpath_df)
 
+    # classify families as core, soft core, shell or cloud across all genomes and per group
+    if state is not None:
+        prevalence_df = state.get_fam_prevalence(
+            core=args.core_threshold,
+            soft_core=args.soft_core_threshold,
+            shell=args.shell_threshold,
+        )
+    else:
+        prevalence_df = calc_fam_prevalence(
+            fam_freq_df,
+            all_families,
+            ranks=[args.group_by],
+            core=args.core_threshold,
+            soft_core=args.soft_core_threshold,
+            shell=args.shell_threshold,
+        )
+    outpath_prev = outdir / "cazome_categories.csv"
+    logger.warning(f"Writing the prevalence and category (core, soft core, shell, cloud) of each family to {outpath_prev}")
+    prevalence_df.to_csv(outpath_prev)
+
+    category_sizes = prevalence_df.loc[prevalence_df['Rank'] == 'All', 'Category'].value_counts(sort=False)
+    logger.warning(f"Number of families per CAZome category across all genomes: {category_sizes.to_dict()}")
 
-def find_always_cooccurring_families(fam_freq_df, fam_freq_df_ggs, all_families, args):
+    grp_core_cazomes = get_group_core_cazomes(prevalence_df, args.group_by)
+    outpath_grp = outdir / f"{args.group_by}_core_cazomes.json"
+    logger.warning(f"Writing out the core CAZome of each {args.group_by} to {outpath_grp}")
+    with open(outpath_grp, "w") as fh:
+        json.dump({str(grp): sorted(fams) for grp, fams in grp_core_cazomes.items()}, fh)
+
+
+def find_always_cooccurring_families(fam_freq_df, fam_freq_df_ggs, all_families, args, state=None):
     """Comprae core CAZome across the entire data set and per group
     
     :param fam_freq_df: dataframe of CAZy fam freqs, genome per row, fam per column, and tax columns
     :param fam_Freq_df_ggs: same as fam_freq_df by tax data and genome are the row index
     :param all_families: list of all CAZy families in the genomes
     :param args: CLI args parser
+    :param state: CazomeState, if given the co-occurring families are identified from the 
+        presence/absence bitsets of the families saved in the state
     """
     logger = logging.getLogger(__name__)
     outdir = args.output_dir / "cooccurring_families"
@@ -431,26 +769,30 @@ def find_always_cooccurring_families(fam_freq_df, fam_freq_df_ggs, all_families,
     outpath_all = outdir / "cooccurring_families.txt"
     outpath_grp = outdir / f"{args.group_by}_cooccurring_families.txt"
 
-    cooccurring_fams_dict = calc_cooccuring_fam_freqs(
-        fam_freq_df,
-        list(all_families),
-        exclude_core_cazome=False,
-    )
-    with open(outpath_all, "w") as fh:
-        fh.write(str(cooccurring_fams_dict))
-
-    grp_cooccuring_fams = {}  # {genus: cooccurring_fams_d
-    for grp in set(fam_freq_df[args.group_by]):
-        grp_fam_freq_df = fam_freq_df[fam_freq_df[args.group_by] == grp]
-        grp_cooccurring_fams_dict = calc_cooccuring_fam_freqs(
-            grp_fam_freq_df,
+    if state is not None:
+        cooccurring_fams_dict, grp_cooccuring_fams = state.get_cooccurring_fams(list(all_families))
+    else:
+        cooccurring_fams_dict = calc_cooccuring_fam_freqs(
+            fam_freq_df,
             list(all_families),
             exclude_core_cazome=False,
         )
-        grp_cooccuring_fams[grp] = grp_cooccurring_fams_dict
+        # {genus: cooccurring_fams_dict}, from the presence/absence of the families in every group in one pass
+        grp_cooccuring_fams = calc_grouped_cooccuring_fam_freqs(
+            fam_freq_df,
+            args.group_by,
+            list(all_families),
+            exclude_core_cazome=False,
+        )
+
+    with open(outpath_all, "w") as fh:
+        fh.write(str(cooccurring_fams_dict))
     with open(outpath_grp, "w") as fh:
         fh.write(str(grp_cooccuring_fams))
 
+    if args.near_cooccurrence_threshold is not None:
+        write_near_cooccurring_fam_modules(fam_freq_df, all_families, outdir, args, state=state)
+
     upsetplot_membership = []
     upsetplot_membership = add_to_upsetplot_membership(upsetplot_membership, cooccurring_fams_dict)
 
@@ -491,6 +833,52 @@ def find_always_cooccurring_families(fam_freq_df, fam_freq_df_ggs, all_families,
     )
 
 
+def write_near_cooccurring_fam_modules(fam_freq_df, all_families, outdir, args, state=None):
+    """Identify modules of CAZy families that are nearly always present together, and write them to a CSV file
+
+    :param fam_freq_df: dataframe of CAZy fam freqs, genome per row, fam per column, and tax columns
+    :param all_families: list of all CAZy families in the genomes
+    :param outdir: Path, output directory
+    :param args: CLI args parser
+    :param state: CazomeState, if given the modules are identified from the presence/absence 
+        bitsets of the families saved in the state
+    """
+    logger = logging.getLogger(__name__)
+
+    if state is not None:
+        near_cooccurring_modules = merge_near_cooccurring_bitsets(
+            state.get_fam_bitsets(list(all_families)),
+            threshold=args.near_cooccurrence_threshold,
+        )
+    else:
+        near_cooccurring_modules = calc_near_cooccurring_fam_modules(
+            fam_freq_df,
+            list(all_families),
+            threshold=args.near_cooccurrence_threshold,
+        )
+
+    near_cooccurring_df = pd.DataFrame(
+        [
+            [
+                module_num,
+                " ".join(sorted(module['fams'])),
+                len(module['fams']),
+                module['support'],
+                module['genomes'],
+            ]
+            for module_num, module in near_cooccurring_modules.items()
+        ],
+        columns=['Module', 'Families', 'NumOfFamilies', 'Support', 'Genomes'],
+    ).set_index('Module')
+
+    outpath = outdir / "near_cooccurring_families.csv"
+    logger.warning(
+        f"Writing out {len(near_cooccurring_df)} modules of CAZy families with a Jaccard similarity of at least "
+        f"{args.near_cooccurrence_threshold} to {outpath}"
+    )
+    near_cooccurring_df.to_csv(outpath)
+
+
 def run_pca(fam_freq_df, fam_freq_df_ggs, all_families, args):
     """Run principal component analysis on CAZy family frequencies
     
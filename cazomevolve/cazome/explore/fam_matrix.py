@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Sparse matrix of CAZy family frequencies per genome"""
+
+
+import numpy as np
+import pandas as pd
+
+from scipy import sparse
+
+
+class SparseFamFreqMatrix:
+    """Matrix of CAZy family frequencies (number of unique proteins) per genome, stored as a 
+    sparse (CSR) integer matrix, so memory scales with the number of annotations rather than 
+    the number of genomes x the number of families.
+
+    Each row represents a genome, and each column a CAZy family.
+    """
+
+    def __init__(self, matrix, genomes, families, genome_taxs=None):
+        """Build the matrix
+
+        :param matrix: scipy sparse matrix, rows are genomes, columns are CAZy families
+        :param genomes: list of genomic accessions, in the order of the rows
+        :param families: list of CAZy families, in the order of the columns
+        :param genome_taxs: pandas df, indexed by genome with one column per tax rank.
+            If None, the rows are only labelled by genome
+        """
+        self.matrix = sparse.csr_matrix(matrix)
+        self.matrix.eliminate_zeros()
+        self.genomes = pd.Index(genomes, name='Genome')
+        self.families = pd.Index(families)
+        self.genome_taxs = genome_taxs
+
+        if self.matrix.shape != (len(self.genomes), len(self.families)):
+            raise ValueError(
+                f"Matrix shape {self.matrix.shape} does not match the number of genomes "
+                f"({len(self.genomes)}) and families ({len(self.families)})"
+            )
+
+    @classmethod
+    def from_fgp_df(cls, fgp_df, tax_ranks=None):
+        """Build the matrix from the codes of a FGP (or FG) dataframe
+
+        When the dataframe contains a 'Protein' column, the number of unique proteins per family 
+        per genome is counted, as in build_fam_freq_df. Otherwise the number of rows is counted.
+
+        :param fgp_df: pandas df, columns ['Family', 'Genome', 'Protein', 'tax1', 'tax2'...]
+        :param tax_ranks: list of tax ranks to label the rows by, e.g. ['Genus', 'Species']
+
+        Return SparseFamFreqMatrix, genomes listed in order of appearance, families sorted
+        """
+        if tax_ranks is None:
+            tax_ranks = []
+
+        if 'Protein' in fgp_df.columns:
+            fgp_df = fgp_df.drop_duplicates(subset=['Genome', 'Family', 'Protein'])
+
+        genome_codes, genomes = pd.factorize(fgp_df['Genome'], sort=False)
+        families = sorted(set(fgp_df['Family']))
+        fam_codes = pd.Categorical(fgp_df['Family'], categories=families).codes
+
+        # duplicate (genome, family) coordinates are summed when converted to CSR
+        matrix = sparse.coo_matrix(
+            (np.ones(len(genome_codes), dtype=np.int32), (genome_codes, fam_codes)),
+            shape=(len(genomes), len(families)),
+        ).tocsr()
+
+        genome_taxs = None
+        if len(tax_ranks) != 0:
+            genome_taxs = fgp_df.drop_duplicates(subset='Genome').set_index('Genome')[tax_ranks]
+            genome_taxs = genome_taxs.reindex(list(genomes))
+
+        return cls(matrix, list(genomes), families, genome_taxs=genome_taxs)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def __repr__(self):
+        return (
+            f"SparseFamFreqMatrix({self.matrix.shape[0]} genomes x {self.matrix.shape[1]} CAZy families, "
+            f"{self.matrix.nnz} non-zero frequencies)"
+        )
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def columns(self):
+        """The CAZy families, named as the columns of the dense df"""
+        return self.families
+
+    @property
+    def index(self):
+        """Row index of the genomes (and tax ranks), as used by the dense df"""
+        if self.genome_taxs is None:
+            return self.genomes
+        return pd.MultiIndex.from_frame(self.genome_taxs.reset_index())
+
+    def to_dense(self):
+        """Convert to a dense pandas df, indexed by genome (and tax ranks) with one column
+        per CAZy family. Only use where a dense matrix is required, e.g. for plotting
+        
+        Return pandas df
+        """
+        return pd.DataFrame(self.matrix.toarray(), index=self.index, columns=list(self.families))
+
+    def to_presence(self):
+        """Return SparseFamFreqMatrix of family presence (1) / absence (0)"""
+        presence = self.matrix.copy()
+        presence.data = np.ones_like(presence.data)
+        return SparseFamFreqMatrix(presence, self.genomes, self.families, genome_taxs=self.genome_taxs)
+
+    def genome_counts(self):
+        """Return pandas Series, the number of genomes each family is present in"""
+        return pd.Series(self.matrix.getnnz(axis=0), index=self.families)
+
+    def filter_genomes(self, genomes):
+        """Return SparseFamFreqMatrix of only the listed genomes
+
+        :param genomes: list/set of genomic accessions to retain
+        """
+        rows = np.flatnonzero(self.genomes.isin(genomes))
+        genome_taxs = None
+        if self.genome_taxs is not None:
+            genome_taxs = self.genome_taxs.iloc[rows]
+        return SparseFamFreqMatrix(
+            self.matrix[rows], self.genomes[rows], self.families, genome_taxs=genome_taxs,
+        )
+
+
+def to_dense_df(df):
+    """Convert a SparseFamFreqMatrix to a dense df, other dfs are returned unchanged
+
+    :param df: pandas df or SparseFamFreqMatrix
+
+    Return pandas df
+    """
+    if isinstance(df, SparseFamFreqMatrix):
+        return df.to_dense()
+    return df
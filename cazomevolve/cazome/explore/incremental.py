@@ -0,0 +1,700 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Persist the summaries of an explored data set, and add new genomes without reanalysing the data set
+
+The state of the data set is written to a directory, containing:
+* one genome table and one family counts table per batch of genomes (see ChunkedCazome)
+* running statistics (count, mean and M2, the sum of squared differences from the mean) of the
+  CAZome sizes and CAZy class sizes per group of genomes
+* running statistics of the frequency of each CAZy family per group, and the number of genomes
+  per group containing each family
+* the presence/absence of each CAZy family across the genomes of each group, packed into a bitset
+  (one bit per genome), from which the always co-occurring families are identified
+
+Adding genomes only summarises the new genomes, and merges their statistics into the running
+statistics, so the cost scales with the number of new genomes.
+"""
+
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+from cazomevolve.cazome.explore.chunked import ChunkedCazome
+from cazomevolve.cazome.explore.fam_matrix import SparseFamFreqMatrix
+from cazomevolve.cazome.explore.cazy_classes import CAZY_CLASSES
+from cazomevolve.cazome.explore.cazy_families import (
+    CORE_THRESHOLD,
+    SOFT_CORE_THRESHOLD,
+    SHELL_THRESHOLD,
+    build_fam_prevalence_df,
+    get_specific_fams_from_counts,
+)
+from cazomevolve.cazome.explore.cooccurring_families import (
+    get_grouped_fam_presence_bitsets,
+    merge_cooccurring_fam_pairs,
+    pair_cooccurring_fams,
+)
+
+
+STATE_FILE = "state.json"
+GROUP_STATS_FILE = "group_stats.feather"
+FAM_STATS_FILES = {
+    'Mean': "fam_freq_means.feather",
+    'M2': "fam_freq_m2.feather",
+    'Presence': "fam_presence.feather",
+}
+FAM_BITSETS_FILE = "fam_presence_bitsets.feather"
+
+
+class CazomeState:
+    """Persisted summaries of the genomes in a data set, and running statistics per group of genomes.
+
+    Groups are listed in order of first appearance, so the summaries match those calculated
+    from all genomes at once.
+    """
+
+    def __init__(self, state_dir, group_by):
+        """Build an empty state
+
+        :param state_dir: Path, dir to write the state to
+        :param group_by: str, tax rank to group genomes by, e.g. 'Genus'
+        """
+        self.state_dir = Path(state_dir)
+        self.group_by = group_by
+        self.num_parts = 0
+        self.genomes = set()
+
+        # index (Group, Statistic), columns 'Count', 'Mean', 'M2'
+        self.group_stats = pd.DataFrame(
+            columns=['Count', 'Mean', 'M2'],
+            index=pd.MultiIndex.from_tuples([], names=['Group', 'Statistic']),
+            dtype=float,
+        )
+        # index Group, one column per CAZy family
+        self.fam_stats = {stat: pd.DataFrame(index=pd.Index([], name='Group'), dtype=float) for stat in FAM_STATS_FILES}
+        # one dict {fam: bytes} per group, in the order of the groups, one bit per genome of the group
+        self.fam_bitsets = []
+
+    def __len__(self):
+        return len(self.genomes)
+
+    @classmethod
+    def load(cls, state_dir):
+        """Load the state written to state_dir
+
+        :param state_dir: Path, dir containing the state
+
+        Return CazomeState
+        """
+        state_dir = Path(state_dir)
+        with open(state_dir / STATE_FILE, 'r') as fh:
+            state_data = json.load(fh)
+
+        state = cls(state_dir, state_data['group_by'])
+        state.num_parts = state_data['num_parts']
+        for part in range(state.num_parts):
+            state.genomes.update(
+                pd.read_feather(state_dir / "genomes" / f"part-{part:05d}.feather", columns=['Genome'])['Genome']
+            )
+
+        group_stats = pd.read_feather(state_dir / GROUP_STATS_FILE)
+        state.group_stats = group_stats.set_index(['Group', 'Statistic'])
+        for stat, file_name in FAM_STATS_FILES.items():
+            state.fam_stats[stat] = pd.read_feather(state_dir / file_name).set_index('Group')
+
+        state.fam_bitsets = [{} for _ in state.groups]
+        bitsets_df = pd.read_feather(state_dir / FAM_BITSETS_FILE)
+        for grp_index, fam, bitset in bitsets_df.itertuples(index=False):
+            state.fam_bitsets[grp_index][fam] = bitset
+
+        return state
+
+    def save(self):
+        """Write the running statistics and state metadata to the state dir.
+        The genome summaries are written when the genomes are added."""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+        self.group_stats.reset_index().to_feather(self.state_dir / GROUP_STATS_FILE)
+        for stat, file_name in FAM_STATS_FILES.items():
+            self.fam_stats[stat].reset_index().to_feather(self.state_dir / file_name)
+        pd.DataFrame(
+            [
+                [grp_index, fam, bitset]
+                for grp_index, fam_bitsets in enumerate(self.fam_bitsets)
+                for fam, bitset in fam_bitsets.items()
+            ],
+            columns=['GroupIndex', 'Family', 'Bitset'],
+        ).to_feather(self.state_dir / FAM_BITSETS_FILE)
+
+        with open(self.state_dir / STATE_FILE, 'w') as fh:
+            json.dump({'group_by': self.group_by, 'num_parts': self.num_parts}, fh)
+
+    @property
+    def groups(self):
+        """List of groups, in order of first appearance"""
+        return list(self.fam_stats['Presence'].index)
+
+    @property
+    def families(self):
+        """Sorted list of CAZy families in the data set"""
+        return sorted(self.fam_stats['Presence'].columns)
+
+    def group_sizes(self):
+        """Return pandas Series, number of genomes per group, in order of first appearance"""
+        if len(self.group_stats) == 0:
+            return pd.Series(index=pd.Index([], name='Group'), dtype=int)
+        return self.group_stats.xs('NumOfProteins', level='Statistic')['Count'].astype(int)
+
+    def add_genomes(self, cazome):
+        """Add the genomes in a ChunkedCazome to the state, and update the running statistics.
+
+        Genomes already in the state are skipped.
+
+        :param cazome: ChunkedCazome, the genome table must include the group_by column
+
+        Return int, number of genomes added
+        """
+        genome_table = cazome.genome_table
+        repeated_genomes = self.genomes.intersection(genome_table['Genome'])
+        if len(repeated_genomes) != 0:
+            print(f"Skipping {len(repeated_genomes)} genomes already in the data set:\n{sorted(repeated_genomes)}")
+            genome_table = genome_table[~genome_table['Genome'].isin(repeated_genomes)]
+        if len(genome_table) == 0:
+            return 0
+
+        genome_table = genome_table.reset_index(drop=True)
+        fam_counts = cazome.fam_counts[cazome.fam_counts['Genome'].isin(set(genome_table['Genome']))]
+
+        group_sizes = self.group_sizes()
+        new_group_sizes, new_fam_stats = calc_fam_stats(genome_table, fam_counts, self.group_by)
+        self.fam_bitsets = merge_fam_bitsets(
+            self.fam_bitsets,
+            group_sizes,
+            calc_fam_bitsets(genome_table, fam_counts, self.group_by),
+            new_group_sizes,
+        )
+        self.fam_stats = merge_fam_stats(self.fam_stats, group_sizes, new_fam_stats, new_group_sizes)
+        self.group_stats = merge_running_stats(self.group_stats, calc_group_stats(genome_table, self.group_by))
+
+        self.write_part(genome_table, fam_counts)
+        self.genomes.update(genome_table['Genome'])
+
+        return len(genome_table)
+
+    def write_part(self, genome_table, fam_counts):
+        """Write the summaries of a batch of genomes to the state dir
+
+        :param genome_table: pandas df, one row per genome (see ChunkedCazome)
+        :param fam_counts: pandas df, columns 'Genome', 'Family' and 'Frequency'
+        """
+        tax_cols = [col for col in genome_table.columns if genome_table[col].dtype.name in ('category', 'object')]
+        genome_table = genome_table.astype({col: object for col in tax_cols})
+
+        for name, df in (("genomes", genome_table), ("fam_counts", fam_counts)):
+            part_dir = self.state_dir / name
+            part_dir.mkdir(parents=True, exist_ok=True)
+            if self.num_parts == 0:
+                # remove the parts of a previously saved data set
+                for part_path in part_dir.glob("part-*.feather"):
+                    part_path.unlink()
+            df.reset_index(drop=True).to_feather(part_dir / f"part-{self.num_parts:05d}.feather")
+
+        self.num_parts += 1
+
+    def load_cazome(self):
+        """Load the summaries of all genomes in the state
+
+        Return ChunkedCazome
+        """
+        genome_tables, fam_counts = [], []
+        for part in range(self.num_parts):
+            genome_tables.append(pd.read_feather(self.state_dir / "genomes" / f"part-{part:05d}.feather"))
+            fam_counts.append(pd.read_feather(self.state_dir / "fam_counts" / f"part-{part:05d}.feather"))
+
+        genome_table = pd.concat(genome_tables, ignore_index=True)
+        class_cols = [col for col in CAZY_CLASSES if col in genome_table.columns]
+        genome_table[class_cols] = genome_table[class_cols].fillna(0).astype(int)
+
+        return ChunkedCazome(genome_table, pd.concat(fam_counts, ignore_index=True))
+
+    def get_cazome_size_dfs(self, round_by=None):
+        """Summarise the CAZome sizes per group, matching count_items_in_cazome() and count_cazyme_fam_ratio()
+
+        :param round_by: int, number of figures to round mean and sd by. If None do not round
+
+        Return three dfs, the number of CAZymes, the number of CAZy families and the
+        CAZyme to family ratio, cols = [grp, 'Mean...', 'Sd...', 'NumOfGenomes']
+        """
+        size_dfs = []
+        for statistic, item in (
+            ('NumOfProteins', 'Proteins'),
+            ('NumOfFamilys', 'Familys'),
+            ('CAZymeToFamRatio', 'CAZymeToFamRatio'),
+        ):
+            stats = self.group_stats.xs(statistic, level='Statistic')
+            mean, sd = get_mean_sd(stats, round_by)
+            size_dfs.append(pd.DataFrame({
+                self.group_by: list(stats.index),
+                f'Mean{item}': list(mean),
+                f'Sd{item}': list(sd),
+                'NumOfGenomes': list(stats['Count'].astype(int)),
+            }))
+
+        return size_dfs
+
+    def get_class_df(self, round_by=None):
+        """Summarise the CAZy class sizes per group, matching calculate_class_sizes()
+
+        :param round_by: int, num of dp to round the mean and sd to, if None does not round
+
+        Return df columns ['CAZyClass', grp, 'MeanCazyClass', 'SdCazyClass', 'MeanClassPerc', 'SdClassPerc', 'NumOfGenomes']
+        """
+        group_sizes = self.group_sizes()
+        class_data = []
+
+        # look up statistics by the position of the group, as groups may be NaN
+        group_stats = self.group_stats.reset_index()
+        group_stats['GroupIndex'] = group_sizes.index.get_indexer(group_stats['Group'])
+        group_stats = group_stats.set_index(['GroupIndex', 'Statistic'])
+
+        for cazy_class in CAZY_CLASSES:
+            for grp_index, (grp_name, grp_size) in enumerate(group_sizes.items()):
+                try:
+                    class_stats = group_stats.loc[(grp_index, cazy_class)]
+                    perc_stats = group_stats.loc[(grp_index, f'{cazy_class}Perc')]
+                except KeyError:
+                    # cazy class is not in any genomes from the grp_name
+                    class_data.append([cazy_class, grp_name, 0, 0, 0, 0, grp_size])
+                    continue
+
+                mean_class, sd_class = get_mean_sd(class_stats, round_by)
+                mean_perc, sd_perc = get_mean_sd(perc_stats, round_by)
+                class_data.append(
+                    [cazy_class, grp_name, mean_class, sd_class, mean_perc, sd_perc, int(class_stats['Count'])]
+                )
+
+        col_names = ['CAZyClass', self.group_by, 'MeanCazyClass', 'SdCazyClass', 'MeanClassPerc', 'SdClassPerc', 'NumOfGenomes']
+        return pd.DataFrame(class_data, columns=col_names)
+
+    def get_core_cazome(self):
+        """Return set of CAZy families present in every genome"""
+        presence = self.fam_stats['Presence'].sum(axis=0)
+        return set(presence[presence == len(self)].index)
+
+    def get_fam_bitsets(self, families=None):
+        """Concatenate the presence/absence bitsets of each family across the groups, giving 
+        one bitset per family across all genomes
+
+        :param families: list of CAZy families, the order of the returned dict. If None, uses self.families
+
+        Return dict {fam: bytes}, families absent from every genome are not included
+        """
+        if families is None:
+            families = self.families
+        group_sizes = self.group_sizes().to_numpy()
+        empty_bitsets = [bytes(int(num_of_bytes)) for num_of_bytes in (group_sizes + 7) // 8]
+
+        fam_bitsets = {}
+        for fam in families:
+            if all(fam not in grp_bitsets for grp_bitsets in self.fam_bitsets):
+                continue
+            fam_bitsets[fam] = b"".join(
+                grp_bitsets.get(fam, empty_bitset)
+                for grp_bitsets, empty_bitset in zip(self.fam_bitsets, empty_bitsets)
+            )
+
+        return fam_bitsets
+
+    def get_cooccurring_fams(self, families=None):
+        """Identify groups of CAZy families that are always present together across all genomes, 
+        and in the genomes of each group, matching calc_cooccuring_fam_freqs() and 
+        calc_grouped_cooccuring_fam_freqs(), without loading the summaries of the genomes
+
+        :param families: list of CAZy families to be analysed. If None, uses self.families
+
+        Return
+        * dict {grp_num: {'fams': {co-occurring fams}, 'freqs': {num of genomes}}}, across all genomes
+        * dict {grp: {grp_num: {'fams': {co-occurring fams}, 'freqs': {num of genomes}}}}, per group
+        """
+        if families is None:
+            families = self.families
+
+        cooccurring_fams_dict = merge_cooccurring_fam_pairs(pair_cooccurring_fams(self.get_fam_bitsets(families)))
+
+        grp_cooccurring_fams = {}
+        for grp, grp_bitsets in zip(self.groups, self.fam_bitsets):
+            grp_bitsets = {fam: grp_bitsets[fam] for fam in families if fam in grp_bitsets}
+            grp_cooccurring_fams[grp] = merge_cooccurring_fam_pairs(pair_cooccurring_fams(grp_bitsets))
+
+        return cooccurring_fams_dict, grp_cooccurring_fams
+
+    def get_group_specific_fams(self, min_prevalence=None, max_other_prevalence=None):
+        """Identify families that are present in only one group, matching get_group_specific_fams()
+
+        :param min_prevalence: float, min fraction of genomes in the group containing the family
+        :param max_other_prevalence: float, max fraction of genomes outside of the group containing the family
+
+        Return dict {group: {only unique fams}} and dict {group: {all fams}}
+        """
+        return get_specific_fams_from_counts(
+            self.fam_stats['Presence'],
+            self.group_sizes().reindex(self.fam_stats['Presence'].index),
+            min_prevalence=min_prevalence,
+            max_other_prevalence=max_other_prevalence,
+        )
+
+    def get_fam_prevalence(self, core=CORE_THRESHOLD, soft_core=SOFT_CORE_THRESHOLD, shell=SHELL_THRESHOLD):
+        """Calculate the prevalence and CAZome category of each family across all genomes and
+        per group, matching calc_fam_prevalence() with ranks=[group_by]
+
+        :param core: float, min fraction of genomes containing a family in the core CAZome
+        :param soft_core: float, min fraction of genomes containing a family in the soft core CAZome
+        :param shell: float, min fraction of genomes containing a family in the shell CAZome
+
+        Return df, columns ['Rank', 'Group', 'Family', 'Genomes', 'GroupSize', 'Prevalence', 'Category']
+        """
+        presence = self.fam_stats['Presence'].reindex(columns=self.families)
+        group_sizes = self.group_sizes().reindex(presence.index)
+
+        fam_counts = np.vstack([presence.sum(axis=0).to_numpy(), presence.to_numpy()])
+        grp_sizes = np.concatenate([[group_sizes.sum()], group_sizes.to_numpy()])
+
+        return build_fam_prevalence_df(
+            fam_counts,
+            grp_sizes,
+            ['All'] + [self.group_by] * len(presence),
+            ['All'] + list(presence.index),
+            self.families,
+            core=core,
+            soft_core=soft_core,
+            shell=shell,
+        )
+
+    def get_group_mean_fam_freq_df(self, families=None):
+        """Build a df of the mean frequency of each family per group, matching build_group_mean_fam_freq_df()
+
+        :param families: list of CAZy families. If None, uses self.families
+
+        Return df, index=groups (in order of first appearance), cols=mean fam freqs
+        """
+        if families is None:
+            families = self.families
+        group_mean_df = self.fam_stats['Mean'].reindex(columns=families).fillna(0)
+        group_mean_df.index.name = self.group_by
+        group_mean_df.columns.name = None
+        return group_mean_df
+
+    def get_fam_mean_freq_df(self, families, round_by=None):
+        """Build a df of the mean (and SD) frequency of each family per group, matching the 
+        second df returned by build_fam_mean_freq_df()
+
+        :param families: list of CAZy families
+        :param round_by: int, number of decimal points to round by. If None, does not round
+
+        Return df columns ['Family', grp, 'MeanFreq', 'SdFreq']
+        """
+        group_sizes = self.group_sizes()
+        means = self.fam_stats['Mean'].reindex(columns=families)
+        m2s = self.fam_stats['M2'].reindex(columns=families)
+
+        df_data = []
+        for grp_index, (grp_name, grp_size) in enumerate(group_sizes.items()):
+            stats = pd.DataFrame({'Count': grp_size, 'Mean': means.iloc[grp_index], 'M2': m2s.iloc[grp_index]})
+            mean, sd = get_mean_sd(stats, round_by)
+            for fam in families:
+                df_data.append([fam, grp_name, mean[fam], sd[fam]])
+
+        return pd.DataFrame(df_data, columns=['Family', self.group_by, 'MeanFreq', 'SdFreq'])
+
+
+def get_mean_sd(stats, round_by=None):
+    """Calculate the mean and (population) SD from running statistics
+
+    :param stats: pandas df or Series with 'Count', 'Mean' and 'M2'
+    :param round_by: int, number of decimal points to round by. If None, does not round
+
+    Return mean and sd
+    """
+    mean = stats['Mean']
+    sd = np.sqrt(stats['M2'] / stats['Count'])
+    if round_by is not None:
+        mean = np.round(mean, round_by)
+        sd = np.round(sd, round_by)
+    return mean, sd
+
+
+def calc_group_stats(genome_table, group_by):
+    """Calculate the running statistics of the CAZome and CAZy class sizes of a batch of genomes
+
+    The CAZy class statistics only include genomes containing the class.
+
+    :param genome_table: pandas df, one row per genome (see ChunkedCazome)
+    :param group_by: str, tax rank to group genomes by
+
+    Return pandas df, index (Group, Statistic), columns 'Count', 'Mean' and 'M2'
+    """
+    values = {
+        'NumOfProteins': genome_table['NumOfProteins'],
+        'NumOfFamilys': genome_table['NumOfFamilys'],
+        'CAZymeToFamRatio': genome_table['NumOfProteins'] / genome_table['NumOfFamilys'],
+    }
+    for cazy_class in CAZY_CLASSES:
+        if cazy_class not in genome_table.columns:
+            continue
+        class_sizes = genome_table[cazy_class].where(genome_table[cazy_class] > 0)
+        values[cazy_class] = class_sizes
+        values[f'{cazy_class}Perc'] = (class_sizes / genome_table['NumOfProteins']) * 100
+
+    # order by group (in order of first appearance), then statistic
+    group_order = pd.Series(pd.factorize(genome_table[group_by], use_na_sentinel=False)[0])
+    stat_values = pd.concat(
+        [
+            pd.DataFrame({
+                'Group': genome_table[group_by].astype(object),
+                'Statistic': statistic,
+                'Value': value,
+                'Order': group_order * len(values) + stat_index,
+            })
+            for stat_index, (statistic, value) in enumerate(values.items())
+        ],
+        ignore_index=True,
+    ).dropna(subset=['Value']).sort_values('Order', kind='stable')
+
+    grouped = stat_values.groupby(['Group', 'Statistic'], sort=False, dropna=False)['Value']
+    stats = pd.DataFrame({'Count': grouped.size().astype(float), 'Mean': grouped.mean()})
+    deviations = (stat_values['Value'] - grouped.transform('mean')) ** 2
+    stats['M2'] = deviations.groupby([stat_values['Group'], stat_values['Statistic']], sort=False, dropna=False).sum()
+
+    return stats
+
+
+def calc_fam_stats(genome_table, fam_counts, group_by):
+    """Calculate the running statistics of the CAZy family frequencies of a batch of genomes per group
+
+    Genomes not containing a family are included, with a frequency of zero.
+
+    :param genome_table: pandas df, one row per genome (see ChunkedCazome)
+    :param fam_counts: pandas df, columns 'Genome', 'Family' and 'Frequency'
+    :param group_by: str, tax rank to group genomes by
+
+    Return
+    * pandas Series, number of genomes per group
+    * dict {'Mean': df, 'M2': df, 'Presence': df}, index Group, one column per CAZy family
+    """
+    genome_groups = genome_table.set_index('Genome')[group_by].astype(object)
+    group_sizes = genome_groups.groupby(genome_groups, sort=False, dropna=False).size()
+    group_sizes.index.name = 'Group'
+
+    fam_counts = fam_counts.assign(Group=fam_counts['Genome'].map(genome_groups))
+    fam_counts = fam_counts.assign(FreqSq=fam_counts['Frequency'] ** 2)
+    grouped = fam_counts.groupby(['Group', 'Family'], sort=False, dropna=False)
+
+    families = sorted(set(fam_counts['Family']))
+    fam_sums = grouped['Frequency'].sum().unstack().reindex(index=group_sizes.index, columns=families).fillna(0)
+    fam_sq_sums = grouped['FreqSq'].sum().unstack().reindex(index=group_sizes.index, columns=families).fillna(0)
+    presence = grouped.size().unstack().reindex(index=group_sizes.index, columns=families).fillna(0)
+
+    means = fam_sums.div(group_sizes, axis=0)
+    fam_stats = {
+        'Mean': means,
+        'M2': fam_sq_sums - fam_sums * means,
+        'Presence': presence.astype(int),
+    }
+
+    return group_sizes, fam_stats
+
+
+def calc_fam_bitsets(genome_table, fam_counts, group_by):
+    """Pack the presence/absence of each CAZy family across the genomes of each group of a batch 
+    of genomes into a bitset, one bit per genome
+
+    :param genome_table: pandas df, one row per genome (see ChunkedCazome)
+    :param fam_counts: pandas df, columns 'Genome', 'Family' and 'Frequency'
+    :param group_by: str, tax rank to group genomes by
+
+    Return list of dicts {fam: bytes}, one dict per group, in order of first appearance
+    """
+    grp_codes, _ = pd.factorize(genome_table[group_by].astype(object), use_na_sentinel=False)
+
+    families = sorted(set(fam_counts['Family']))
+    presence = SparseFamFreqMatrix(
+        (
+            np.ones(len(fam_counts), dtype=np.int32),
+            (
+                pd.Index(genome_table['Genome']).get_indexer(fam_counts['Genome']),
+                pd.Categorical(fam_counts['Family'], categories=families).codes,
+            ),
+        ),
+        list(genome_table['Genome']),
+        families,
+    )
+
+    return get_grouped_fam_presence_bitsets(presence, grp_codes, families)
+
+
+def merge_fam_bitsets(fam_bitsets, group_sizes, new_fam_bitsets, new_group_sizes):
+    """Append the presence/absence bitsets of a new batch of genomes to the bitsets of each group
+
+    The bits of the new genomes follow the bits of the genomes already in the group, and families 
+    absent from either set of genomes are padded with zeros.
+
+    :param fam_bitsets: list of dicts {fam: bytes}, one dict per group, in the order of group_sizes
+    :param group_sizes: pandas Series, number of genomes per group
+    :param new_fam_bitsets: list of dicts {fam: bytes}, one dict per group of the new batch of genomes
+    :param new_group_sizes: pandas Series, number of genomes per group in the new batch
+
+    Return list of dicts {fam: bytes}, one dict per group, groups listed in order of first appearance
+    """
+    grp_sizes = pd.concat([group_sizes, new_group_sizes]).groupby(level=0, sort=False, dropna=False).sum()
+    fam_bitsets = list(fam_bitsets) + [{} for _ in range(len(grp_sizes) - len(fam_bitsets))]
+    old_sizes = group_sizes.reindex(grp_sizes.index, fill_value=0).astype(int)
+
+    for grp_index, new_size, grp_bitsets in zip(
+        grp_sizes.index.get_indexer(new_group_sizes.index), new_group_sizes.astype(int), new_fam_bitsets,
+    ):
+        old_size = int(old_sizes.iloc[grp_index])
+        if old_size == 0:
+            fam_bitsets[grp_index] = grp_bitsets
+            continue
+
+        old_bitsets = fam_bitsets[grp_index]
+        families = list(old_bitsets) + [fam for fam in grp_bitsets if fam not in old_bitsets]
+        bits = np.hstack([
+            unpack_bitsets(old_bitsets, families, old_size),
+            unpack_bitsets(grp_bitsets, families, new_size),
+        ])
+        packed_bitsets = np.packbits(bits, axis=1)
+        fam_bitsets[grp_index] = {fam: packed_bitsets[i].tobytes() for i, fam in enumerate(families)}
+
+    return fam_bitsets
+
+
+def unpack_bitsets(fam_bitsets, families, num_of_bits):
+    """Unpack the presence/absence bitsets of families into a 2D array of bits
+
+    :param fam_bitsets: dict {fam: bytes}, families not in the dict are absent from every genome
+    :param families: list of CAZy families, one row per family
+    :param num_of_bits: int, number of genomes in the bitsets
+
+    Return 2D np array of uint8, one row per family, one column per genome
+    """
+    empty_bitset = bytes((num_of_bits + 7) // 8)
+    packed_bitsets = np.frombuffer(
+        b"".join(fam_bitsets.get(fam, empty_bitset) for fam in families), dtype=np.uint8,
+    ).reshape(len(families), len(empty_bitset))
+    return np.unpackbits(packed_bitsets, axis=1, count=num_of_bits)
+
+
+def combine_running_stats(counts, means, m2s):
+    """Combine the running statistics of multiple sets of values, using the parallel
+    algorithm of Chan et al. (1979). Rows with the same index are combined, in order of
+    first appearance.
+
+    :param counts: list of pandas Series, the number of values per row
+    :param means: list of pandas Series or dfs, the mean(s) per row, aligned to the counts.
+        Missing columns are treated as a mean (and M2) of zero
+    :param m2s: list of pandas Series or dfs, the sum(s) of squared differences from the mean per row
+
+    Return count, mean and M2 of the combined values
+    """
+    count = pd.concat(counts)
+    mean = pd.concat(means).fillna(0)
+    m2 = pd.concat(m2s).fillna(0)
+    levels = list(range(count.index.nlevels))
+
+    total_count = count.groupby(level=levels, sort=False, dropna=False).transform('sum')
+    total_mean = mean.mul(count, axis=0).groupby(level=levels, sort=False, dropna=False).transform('sum')
+    total_mean = total_mean.div(total_count, axis=0)
+    m2 = m2 + ((mean - total_mean) ** 2).mul(count, axis=0)
+
+    return (
+        count.groupby(level=levels, sort=False, dropna=False).sum(),
+        total_mean.groupby(level=levels, sort=False, dropna=False).first(),
+        m2.groupby(level=levels, sort=False, dropna=False).sum(),
+    )
+
+
+def merge_running_stats(stats, new_stats):
+    """Merge the running statistics of a new batch of genomes into the running statistics
+
+    :param stats: pandas df, index (Group, Statistic), columns 'Count', 'Mean' and 'M2'
+    :param new_stats: pandas df, same structure as stats
+
+    Return pandas df
+    """
+    count, mean, m2 = combine_running_stats(
+        [stats['Count'], new_stats['Count']],
+        [stats['Mean'], new_stats['Mean']],
+        [stats['M2'], new_stats['M2']],
+    )
+    return pd.DataFrame({'Count': count, 'Mean': mean, 'M2': m2})
+
+
+def merge_fam_stats(fam_stats, group_sizes, new_fam_stats, new_group_sizes):
+    """Merge the CAZy family frequency statistics of a new batch of genomes into the running statistics
+
+    Families not found in a batch have a mean frequency (and M2) of zero across the genomes of the batch.
+
+    :param fam_stats: dict {'Mean': df, 'M2': df, 'Presence': df}, index Group, one column per CAZy family
+    :param group_sizes: pandas Series, number of genomes per group
+    :param new_fam_stats: dict, same structure as fam_stats, for the new batch of genomes
+    :param new_group_sizes: pandas Series, number of genomes per group in the new batch
+
+    Return dict, same structure as fam_stats
+    """
+    families = sorted(set(fam_stats['Mean'].columns).union(new_fam_stats['Mean'].columns))
+
+    count, mean, m2 = combine_running_stats(
+        [group_sizes, new_group_sizes],
+        [fam_stats['Mean'], new_fam_stats['Mean']],
+        [fam_stats['M2'], new_fam_stats['M2']],
+    )
+    presence = pd.concat([fam_stats['Presence'], new_fam_stats['Presence']]).fillna(0)
+    presence = presence.groupby(level=0, sort=False, dropna=False).sum()
+
+    return {
+        'Mean': mean.reindex(columns=families),
+        'M2': m2.reindex(columns=families),
+        'Presence': presence.reindex(columns=families).astype(int),
+    }
@@ -48,16 +48,62 @@ from collections import Counter
 from tqdm import tqdm
 from saintBioutils.utilities.file_io.get_paths import get_dir_paths
 
+from cazomevolve.cazome.explore.fam_matrix import SparseFamFreqMatrix
 
-def load_fgp_data(fgp_file):
+
+FGP_COLUMNS = ['Family', 'Genome', 'Protein']
+
+
+def unpack_dataset(data, attribute):
+    """Retrieve the dataframe to analyse from a CazomeDataset
+
+    Allows the explore functions to be passed either a dataframe or a CazomeDataset.
+    Dataframes and SparseFamFreqMatrix objects are returned unchanged.
+
+    :param data: pandas df or CazomeDataset
+    :param attribute: str, name of the CazomeDataset attribute to return, e.g. 'fgp_df'
+
+    Return pandas df
+    """
+    if isinstance(data, (pd.DataFrame, SparseFamFreqMatrix)):
+        return data
+    return getattr(data, attribute)
+
+
+def load_fgp_data(fgp_file, columns=None, categorical=True, engine=None):
     """Load data from the fgp (fam - genome - protein) tab delimited file from cazomevolve.
 
+    By default the columns are read as categoricals (dictionary encoded), so that each unique
+    family, genome and protein ID is only stored once in memory.
+
     :param fgp_file: str/Path, path to fgp_file
+    :param columns: list of column names to load, from 'Family', 'Genome' and 'Protein'.
+        If None all three columns are loaded. Use ['Family', 'Genome'] to avoid loading protein IDs
+    :param categorical: bool, read the columns as categoricals. If False use object dtypes
+    :param engine: str, pandas parser engine, e.g. 'pyarrow'. If None, the pandas default is used
 
-    Return pandas df with columns 'Family', 'Genome' and 'Protein' (containing the protein id/accession)
+    Return pandas df with columns 'Family', 'Genome' and 'Protein' (containing the protein id/accession),
+    or the selected columns
     """
-    fgp_df = pd.read_table(fgp_file, header=None)
-    fgp_df.columns = ['Family', 'Genome', 'Protein']
+    if columns is None:
+        columns = FGP_COLUMNS
+    unknown_columns = set(columns).difference(FGP_COLUMNS)
+    if len(unknown_columns) != 0:
+        raise ValueError(f"Unknown FGP columns {sorted(unknown_columns)}, expected {FGP_COLUMNS}")
+    columns = [col for col in FGP_COLUMNS if col in columns]
+
+    # select columns by position, so FG files (without a protein column) can also be loaded
+    kwargs = {}
+    if engine is not None:
+        kwargs['engine'] = engine
+    fgp_df = pd.read_table(
+        fgp_file,
+        header=None,
+        usecols=[FGP_COLUMNS.index(col) for col in columns],
+        dtype='category' if categorical else None,
+        **kwargs,
+    )
+    fgp_df.columns = columns
 
     return fgp_df
 
@@ -141,14 +187,19 @@ def add_tax_data_from_tax_df(
     tax_family=False,
     genus=False,
     species=False,
+    categorical=True,
 ):
     """Extract tax data from the tax df and add to the df (e.g. the gfp_df)
+
+    The tax data is joined to the df by genome. Genomes not listed in the tax df are reported,
+    and their tax ranks are left empty (NaN).
     
     :param df: pandas df, df to add tax data to
     :param df: pandas df containing tax data, with one column called 'Genome'
         and one column per tax rank
     The remaining params are bool checks for lineage ranks to be added to 
     the df
+    :param categorical: bool, store the tax ranks as categoricals
     
     Return df with new taxonomy columns
     """
@@ -171,12 +222,19 @@ def add_tax_data_from_tax_df(
         print('No tax ranks listed to be added to df')
         return df
     
+    # index the tax data by genome, so the tax data can be joined to the df by genome
+    genome_taxs = tax_df.drop_duplicates(subset='Genome').set_index('Genome')
+
+    missing_genomes = set(df['Genome']).difference(genome_taxs.index)
+    if len(missing_genomes) != 0:
+        print(
+            f"{len(missing_genomes)} genomes were not listed in the tax data, "
+            f"their tax ranks will be left empty (NaN):\n{sorted(missing_genomes)}"
+        )
+
     for tax_rank in tax_ranks:
-        new_col = []
-        for ri in tqdm(range(len(df)), desc=f"Collecting {tax_rank} data"):
-            # retrieve the row in the tax_df containing the corresponding genome information
-            tax_row = tax_df[tax_df['Genome'] == df.iloc[ri]['Genome']]
-            new_col.append(tax_row[tax_rank].values[0])
-        df[tax_rank] = new_col
-        
+        df[tax_rank] = df['Genome'].map(genome_taxs[tax_rank])
+        if categorical:
+            df[tax_rank] = df[tax_rank].astype('category')
+
     return df
@@ -51,17 +51,32 @@ from sklearn.preprocessing import StandardScaler
 
 import adjustText
 
+from cazomevolve.cazome.explore.fam_matrix import SparseFamFreqMatrix
+from cazomevolve.cazome.explore.parse_data import unpack_dataset
+
 
 def perform_pca(df, nComp):
     """Perform PCA on family freq df
     
-    :param df: df, rows=genomes, cols=fam freqs
+    :param df: CazomeDataset, SparseFamFreqMatrix, or df, rows=genomes, cols=fam freqs
         Only contains columns with CAZy family frequency data
         Recommend placing the tax data in the index or leaving out
     :param nComp: int, number of components
      
     Return PCA object and object for scaling PCA
     """
+    df = unpack_dataset(df, 'fam_freq_matrix')
+
+    if isinstance(df, SparseFamFreqMatrix):
+        # scale without centring to retain sparsity, the PCA centres the data implicitly
+        scaler = StandardScaler(with_mean=False)
+        X_scaled = scaler.fit_transform(df.matrix.astype(np.float64))
+
+        cazome_pca = PCA(n_components=nComp, svd_solver='covariance_eigh')
+        cazome_pca.fit(X_scaled)
+
+        return cazome_pca, X_scaled
+
     # scale the data
     scaler = StandardScaler()
     scaler.fit(df.loc[:, df.columns])
@@ -181,7 +196,7 @@ def plot_pca(
     
     :param pca: sklearn PCA object
     :param X_scaled: obj from scaling data
-    :param fam_df: df of cazy family freqs
+    :param fam_df: CazomeDataset, SparseFamFreqMatrix, or df of cazy family freqs
     :param first_pc: int, number of the first PC
     :param second_pc: int, number of the second PC
     :param group_by: how to group/colour data, genus or species
@@ -203,6 +218,10 @@ def plot_pca(
     
     Return plot
     """
+    fam_df = unpack_dataset(fam_df, 'fam_freq_matrix')
+    if isinstance(fam_df, SparseFamFreqMatrix):
+        # only the genome and tax labels are needed to group the genomes
+        fam_df = fam_df.index.to_frame(index=False)
     grouping = f"{group_by[0].upper()}{group_by[1:]}"
     X_pca = pca.transform(X_scaled)
     
@@ -358,7 +377,7 @@ def plot_loadings(
     """Build loadings plot
     
     :param pca: sklearn pca object
-    :param fam_df: cazy family frequncy df
+    :param fam_df: CazomeDataset, SparseFamFreqMatrix, or cazy family frequncy df
     :param first_pc: int, number of the first PC, e.g. PC1 == 1
     :param second_pc: int, number of the second PC e.g. PC2 == 2
     :param style: boolean, change shape of points depending on CAZy class
@@ -373,6 +392,7 @@ def plot_loadings(
     :param ax: axis, used to define axis in multiple plot to place figure
     
     Return nothing"""
+    fam_df = unpack_dataset(fam_df, 'fam_freq_matrix')
     sns.set(font_scale=font_scale)
 
     # calculate loading = variables x loadings, returns an array
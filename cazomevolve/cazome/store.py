@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Build and query a local, indexed store of CAZome annotations and taxonomic lineages
+
+The store is an SQLite3 database, built from the FGP (family - genome - protein) or
+FG (family - genome) tab delimited lists and the taxonomy CSV files compiled by cazomevolve.
+Genomes, families and proteins are stored once each, and every annotation references them
+by integer ID, so that look ups by genome, family, protein or tax rank use the indexes
+instead of scanning (or reloading) the tab delimited lists.
+"""
+
+
+import logging
+import sqlite3
+import sys
+
+from typing import List, Optional
+
+import pandas as pd
+
+from saintBioutils.utilities.logger import config_logger
+from tqdm import tqdm
+
+from cazomevolve import closing_message
+
+
+STORE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS genomes ("
+    "genome_id INTEGER PRIMARY KEY, "
+    "genome TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS families ("
+    "family_id INTEGER PRIMARY KEY, "
+    "family TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS proteins ("
+    "protein_id INTEGER PRIMARY KEY, "
+    "protein TEXT NOT NULL UNIQUE, "
+    "genome_id INTEGER NOT NULL REFERENCES genomes (genome_id))",
+    "CREATE TABLE IF NOT EXISTS lineages ("
+    "genome_id INTEGER NOT NULL REFERENCES genomes (genome_id), "
+    "rank TEXT NOT NULL, "
+    "tax TEXT, "
+    "PRIMARY KEY (genome_id, rank))",
+    "CREATE TABLE IF NOT EXISTS annotations ("
+    "genome_id INTEGER NOT NULL REFERENCES genomes (genome_id), "
+    "family_id INTEGER NOT NULL REFERENCES families (family_id), "
+    "protein_id INTEGER REFERENCES proteins (protein_id))",
+    "CREATE INDEX IF NOT EXISTS ix_annotations_genome ON annotations (genome_id, family_id)",
+    "CREATE INDEX IF NOT EXISTS ix_annotations_family ON annotations (family_id, genome_id)",
+    "CREATE INDEX IF NOT EXISTS ix_annotations_protein ON annotations (protein_id)",
+    "CREATE INDEX IF NOT EXISTS ix_proteins_genome ON proteins (genome_id)",
+    "CREATE INDEX IF NOT EXISTS ix_lineages_tax ON lineages (rank, tax)",
+)
+
+
+def build_main(args: Optional[List[str]] = None, logger: Optional[logging.Logger] = None):
+    if logger is None:
+        config_logger(args)
+    logger = logging.getLogger(__name__)
+
+    if (args.FGP_FILE is None) and (args.FG_FILE is None) and (args.tax_csv_path is None):
+        logger.warning(
+            "No data files provided\nPlease provide at least one file:\n"
+            "--FGP_FILE - tab delimited file with Fam Genome Protein \n"
+            "--FG_FILE - tab delimited file with Fam Genome\n"
+            "--tax_csv_path - CSV file of genomes and tax ranks"
+        )
+        sys.exit(1)
+
+    connection = connect_store(args.db)
+
+    fgp_genomes = set()  # genomes added from the FGP file, with their protein IDs
+    if args.FGP_FILE is not None:
+        logger.warning(f"Adding CAZome annotations from {args.FGP_FILE}")
+        fgp_genomes = add_cazome_data(connection, args.FGP_FILE, proteins=True, chunk_size=args.chunk_size)
+
+    if args.FG_FILE is not None:
+        logger.warning(f"Adding CAZome annotations from {args.FG_FILE}")
+        # keep the annotations (and protein IDs) of genomes just added from the FGP file
+        add_cazome_data(
+            connection,
+            args.FG_FILE,
+            proteins=False,
+            chunk_size=args.chunk_size,
+            skip_genomes=fgp_genomes,
+        )
+
+    if args.tax_csv_path is not None:
+        logger.warning(f"Adding taxonomic lineages from {args.tax_csv_path}")
+        add_tax_data(connection, args.tax_csv_path)
+
+    connection.execute("ANALYZE")
+    connection.commit()
+    connection.close()
+
+    closing_message('Store build', args)
+
+
+def query_main(args: Optional[List[str]] = None, logger: Optional[logging.Logger] = None):
+    if logger is None:
+        config_logger(args)
+    logger = logging.getLogger(__name__)
+
+    if args.db.exists() is False:
+        logger.warning(f"Could not find a CAZome store at {args.db}\nBuild a store with 'cazomevolve store build'")
+        sys.exit(1)
+
+    genomes = args.genomes
+    if args.genomes_file is not None:
+        genomes = list(genomes or []) + get_genomes_from_file(args.genomes_file)
+
+    ranks = None
+    if args.rank is not None:
+        ranks = {rank: tax for rank, tax in args.rank}
+
+    connection = connect_store(args.db)
+
+    if args.output == 'genomes':
+        query_df = pd.DataFrame({
+            'Genome': query_genomes(
+                connection,
+                genomes=genomes,
+                families=args.families,
+                proteins=args.proteins,
+                ranks=ranks,
+            )
+        })
+    elif args.output == 'counts':
+        query_df = query_fam_freqs(
+            connection,
+            genomes=genomes,
+            families=args.families,
+            proteins=args.proteins,
+            ranks=ranks,
+        )
+    else:
+        query_df = query_annotations(
+            connection,
+            genomes=genomes,
+            families=args.families,
+            proteins=args.proteins,
+            ranks=ranks,
+        )
+
+    connection.close()
+
+    logger.info(f"Retrieved {len(query_df)} rows from the CAZome store")
+
+    if args.outpath is None:
+        query_df.to_csv(sys.stdout, index=False)
+    else:
+        query_df.to_csv(args.outpath, index=False)
+
+
+def connect_store(db_path):
+    """Open a connection to the CAZome store, building the store if it does not exist
+
+    :param db_path: Path, path to the SQLite3 database file
+
+    Return sqlite3 connection
+    """
+    logger = logging.getLogger(__name__)
+
+    if db_path.exists() is False:
+        logger.warning(f"Building new CAZome store at {db_path}")
+
+    connection = sqlite3.connect(db_path)
+    for statement in STORE_SCHEMA:
+        connection.execute(statement)
+    connection.commit()
+
+    return connection
+
+
+def get_ids(connection, table, column, values):
+    """Retrieve the IDs of genomes/families, adding values not yet in the store
+
+    :param connection: sqlite3 connection to the CAZome store
+    :param table: str, 'genomes' or 'families'
+    :param column: str, 'genome' or 'family'
+    :param values: iterable of unique genomes or families
+
+    Return dict {value: id}
+    """
+    id_col = f"{column}_id"
+    connection.executemany(
+        f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)",
+        [(value,) for value in values],
+    )
+    ids = {}
+    for value, db_id in select_in(connection, f"SELECT {column}, {id_col} FROM {table}", column, list(values)):
+        ids[value] = db_id
+    return ids
+
+
+def select_in(connection, query, column, values, batch_size=500):
+    """Run a SELECT query filtered to rows whose column is in a list of values
+
+    The values are passed in batches to stay under the SQLite limit on the number of parameters.
+
+    :param connection: sqlite3 connection to the CAZome store
+    :param query: str, SELECT query without a WHERE clause
+    :param column: str, column to filter by
+    :param values: list of values
+    :param batch_size: int, number of values per query
+
+    Return list of rows
+    """
+    rows = []
+    for i in range(0, len(values), batch_size):
+        batch = values[i:i + batch_size]
+        rows += connection.execute(
+            f"{query} WHERE {column} IN ({','.join('?' * len(batch))})",
+            batch,
+        ).fetchall()
+    return rows
+
+
+def add_cazome_data(connection, fgp_file, proteins=True, chunk_size=1000000, skip_genomes=None):
+    """Add the CAZome annotations from a FGP or FG tab delimited list to the store
+
+    The annotations of genomes already in the store are replaced by the annotations
+    listed in the file.
+
+    :param connection: sqlite3 connection to the CAZome store
+    :param fgp_file: Path, path to the FGP (or FG) tab delimited list
+    :param proteins: bool, the file lists protein IDs (FGP). If False, the file is a FG list
+    :param chunk_size: int, number of rows to read and add at a time
+    :param skip_genomes: set of genomes whose annotations in the store are kept, and whose
+        rows in the file are not added, e.g. genomes added from a FGP file in the same build
+
+    Return set of genomes added from the file
+    """
+    if skip_genomes is None:
+        skip_genomes = set()
+
+    columns = ['Family', 'Genome', 'Protein'] if proteins else ['Family', 'Genome']
+
+    replaced_genomes = set()  # genomes whose annotations have already been cleared
+
+    reader = pd.read_table(
+        fgp_file,
+        header=None,
+        usecols=list(range(len(columns))),
+        dtype=str,
+        chunksize=chunk_size,
+    )
+    for chunk in tqdm(reader, desc=f"Adding chunks of {fgp_file.name}"):
+        chunk.columns = columns
+        if proteins:
+            chunk = chunk.drop_duplicates()
+        # else each row of a FG list is one annotation, so repeated rows are the family frequency
+        chunk = chunk[~chunk['Genome'].isin(skip_genomes)]
+        if len(chunk) == 0:
+            continue
+
+        genome_ids = get_ids(connection, 'genomes', 'genome', chunk['Genome'].unique())
+        family_ids = get_ids(connection, 'families', 'family', chunk['Family'].unique())
+
+        new_genomes = [genome_ids[genome] for genome in chunk['Genome'].unique() if genome not in replaced_genomes]
+        connection.executemany("DELETE FROM annotations WHERE genome_id = ?", [(_,) for _ in new_genomes])
+        replaced_genomes.update(chunk['Genome'].unique())
+
+        chunk_genome_ids = chunk['Genome'].map(genome_ids)
+        chunk_family_ids = chunk['Family'].map(family_ids)
+
+        if proteins:
+            prot_df = chunk[['Protein']].assign(genome_id=chunk_genome_ids).drop_duplicates('Protein')
+            connection.executemany(
+                "INSERT INTO proteins (protein, genome_id) VALUES (?, ?) "
+                "ON CONFLICT (protein) DO UPDATE SET genome_id = excluded.genome_id",
+                [(prot, int(genome_id)) for prot, genome_id in prot_df.itertuples(index=False)],
+            )
+            protein_ids = dict(select_in(
+                connection,
+                "SELECT protein, protein_id FROM proteins",
+                'protein',
+                list(prot_df['Protein']),
+            ))
+            chunk_protein_ids = chunk['Protein'].map(protein_ids)
+            rows = zip(chunk_genome_ids, chunk_family_ids, chunk_protein_ids)
+        else:
+            rows = zip(chunk_genome_ids, chunk_family_ids, [None] * len(chunk))
+
+        connection.executemany(
+            "INSERT INTO annotations (genome_id, family_id, protein_id) VALUES (?, ?, ?)",
+            [
+                (int(genome_id), int(family_id), None if protein_id is None else int(protein_id))
+                for genome_id, family_id, protein_id in rows
+            ],
+        )
+        connection.commit()
+
+    return replaced_genomes
+
+
+def add_tax_data(connection, tax_csv_path):
+    """Add (or replace) the taxonomic lineages of genomes in the store
+
+    :param connection: sqlite3 connection to the CAZome store
+    :param tax_csv_path: Path, path to CSV file with a 'Genome' column and one column per tax rank,
+        as written by cazomevolve add_taxs
+
+    Return nothing
+    """
+    tax_df = pd.read_csv(tax_csv_path, dtype=str)
+    tax_df = tax_df.drop([col for col in tax_df.columns if col.startswith('Unnamed')], axis=1)
+    ranks = [col for col in tax_df.columns if col != 'Genome']
+
+    genome_ids = get_ids(connection, 'genomes', 'genome', tax_df['Genome'].unique())
+
+    lineage_rows = []
+    for row in tax_df.itertuples(index=False):
+        row = row._asdict()
+        for rank in ranks:
+            tax = row[rank]
+            lineage_rows.append((genome_ids[row['Genome']], rank, None if pd.isna(tax) else tax))
+
+    connection.executemany(
+        "INSERT OR REPLACE INTO lineages (genome_id, rank, tax) VALUES (?, ?, ?)",
+        lineage_rows,
+    )
+    connection.commit()
+
+
+def get_genomes_from_file(genomes_file):
+    """Parse a plain text file of genomic accessions, one genome per line
+
+    :param genomes_file: Path, path to the file
+
+    Return list of genomes
+    """
+    with open(genomes_file, 'r') as fh:
+        return [line.strip() for line in fh if len(line.strip()) != 0]
+
+
+def build_filters(genomes=None, families=None, proteins=None, ranks=None):
+    """Build the WHERE clause selecting annotations of interest
+
+    :param genomes: list of genomes
+    :param families: list of CAZy families
+    :param proteins: list of protein IDs
+    :param ranks: dict {rank: tax}, e.g. {'Genus': 'Dickeya'}
+
+    Return tuple, (str WHERE clause, list of parameters)
+    """
+    clauses, params = [], []
+
+    if genomes is not None:
+        clauses.append(f"g.genome IN ({','.join('?' * len(genomes))})")
+        params += list(genomes)
+    if families is not None:
+        clauses.append(f"f.family IN ({','.join('?' * len(families))})")
+        params += list(families)
+    if proteins is not None:
+        clauses.append(f"p.protein IN ({','.join('?' * len(proteins))})")
+        params += list(proteins)
+    if ranks is not None:
+        for rank, tax in ranks.items():
+            clauses.append("a.genome_id IN (SELECT genome_id FROM lineages WHERE rank = ? AND tax = ?)")
+            params += [rank, tax]
+
+    if len(clauses) == 0:
+        return "", params
+    return f" WHERE {' AND '.join(clauses)}", params
+
+
+def query_annotations(connection, genomes=None, families=None, proteins=None, ranks=None):
+    """Retrieve the CAZome annotations matching all of the given criteria
+
+    :param connection: sqlite3 connection to the CAZome store
+    :param genomes: list of genomes, or None to not filter by genome
+    :param families: list of CAZy families, or None to not filter by family
+    :param proteins: list of protein IDs, or None to not filter by protein
+    :param ranks: dict {rank: tax}, e.g. {'Genus': 'Dickeya'}, or None to not filter by lineage
+
+    Return pandas df with the columns 'Genome', 'Family' and 'Protein'
+    """
+    where, params = build_filters(genomes, families, proteins, ranks)
+    rows = connection.execute(
+        "SELECT g.genome, f.family, p.protein FROM annotations a "
+        "JOIN genomes g ON g.genome_id = a.genome_id "
+        "JOIN families f ON f.family_id = a.family_id "
+        f"LEFT JOIN proteins p ON p.protein_id = a.protein_id{where} "
+        "ORDER BY g.genome, f.family, p.protein",
+        params,
+    ).fetchall()
+    return pd.DataFrame(rows, columns=['Genome', 'Family', 'Protein'])
+
+
+def query_genomes(connection, genomes=None, families=None, proteins=None, ranks=None):
+    """Retrieve the genomes with at least one CAZome annotation matching all of the given criteria
+
+    E.g. the genomes in the genus Dickeya containing GH28: families=['GH28'], ranks={'Genus': 'Dickeya'}
+
+    Parameters are the same as for query_annotations()
+
+    Return sorted list of genomes
+    """
+    where, params = build_filters(genomes, families, proteins, ranks)
+    rows = connection.execute(
+        "SELECT DISTINCT g.genome FROM annotations a "
+        "JOIN genomes g ON g.genome_id = a.genome_id "
+        "JOIN families f ON f.family_id = a.family_id "
+        f"LEFT JOIN proteins p ON p.protein_id = a.protein_id{where} "
+        "ORDER BY g.genome",
+        params,
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def query_fam_freqs(connection, genomes=None, families=None, proteins=None, ranks=None):
+    """Retrieve the number of annotations per CAZy family for each genome matching the given criteria
+
+    Parameters are the same as for query_annotations()
+
+    Return pandas df with a 'Genome' column and one column per CAZy family (sorted), one row per genome
+    """
+    where, params = build_filters(genomes, families, proteins, ranks)
+    rows = connection.execute(
+        "SELECT g.genome, f.family, COUNT(*) FROM annotations a "
+        "JOIN genomes g ON g.genome_id = a.genome_id "
+        "JOIN families f ON f.family_id = a.family_id "
+        f"LEFT JOIN proteins p ON p.protein_id = a.protein_id{where} "
+        "GROUP BY g.genome, f.family",
+        params,
+    ).fetchall()
+    counts_df = pd.DataFrame(rows, columns=['Genome', 'Family', 'Count'])
+
+    fam_freq_df = counts_df.pivot(index='Genome', columns='Family', values='Count').fillna(0).astype(int)
+    fam_freq_df = fam_freq_df.sort_index(axis=0).sort_index(axis=1)
+    fam_freq_df.columns.name = None
+
+    return fam_freq_df.reset_index()
@@ -50,10 +50,30 @@ from Bio import Entrez
 from saintBioutils.utilities.logger import config_logger
 from tqdm import tqdm
 
+from cazomevolve.taxs.lineage_cache import (
+    add_lineages_to_cache,
+    connect_lineage_cache,
+    get_cached_lineages,
+    get_gtdb_source,
+)
 from cazomevolve.taxs.ncbi import add_ncbi_taxs
+from cazomevolve.taxs.taxdump import add_taxdump_taxs
+from cazomevolve.utilities.caching import get_cache_path, load_cached_df, write_cached_df
 from cazomevolve import closing_message
 
 
+# prefix of each rank in GTDB lineages
+GTDB_PREFIXES = {
+    'Kingdom': 'd__',
+    'Phylum': 'p__',
+    'Class': 'c__',
+    'Order': 'o__',
+    'Family': 'f__',
+    'Genus': 'g__',
+    'Species': 's__',
+}
+
+
 def main(args: Optional[List[str]] = None, logger: Optional[logging.Logger] = None):
     if logger is None:
         config_logger(args)
@@ -91,22 +111,45 @@ def main(args: Optional[List[str]] = None, logger: Optional[logging.Logger] = No
         logger.warning("Must specify at least one rank of lineage to be included")
         sys.exit(1)
 
+    if (args.taxdump is not None) and (args.acc_taxids is None):
+        logger.warning(
+            "A taxdump was provided but no table of genomic accessions and tax IDs\n"
+            "Please provide a table of accessions and tax IDs using --acc_taxids"
+        )
+        sys.exit(1)
+
+    cache = None
+    if args.cache is not None:
+        cache = connect_lineage_cache(args.cache)
+
     gtdb_df = load_gtdb_df(col_names, args)
 
     # gather tax info
     # genomes_tax_dict set of genomic acc to query ncbi with to get the latest tax classification
     # genomes_to_query, dict {genome: f"genome_{tax}_{tax}"}
-    genomes_tax_dict, genomes_to_query = add_gtdb_taxs(gtdb_df, col_names, args)
+    genomes_tax_dict, genomes_to_query = add_gtdb_taxs(gtdb_df, col_names, args, cache=cache)
+
+    if (len(genomes_to_query) > 0) and (args.taxdump is not None):
+        logger.warning(f"Retrieving taxonomic lineages from the NCBI taxdump for {len(genomes_to_query)} genomes")
+        genomes_tax_dict = add_taxdump_taxs(genomes_tax_dict, genomes_to_query, col_names, args)
 
-    if len(genomes_to_query) > 0:
+    elif len(genomes_to_query) > 0:
         logger.warning(f"Retrieving taxonomic lineages from NCBI for {len(genomes_to_query)} genomes")
-        genomes_tax_dict = add_ncbi_taxs(genomes_tax_dict, genomes_to_query, col_names, args)
+        genomes_tax_dict = add_ncbi_taxs(genomes_tax_dict, genomes_to_query, col_names, args, cache=cache)
+
+    if cache is not None:
+        cache.close()
     
-    if args.FGP_FILE is not None:
-        write_tab_lists(args.FGP_FILE, genomes_tax_dict, col_names)
+    if args.normalised:
+        # the tax data is only written to the CSV file, once per genome
+        logger.warning("Not writing tab delimited lists with tax data. Tax data is written to the CSV file only")
 
-    if args.FG_FILE is not None:
-        write_tab_lists(args.FG_FILE, genomes_tax_dict, col_names)
+    else:
+        if args.FGP_FILE is not None:
+            write_tab_lists(args.FGP_FILE, genomes_tax_dict, col_names)
+
+        if args.FG_FILE is not None:
+            write_tab_lists(args.FG_FILE, genomes_tax_dict, col_names)
 
     # write out CSV file as well
     write_out_csv(genomes_tax_dict, col_names, args)
@@ -117,6 +160,9 @@ def main(args: Optional[List[str]] = None, logger: Optional[logging.Logger] = No
 def load_gtdb_df(col_names, args):
     """Loading in the GTDB database dump (TSV file) into a pandas dataframe.
 
+    The parsed dataframe is cached as a Feather file next to the GTDB TSV file, keyed by the hash 
+    of the TSV file and the selected lineage ranks, and is reloaded from the cache in later runs.
+
     :param col_names: list of column names, genomes and all tax levels of interest
     :param args: CLI-args parser
 
@@ -131,50 +177,52 @@ def load_gtdb_df(col_names, args):
         for col_name in col_names:
             gtdb_data[col_name] = []
         gtdb_df = pd.DataFrame(gtdb_data)
-    
-    else:
-        gtdb_data = []
-        dl_gtdb_df = pd.read_table(args.gtdb)
-        dl_gtdb_df.columns = ['Genome', 'Tax']
+        return gtdb_df
+
+    if args.no_gtdb_cache is False:
+        cache_path = get_cache_path([args.gtdb], col_names)
+        gtdb_df = load_cached_df(cache_path)
+        if gtdb_df is not None:
+            return gtdb_df
+
+    gtdb_df = parse_gtdb_df(args.gtdb, col_names)
+
+    if args.no_gtdb_cache is False:
+        write_cached_df(gtdb_df, cache_path)
+
+    return gtdb_df
 
-        # separate output tax into genus and species
-        for ri in tqdm(range(len(dl_gtdb_df)), desc="Parsing GTDB data"):
-        # for ri in tqdm(range(len(dl_gtdb_df)), desc="Parsing GTDB data"):
-            genome_taxonomy = [dl_gtdb_df.iloc[ri]['Genome']]
-            genome_taxonomy = [_.replace("RS_","").replace("GB_","").strip() for _ in genome_taxonomy]
 
-            tax_info = dl_gtdb_df.iloc[ri]['Tax'].split(";")
-            for data in tax_info:
-                if args.kingdom and (data.strip().startswith('d__')):
-                    genome_taxonomy.append(data.replace('d__','').strip())
+def parse_gtdb_df(gtdb_path, col_names):
+    """Parse the genomic accessions and lineages from the GTDB database dump (TSV file)
 
-                elif args.phylum and (data.strip().startswith('p__')):
-                    genome_taxonomy.append(data.replace('p__','').strip())
+    :param gtdb_path: Path, path to GTDB TSV file
+    :param col_names: list of column names, genomes and all tax levels of interest
 
-                elif args.tax_class and (data.strip().startswith('c__')):
-                    genome_taxonomy.append(data.replace('c__','').strip())
+    Return pandas df, one column per item in col_names. Lineage ranks are stored as categoricals
+    """
+    dl_gtdb_df = pd.read_table(gtdb_path)
+    dl_gtdb_df.columns = ['Genome', 'Tax']
 
-                elif args.tax_order and (data.strip().startswith('o__')):
-                    genome_taxonomy.append(data.replace('o__','').strip())
+    gtdb_df = pd.DataFrame(
+        {'Genome': dl_gtdb_df['Genome'].str.replace("RS_", "").str.replace("GB_", "").str.strip()}
+    )
 
-                elif args.tax_family and (data.strip().startswith('f__')):
-                    genome_taxonomy.append(data.replace('f__','').strip())
+    # separate output tax into each rank
+    for col_name in col_names[1:]:
+        rank_data = dl_gtdb_df['Tax'].str.extract(rf"(?:^|;)\s*{GTDB_PREFIXES[col_name]}([^;]*)")[0]
+        rank_data = rank_data.str.strip()
 
-                elif args.genus and (data.strip().startswith('g__')):
-                    genome_taxonomy.append(data.replace('g__','').strip())
+        if col_name == 'Species':
+            # remove genus from species name
+            rank_data = rank_data.str.split(" ", n=1).str[1].fillna("")
 
-                elif args.species and (data.strip().startswith('s__')):
-                    species = " ".join(data.strip().split(" ")[1:])  # remove genus from species name
-                    genome_taxonomy.append(species)
+        gtdb_df[col_name] = rank_data.astype('category')
 
-            gtdb_data.append(genome_taxonomy)
-            
-        gtdb_df = pd.DataFrame(gtdb_data, columns=col_names)
-    
     return gtdb_df
 
 
-def add_gtdb_taxs(gtdb_df, col_names, args):
+def add_gtdb_taxs(gtdb_df, col_names, args, cache=None):
     """
     Build dict of genome: tax using GTDB data 
     AND identify genomes to query ncbi with to get the latest tax classification
@@ -182,33 +230,38 @@ def add_gtdb_taxs(gtdb_df, col_names, args):
     :param gtdb_df: pandas df with a genome col, and one col per tax level of interest
     :param col_names: list of col names, including Genomes and one col per tax level of interest
     :param args: CLI args parser
+    :param cache: sqlite3 connection to the lineage cache. If provided, genomes with lineages from the
+        same GTDB release in the cache are not retrieved from gtdb_df, and newly retrieved lineages are
+        added to the cache
 
     Return
         :var genomes_tax_dict: dict {genome: f'{genome}_{tax}'}
         :var genomes_to_query: set, genomes accs to query ncbi with
     """
     logger = logging.getLogger(__name__)
-    all_genomes = []
+    all_genomes = set()
 
     if args.FGP_FILE is not None:
-        df = pd.read_table(args.FGP_FILE, header=None)
-        df.columns = ['Fam', 'Genome', 'Protein']
-        all_genomes += list(df['Genome'])
+        all_genomes.update(get_tab_list_genomes(args.FGP_FILE))
 
     if args.FG_FILE is not None:
-        df = pd.read_table(args.FG_FILE, header=None)
-        df.columns = ['Fam', 'Genome']
-        all_genomes += list(df['Genome'])
-
-    all_genomes = set(all_genomes)
+        all_genomes.update(get_tab_list_genomes(args.FG_FILE))
 
     genome_tax_dict = {}
     genomes_to_query = set()
+    new_lineages = {}  # lineages not retrieved from the cache
 
     if len(gtdb_df) == 0:
         return {}, all_genomes  # query all genomes against NCBI
 
+    if cache is not None:
+        genome_tax_dict = get_cached_lineages(cache, all_genomes, col_names, get_gtdb_source(args.gtdb))
+        logger.warning(f"Retrieved GTDB lineages for {len(genome_tax_dict)} genomes from the lineage cache")
+
     for genome in tqdm(all_genomes, desc="Getting GTDB tax"):
+        if genome in genome_tax_dict:
+            continue  # retrieved from the cache
+
         g_rows = gtdb_df[gtdb_df['Genome'] == genome]
         if len(g_rows) == 0:
             # try alternative acc
@@ -228,18 +281,42 @@ def add_gtdb_taxs(gtdb_df, col_names, args):
                 continue
         
         tax = f"{genome}_"
-        for col_name in col_names:
+        for col_name in col_names[1:]:  # skip 'Genome'
             tax_info = g_rows.iloc[0][col_name]
             tax += f"{tax_info}_"
 
         genome_tax_dict[genome] = tax[:-1]  # drop terminal '_' underscore
+        new_lineages[genome] = genome_tax_dict[genome]
+
+    if cache is not None:
+        add_lineages_to_cache(cache, new_lineages, col_names, get_gtdb_source(args.gtdb))
 
     return genome_tax_dict, genomes_to_query
         
 
+def get_tab_list_genomes(file_path):
+    """Retrieve the unique genomic accessions listed in a tab delimited list (FG or FGP file)
+
+    The file is read line by line.
+
+    :param file_path: path to tab delimited list
+
+    Return set of genomic accessions
+    """
+    genomes = set()
+    with open(file_path, 'r') as fh:
+        for line in fh:
+            data = line.rstrip("\n").split("\t", 2)
+            if len(data) > 1:
+                genomes.add(data[1])
+    return genomes
+
+
 def write_tab_lists(file_path, genomes_tax_dict, col_names):
     """Write out data to tad delimited lists
 
+    The input file is read, and the output file written, line by line.
+
     :param file_path: path to tab delimited list
     :param genomes_tax_dict: dict {genome: f'{genome}_{tax}'}
     :param col_names: list, lineage ranks
@@ -249,33 +326,31 @@ def write_tab_lists(file_path, genomes_tax_dict, col_names):
     # FGP or FG
     logger = logging.getLogger(__name__)
 
-    with open(file_path, 'r') as fh:
-        data_lines = fh.read().splitlines()
-
-    all_data = []
-    for line in data_lines:
-        new_data = line.split("\t")
-        try:
-            # fam = new_data[0]
-            # genome_acc = new_data[1]
-            # protein = new_data[2]
-            new_data[1] = genomes_tax_dict[new_data[1]]  # get tax info for the genomic acc
-        except KeyError:
-            logger.warning(f"Could not retrieve tax data for {new_data[1]}")
-            genome = f"{new_data[1]}_"
-            for rank in col_names:
-                genome += f"NaN_"
-            new_data[1] = genome[:-1]  # replace the acc with f'{genome}_{tax}_{tax}'
-        all_data.append(new_data)
-
     output_path = file_path.parent / f"{file_path.name}_taxs"
 
     logger.warning(f"Writing to {output_path}")
 
-    with open(output_path, 'w') as fh:
-        for line in all_data:
-            data = '\t'.join(line)
-            fh.write(f"{data}\n")
+    missing_genomes = set()  # genomes without tax data, only log once per genome
+
+    with open(file_path, 'r') as in_fh, open(output_path, 'w') as out_fh:
+        for line in in_fh:
+            new_data = line.rstrip("\n").split("\t")
+            try:
+                # fam = new_data[0]
+                # genome_acc = new_data[1]
+                # protein = new_data[2]
+                new_data[1] = genomes_tax_dict[new_data[1]]  # get tax info for the genomic acc
+            except KeyError:
+                if new_data[1] not in missing_genomes:
+                    logger.warning(f"Could not retrieve tax data for {new_data[1]}")
+                    missing_genomes.add(new_data[1])
+                genome = f"{new_data[1]}_"
+                for rank in col_names[1:]:  # skip the 'Genome' column
+                    genome += f"NaN_"
+                new_data[1] = genome[:-1]  # replace the acc with f'{genome}_{tax}_{tax}'
+
+            data = '\t'.join(new_data)
+            out_fh.write(f"{data}\n")
 
 
 def write_out_csv(genomes_tax_dict, col_names, args):
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Persistent local cache of taxonomic lineages retrieved for genomes
+
+The cache is an SQLite3 database with one row per genome and selection of lineage ranks,
+recording the source the lineage was retrieved from (a GTDB release or the date NCBI was queried).
+"""
+
+
+import logging
+import sqlite3
+
+from datetime import datetime
+
+
+# max number of genomes per query, below the SQLite limit on the number of parameters
+LOOKUP_BATCH_SIZE = 500
+
+
+def connect_lineage_cache(db_path):
+    """Open a connection to the lineage cache, building the cache if it does not exist
+
+    :param db_path: Path, path to the SQLite3 database file
+
+    Return sqlite3 connection
+    """
+    logger = logging.getLogger(__name__)
+
+    if db_path.exists() is False:
+        logger.warning(f"Building new lineage cache at {db_path}")
+
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS lineages ("
+        "genome TEXT NOT NULL, "
+        "ranks TEXT NOT NULL, "
+        "source TEXT NOT NULL, "
+        "lineage TEXT NOT NULL, "
+        "date_added TEXT NOT NULL, "
+        "PRIMARY KEY (genome, ranks))"
+    )
+    connection.commit()
+
+    return connection
+
+
+def get_ncbi_source():
+    """Return str, source label for lineages retrieved from NCBI today"""
+    return f"NCBI {datetime.now().strftime('%Y-%m-%d')}"
+
+
+def get_gtdb_source(gtdb_path):
+    """Return str, source label for lineages retrieved from a GTDB release (named by the GTDB TSV file)"""
+    return f"GTDB {gtdb_path.name}"
+
+
+def get_cached_lineages(connection, genomes, col_names, source_prefix):
+    """Retrieve cached lineages for genomes
+
+    :param connection: sqlite3 connection to the lineage cache
+    :param genomes: set of genomic accessions
+    :param col_names: list of lineage ranks, including 'Genome'
+    :param source_prefix: str, only retrieve lineages whose source starts with this prefix,
+        e.g. 'NCBI' or 'GTDB bac120_taxonomy_r214.tsv'
+
+    Return dict {genome: f"{genome}_{tax}"}
+    """
+    ranks = ",".join(col_names)
+    genomes = list(genomes)
+
+    cached_lineages = {}
+    # look up the genomes in batches using the (genome, ranks) primary key, and compare the 
+    # source prefix literally, so '_' and '%' in GTDB file names are not treated as wildcards
+    for start in range(0, len(genomes), LOOKUP_BATCH_SIZE):
+        batch = genomes[start:start + LOOKUP_BATCH_SIZE]
+        cursor = connection.execute(
+            "SELECT genome, lineage FROM lineages "
+            f"WHERE genome IN ({', '.join('?' * len(batch))}) AND ranks = ? AND substr(source, 1, ?) = ?",
+            (*batch, ranks, len(source_prefix), source_prefix),
+        )
+        for genome, lineage in cursor:
+            cached_lineages[genome] = lineage
+
+    return cached_lineages
+
+
+def add_lineages_to_cache(connection, genomes_tax_dict, col_names, source):
+    """Add (or replace) lineages in the cache
+
+    :param connection: sqlite3 connection to the lineage cache
+    :param genomes_tax_dict: dict {genome: f"{genome}_{tax}"}
+    :param col_names: list of lineage ranks, including 'Genome'
+    :param source: str, source of the lineages
+
+    Return nothing
+    """
+    ranks = ",".join(col_names)
+    date_added = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    connection.executemany(
+        "INSERT OR REPLACE INTO lineages (genome, ranks, source, lineage, date_added) VALUES (?, ?, ?, ?, ?)",
+        [
+            (genome, ranks, source, genomes_tax_dict[genome], date_added)
+            for genome in genomes_tax_dict
+        ],
+    )
+    connection.commit()
@@ -47,21 +47,45 @@ from Bio import Entrez
 from saintBioutils.genbank import entrez_retry
 from tqdm import tqdm
 
+from cazomevolve.taxs.lineage_cache import add_lineages_to_cache, get_cached_lineages, get_ncbi_source
+from cazomevolve.taxs.taxdump import NCBI_RANKS
 
-def add_ncbi_taxs(genomes_tax_dict, genomes_to_query, col_names, args):
+
+NCBI_BATCH_SIZE = 200  # max number of IDs to include in a single Entrez call
+
+
+def add_ncbi_taxs(genomes_tax_dict, genomes_to_query, col_names, args, cache=None):
     """Query NCBI to get the taxonomic classification and add to {genome: f"{genome}_{tax}"}
 
     :param genomes_tax_dict: dict, {genome: f"{genome}_{tax}"}  - genomes with tax classification in gtdb
     :param genomes_to_query: set of genomic acc to query ncbi with to get tax classification
     :param col_names: list of lineage ranks
     :param args: cli args parser
+    :param cache: sqlite3 connection to the lineage cache. If provided, genomes with lineages from NCBI
+        in the cache are not queried against NCBI, and newly retrieved lineages are added to the cache
 
     Return genomes_tax_dict
     """
+    logger = logging.getLogger(__name__)
+
+    if cache is not None:
+        cached_lineages = get_cached_lineages(cache, set(genomes_to_query), col_names, 'NCBI')
+        logger.warning(f"Retrieved NCBI lineages for {len(cached_lineages)} genomes from the lineage cache")
+        genomes_tax_dict.update(cached_lineages)
+        genomes_to_query = [genome for genome in genomes_to_query if genome not in cached_lineages]
+
     taxids_genomes, failed_genomes = get_tax_ids(genomes_to_query, args)
 
     genomes_tax_dict, failed_genomes = get_ncbi_taxs(taxids_genomes, genomes_tax_dict, failed_genomes, col_names, args)
 
+    if cache is not None:
+        failed = set(failed_genomes)
+        new_lineages = {}
+        for genome in genomes_to_query:
+            if (genome not in failed) and (genome in genomes_tax_dict):
+                new_lineages[genome] = genomes_tax_dict[genome]
+        add_lineages_to_cache(cache, new_lineages, col_names, get_ncbi_source())
+
     for genome in failed_genomes:
         genomes_tax_dict[genome] = f"{genome}_"
         for name in col_names[1:]:
@@ -71,52 +95,46 @@ def add_ncbi_taxs(genomes_tax_dict, genomes_to_query, col_names, args):
     return genomes_tax_dict
 
 
-def get_tax_ids(genomes, args):
+def get_tax_ids(genomes, args, batch_size=NCBI_BATCH_SIZE):
     """Get NCBI Tax IDs for  genomes.
 
+    Genomes are queried against NCBI Assembly in batches. Genomes whose tax ID could
+    not be retrieved in a batch are retried individually.
+
     :param genomes: list of genomic assembly accessions
     :param args: cli args parser
+    :param batch_size: int, max number of genomes to query per batch
 
     Return dict of {tax id: {genomes}} and list of genomes for which tax records could not be retrieved
     """
-    logger = logging.getLogger(__name__)
     taxids_genomes = {}  # {tax id: {genomes}}
     failed_genomes = []
 
-    for genome in tqdm(genomes, desc="Getting tax ids"):
-        # retrieve the ID of corresponding record in NCBI Assembly
-        try:
-            with entrez_retry(
-                args.retries,
-                Entrez.esearch,
-                db="Assembly",
-                term=genome,
-            ) as accession_handle:
-                record_meta_data = Entrez.read(accession_handle, validate=False)
-        except (TypeError, AttributeError) as error:
-            logger.warning(f"Could not retrieve tax data for {genome}")
-            failed_genomes.append(genome)
-            continue
+    genomes = list(genomes)
+    batches = [genomes[i:i + batch_size] for i in range(0, len(genomes), batch_size)]
 
-        genome_record_id = record_meta_data['IdList'][0]
+    genomes_to_retry = []
+    for batch in tqdm(batches, desc="Getting tax ids"):
+        batch_taxids = get_batch_tax_ids(batch, args)
 
-        # Fetch the record from the Assembly db, by querying by the record ID
-        try:
-            with entrez_retry(
-                args.retries,
-                Entrez.efetch,
-                db="Assembly",
-                id=genome_record_id,
-                rettype="docsum",
-            ) as accession_handle:
-                accession_record = Entrez.read(accession_handle, validate=False)
-        except (TypeError, AttributeError) as error:
-            logger.warning(f"Could not fetch tax data for {genome}\nError:{error}")
+        for genome in batch:
+            try:
+                taxid = batch_taxids[genome]
+            except KeyError:
+                genomes_to_retry.append(genome)
+                continue
+
+            try:
+                taxids_genomes[taxid].add(genome)
+            except KeyError:
+                taxids_genomes[taxid] = {genome}
+
+    for genome in tqdm(genomes_to_retry, desc="Retrying failed tax ids"):
+        taxid = get_genome_tax_id(genome, args)
+        if taxid is None:
             failed_genomes.append(genome)
             continue
-        
-        taxid = accession_record['DocumentSummarySet']['DocumentSummary'][0]['Taxid']
-        
+
         try:
             taxids_genomes[taxid].add(genome)
         except KeyError:
@@ -125,71 +143,216 @@ def get_tax_ids(genomes, args):
     return taxids_genomes, failed_genomes
 
 
-def get_ncbi_taxs(taxids_genomes, genomes_tax_dict, failed_genomes, col_names, args):
+def get_batch_tax_ids(genomes, args):
+    """Get NCBI Tax IDs for a batch of genomes, using a single search, post and summary call
+    to NCBI Assembly.
+
+    :param genomes: list of genomic assembly accessions
+    :param args: cli args parser
+
+    Return dict {genome: taxid}. Genomes for which no tax ID was retrieved are not included.
+    """
+    logger = logging.getLogger(__name__)
+
+    # retrieve the IDs of the corresponding records in NCBI Assembly
+    query = " OR ".join([f"{genome}[Assembly Accession]" for genome in genomes])
+    try:
+        with entrez_retry(
+            args.retries,
+            Entrez.esearch,
+            db="Assembly",
+            term=query,
+            retmax=len(genomes) * 2,  # GenBank and RefSeq records may both be returned
+        ) as search_handle:
+            search_results = Entrez.read(search_handle, validate=False)
+    except (TypeError, AttributeError) as error:
+        logger.warning(f"Could not retrieve Assembly IDs for batch of {len(genomes)} genomes\nError:{error}")
+        return {}
+
+    record_ids = search_results['IdList']
+    if len(record_ids) == 0:
+        return {}
+
+    # post the record IDs to the history server and retrieve the document summaries
+    try:
+        with entrez_retry(
+            args.retries,
+            Entrez.epost,
+            db="Assembly",
+            id=",".join(record_ids),
+        ) as post_handle:
+            post_results = Entrez.read(post_handle, validate=False)
+    except (TypeError, AttributeError) as error:
+        logger.warning(f"Could not post Assembly IDs for batch of {len(genomes)} genomes\nError:{error}")
+        return {}
+
+    try:
+        with entrez_retry(
+            args.retries,
+            Entrez.esummary,
+            db="Assembly",
+            query_key=post_results['QueryKey'],
+            WebEnv=post_results['WebEnv'],
+            retmax=len(record_ids),
+        ) as summary_handle:
+            summary_results = Entrez.read(summary_handle, validate=False)
+    except (TypeError, AttributeError) as error:
+        logger.warning(f"Could not fetch Assembly records for batch of {len(genomes)} genomes\nError:{error}")
+        return {}
+
+    # map each version of the accession (GenBank and RefSeq) to the tax ID
+    acc_taxids = {}
+    for doc_summary in summary_results['DocumentSummarySet']['DocumentSummary']:
+        taxid = doc_summary['Taxid']
+        acc_taxids[doc_summary['AssemblyAccession']] = taxid
+        for synonym in ['Genbank', 'RefSeq']:
+            try:
+                acc_taxids[doc_summary['Synonym'][synonym]] = taxid
+            except KeyError:
+                pass
+
+    genome_taxids = {}
+    for genome in genomes:
+        try:
+            genome_taxids[genome] = acc_taxids[genome]
+        except KeyError:
+            pass
+
+    return genome_taxids
+
+
+def get_genome_tax_id(genome, args):
+    """Get the NCBI Tax ID for a single genome.
+
+    :param genome: str, genomic assembly accession
+    :param args: cli args parser
+
+    Return str, tax id, or None if the tax ID could not be retrieved
+    """
+    logger = logging.getLogger(__name__)
+
+    # retrieve the ID of corresponding record in NCBI Assembly
+    try:
+        with entrez_retry(
+            args.retries,
+            Entrez.esearch,
+            db="Assembly",
+            term=genome,
+        ) as accession_handle:
+            record_meta_data = Entrez.read(accession_handle, validate=False)
+    except (TypeError, AttributeError) as error:
+        logger.warning(f"Could not retrieve tax data for {genome}")
+        return None
+
+    try:
+        genome_record_id = record_meta_data['IdList'][0]
+    except IndexError:
+        logger.warning(f"Could not find {genome} in NCBI Assembly")
+        return None
+
+    # Fetch the record from the Assembly db, by querying by the record ID
+    try:
+        with entrez_retry(
+            args.retries,
+            Entrez.efetch,
+            db="Assembly",
+            id=genome_record_id,
+            rettype="docsum",
+        ) as accession_handle:
+            accession_record = Entrez.read(accession_handle, validate=False)
+    except (TypeError, AttributeError) as error:
+        logger.warning(f"Could not fetch tax data for {genome}\nError:{error}")
+        return None
+
+    return accession_record['DocumentSummarySet']['DocumentSummary'][0]['Taxid']
+
+
+def get_ncbi_taxs(taxids_genomes, genomes_tax_dict, failed_genomes, col_names, args, batch_size=NCBI_BATCH_SIZE):
     """Retrieve lineage data from NCBI Taxonomy db
 
+    Tax records are fetched from NCBI Taxonomy in batches of tax IDs.
+
     :param taxid_genomes: dict {taxid: {genomes}}
     :param genomes_tax_dict: dict, {genome: f"{genome}_{tax}"}  - genomes with tax classification in gtdb
     :param failed_genomes: list of genomes for which tax data could not be retrieved from NCBI
     :param col_names: list of lineage ranks to retrieve
     :param args: cli args parser
+    :param batch_size: int, max number of tax IDs to fetch per call to NCBI
 
     Return genomes_tax_dict {genome: f"{genome}_{tax}"}
     """
     logger = logging.getLogger(__name__)
 
-    ranks = []
-    if 'Kingdom' in col_names:
-        ranks.append('superkingdom')
-    if 'Phylum' in col_names:
-        ranks.append('phylum')
-    if 'Class' in col_names:
-        ranks.append('class')
-    if 'Order' in col_names:
-        ranks.append('order')
-    if 'Family' in col_names:
-        ranks.append('family')
-    if 'Genus' in col_names:
-        ranks.append('genus')
+    # lineage ranks retrieved from the LineageEx of the records, in order from Kingdom to Genus
     # retrieve species from scientific name (minus genus)
+    lineage_ranks = [col_name for col_name in NCBI_RANKS if col_name in col_names]
 
-    for taxid in tqdm(taxids_genomes, desc="Getting taxonomies"):
+    taxids = list(taxids_genomes.keys())
+    batches = [taxids[i:i + batch_size] for i in range(0, len(taxids), batch_size)]
+
+    for batch in tqdm(batches, desc="Getting taxonomies"):
         try:
             with entrez_retry(
                 args.retries,
                 Entrez.efetch,
                 db="Taxonomy",
-                id=taxid,
-                # rettype="docsum",
+                id=",".join(batch),
             ) as handle:
-                tax_record = Entrez.read(handle, validate=False)
+                tax_records = Entrez.read(handle, validate=False)
         except (TypeError, AttributeError) as error:
-            logger.warning(f"Could not fetch tax data for {genome}\nError:{error}")
-            for genome in taxids_genomes[taxid]:
-                failed_genomes.append(genome)
+            logger.warning(f"Could not fetch tax data for batch of {len(batch)} tax IDs\nError:{error}")
+            for taxid in batch:
+                for genome in taxids_genomes[taxid]:
+                    failed_genomes.append(genome)
             continue
-        tax_info = {}
-        for rank in ranks:
-            added = False
-            for feature in tax_record[0]['LineageEx']:
-                if feature['Rank'] == rank:
-                    tax_info[rank] = feature['ScientificName']
-                    added = True
-                    break
-            if added is False:
-                tax_info[rank] = 'NaN'
-
-        for genome in taxids_genomes[taxid]:
-            genome_tax = f"{genome}_"
-            for rank in tax_info:
-                genome_tax += f"{tax_info[rank]}_"
+
+        # map records back to the requested tax IDs, including tax IDs that were merged into the record
+        batch_records = {}
+        for tax_record in tax_records:
+            batch_records[tax_record['TaxId']] = tax_record
+            for aka_taxid in tax_record.get('AkaTaxIds', []):
+                batch_records[aka_taxid] = tax_record
+
+        for taxid in batch:
+            try:
+                tax_record = batch_records[taxid]
+            except KeyError:
+                logger.warning(f"Could not retrieve tax record for tax ID {taxid}")
+                for genome in taxids_genomes[taxid]:
+                    failed_genomes.append(genome)
+                continue
+
+            lineage = get_lineage(tax_record)
+
+            genome_tax = ""
+            for col_name in lineage_ranks:
+                tax = 'NaN'
+                for rank in NCBI_RANKS[col_name]:
+                    if rank in lineage:
+                        tax = lineage[rank]
+                        break
+                genome_tax += f"{tax}_"
 
             if 'Species' in col_names:
-                scientific_name = tax_record[0]['ScientificName']
+                scientific_name = tax_record['ScientificName']
                 genome_tax += f'{" ".join(scientific_name.split(" ")[1:])}_'
 
             genome_tax = genome_tax[:-1]
 
-            genomes_tax_dict[genome] = genome_tax
+            for genome in taxids_genomes[taxid]:
+                genomes_tax_dict[genome] = f"{genome}_{genome_tax}"
 
     return genomes_tax_dict, failed_genomes
+
+
+def get_lineage(tax_record):
+    """Build a map of rank to scientific name from the lineage of an NCBI Taxonomy record
+
+    :param tax_record: dict, NCBI Taxonomy record parsed by Entrez.read
+
+    Return dict {rank: scientific name}
+    """
+    lineage = {}
+    for feature in tax_record['LineageEx']:
+        lineage[feature['Rank']] = feature['ScientificName']
+    return lineage
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Retrieve taxonomic classifications from a local NCBI Taxonomy database dump (taxdump)
+
+The NCBI taxdump can be downloaded from https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/
+"""
+
+
+import logging
+
+import numpy as np
+
+from tqdm import tqdm
+
+
+# NCBI Taxonomy ranks corresponding to each lineage rank (column name)
+# NCBI renamed the 'superkingdom' rank to 'domain' in 2025, so both are accepted
+NCBI_RANKS = {
+    'Kingdom': ['superkingdom', 'domain'],
+    'Phylum': ['phylum'],
+    'Class': ['class'],
+    'Order': ['order'],
+    'Family': ['family'],
+    'Genus': ['genus'],
+}
+
+
+class TaxDump:
+    """NCBI Taxonomy tree loaded from the nodes.dmp and names.dmp files of an NCBI taxdump.
+
+    The tree is stored as arrays indexed by tax ID, listing the parent tax ID and the
+    rank of each node. Lineages are memoised per tax ID.
+    """
+
+    def __init__(self, nodes_path, names_path):
+        """Load the taxonomy tree
+
+        :param nodes_path: Path, path to nodes.dmp
+        :param names_path: Path, path to names.dmp
+        """
+        self.ranks = []  # rank names, indexed by rank code
+        self.parents, self.rank_codes = self._load_nodes(nodes_path)
+        self.names = self._load_names(names_path)
+        self._lineages = {}  # {taxid: {rank: scientific name}}
+
+    def _load_nodes(self, nodes_path):
+        """Parse nodes.dmp into arrays of parent tax IDs and rank codes, indexed by tax ID"""
+        rank_codes = {}
+        taxids, parents, ranks = [], [], []
+
+        with open(nodes_path, 'r') as fh:
+            for line in tqdm(fh, desc="Loading taxdump nodes"):
+                data = line.split("\t|\t", 3)
+                taxids.append(int(data[0]))
+                parents.append(int(data[1]))
+                try:
+                    ranks.append(rank_codes[data[2]])
+                except KeyError:
+                    rank_codes[data[2]] = len(self.ranks)
+                    self.ranks.append(data[2])
+                    ranks.append(rank_codes[data[2]])
+
+        max_taxid = max(taxids) if len(taxids) != 0 else 0
+        parent_array = np.full(max_taxid + 1, -1, dtype=np.int32)
+        rank_array = np.full(max_taxid + 1, -1, dtype=np.int16)
+        parent_array[taxids] = parents
+        rank_array[taxids] = ranks
+
+        return parent_array, rank_array
+
+    def _load_names(self, names_path):
+        """Parse the scientific names from names.dmp
+
+        Return dict {taxid: scientific name}
+        """
+        names = {}
+        with open(names_path, 'r') as fh:
+            for line in tqdm(fh, desc="Loading taxdump names"):
+                if not line.rstrip("\t|\n").endswith("scientific name"):
+                    continue
+                data = line.split("\t|\t", 2)
+                names[int(data[0])] = data[1]
+        return names
+
+    def get_rank(self, taxid):
+        """Return the rank of the tax ID, or None if the tax ID is not in the tree"""
+        if (taxid < 0) or (taxid >= len(self.rank_codes)) or (self.rank_codes[taxid] == -1):
+            return None
+        return self.ranks[self.rank_codes[taxid]]
+
+    def get_lineage(self, taxid):
+        """Retrieve the lineage of a tax ID
+
+        :param taxid: int, NCBI tax ID
+
+        Return dict {rank: scientific name}, or None if the tax ID is not in the tree
+        """
+        if self.get_rank(taxid) is None:
+            return None
+
+        # walk up the tree until reaching the root or a node with a memoised lineage
+        path = []
+        node = taxid
+        while (node not in self._lineages) and (self.get_rank(node) is not None):
+            path.append(node)
+            parent = int(self.parents[node])
+            if parent == node:  # root
+                break
+            node = parent
+
+        lineage = dict(self._lineages.get(node, {}))
+
+        # build lineages back down the path, memoising each node
+        for node in reversed(path):
+            rank = self.ranks[self.rank_codes[node]]
+            if rank != 'no rank':
+                lineage[rank] = self.names.get(node, 'NaN')
+            self._lineages[node] = dict(lineage)
+
+        return self._lineages[taxid]
+
+
+def add_taxdump_taxs(genomes_tax_dict, genomes_to_query, col_names, args):
+    """Retrieve taxonomic classifications from a local NCBI taxdump and add to {genome: f"{genome}_{tax}"}
+
+    :param genomes_tax_dict: dict, {genome: f"{genome}_{tax}"}  - genomes with tax classification in gtdb
+    :param genomes_to_query: set of genomic acc to retrieve tax classifications for
+    :param col_names: list of lineage ranks
+    :param args: cli args parser
+
+    Return genomes_tax_dict
+    """
+    logger = logging.getLogger(__name__)
+
+    taxdump = TaxDump(args.taxdump / "nodes.dmp", args.taxdump / "names.dmp")
+    acc_taxids = load_acc_taxids(args.acc_taxids)
+
+    for genome in tqdm(genomes_to_query, desc="Getting taxdump taxs"):
+        genome_tax = f"{genome}_"
+
+        taxid = get_acc_taxid(genome, acc_taxids)
+        lineage = None
+        if taxid is not None:
+            lineage = taxdump.get_lineage(taxid)
+
+        if lineage is None:
+            logger.warning(f"Could not retrieve tax data for {genome} from the taxdump")
+            for name in col_names[1:]:
+                genome_tax += "NaN_"
+            genomes_tax_dict[genome] = genome_tax[:-1]
+            continue
+
+        for col_name in col_names[1:]:
+            if col_name == 'Species':
+                # retrieve species from scientific name (minus genus)
+                scientific_name = taxdump.names.get(taxid, '')
+                genome_tax += f'{" ".join(scientific_name.split(" ")[1:])}_'
+                continue
+
+            tax = 'NaN'
+            for rank in NCBI_RANKS[col_name]:
+                try:
+                    tax = lineage[rank]
+                    break
+                except KeyError:
+                    pass
+            genome_tax += f"{tax}_"
+
+        genomes_tax_dict[genome] = genome_tax[:-1]
+
+    return genomes_tax_dict
+
+
+def load_acc_taxids(acc_taxids_path):
+    """Load table of genomic accessions and NCBI tax IDs
+
+    Accepts either the NCBI assembly_summary.txt file (accession in the first column, tax ID
+    in the sixth column, and paired GenBank/RefSeq accession in the eighteenth column), or
+    a two column tab delimited file of accession and tax ID.
+
+    :param acc_taxids_path: Path, path to tab delimited file
+
+    Return dict {accession: int(taxid)}
+    """
+    acc_taxids = {}
+
+    with open(acc_taxids_path, 'r') as fh:
+        for line in fh:
+            if line.startswith("#") or (len(line.strip()) == 0):
+                continue
+            data = line.rstrip("\n").split("\t")
+
+            if len(data) == 2:
+                acc_taxids[data[0].strip()] = int(data[1])
+                continue
+
+            taxid = int(data[5])
+            acc_taxids[data[0]] = taxid
+            if (len(data) > 17) and (data[17].startswith("GC")):
+                acc_taxids[data[17]] = taxid
+
+    return acc_taxids
+
+
+def get_acc_taxid(genome, acc_taxids):
+    """Retrieve the tax ID for a genome, trying the alternative (GenBank/RefSeq) accession
+    if the genome is not listed
+
+    :param genome: str, genomic accession
+    :param acc_taxids: dict {accession: taxid}
+
+    Return int, taxid or None
+    """
+    try:
+        return acc_taxids[genome]
+    except KeyError:
+        pass
+
+    if genome.startswith('GCA'):
+        alt_genome = genome.replace('GCA_', 'GCF_')
+    else:
+        alt_genome = genome.replace('GCF_', 'GCA_')
+
+    return acc_taxids.get(alt_genome)
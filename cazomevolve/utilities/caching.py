@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Cache parsed data as columnar (Feather) files next to the source files they were parsed from"""
+
+
+import hashlib
+import logging
+
+from pyarrow import feather
+
+
+def hash_file(file_path, chunk_size=2**20):
+    """Calculate the MD5 hash of a file
+
+    :param file_path: Path, path to file
+    :param chunk_size: int, number of bytes to read at a time
+
+    Return str, hex digest
+    """
+    file_hash = hashlib.md5()
+    with open(file_path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_cache_path(source_paths, keys, cache_dir=None):
+    """Build path to the cache file for data parsed from the source file(s)
+
+    The name of the cache file includes a hash of the content of the source files and the
+    keys (e.g. selected lineage ranks), so changes to either result in a new cache file.
+
+    :param source_paths: list of Paths, paths to the files the data was parsed from
+    :param keys: list of str, additional values the parsed data depends on
+    :param cache_dir: Path, dir to write the cache file to. If None, uses the parent dir
+        of the first source file
+
+    Return Path
+    """
+    cache_key = hashlib.md5()
+    for source_path in source_paths:
+        cache_key.update(hash_file(source_path).encode())
+    for key in keys:
+        cache_key.update(str(key).encode())
+
+    if cache_dir is None:
+        cache_dir = source_paths[0].parent
+
+    return cache_dir / f".{source_paths[0].name}.{cache_key.hexdigest()}.feather"
+
+
+def load_cached_df(cache_path):
+    """Load a dataframe from a cache file, memory mapping the file
+
+    :param cache_path: Path, path to the cache file
+
+    Return pandas df, or None if the cache file does not exist or could not be read
+    """
+    logger = logging.getLogger(__name__)
+
+    if cache_path.exists() is False:
+        return None
+
+    try:
+        df = feather.read_table(cache_path, memory_map=True).to_pandas()
+    except Exception as err:
+        logger.warning(f"Could not read cache file {cache_path}\nError: {err}\nWill parse the source file(s)")
+        return None
+
+    logger.warning(f"Loaded cached data from {cache_path}")
+    return df
+
+
+def write_cached_df(df, cache_path, compression='zstd'):
+    """Write a dataframe to a cache file.
+
+    The index is not retained.
+
+    :param df: pandas df
+    :param cache_path: Path, path to the cache file
+    :param compression: str, compression to use ('zstd', 'lz4' or 'uncompressed')
+
+    Return nothing
+    """
+    logger = logging.getLogger(__name__)
+
+    try:
+        df.reset_index(drop=True).to_feather(cache_path, compression=compression)
+    except OSError as err:
+        logger.warning(f"Could not write cache file {cache_path}\nError: {err}")
+        return
+
+    logger.warning(f"Cached parsed data in {cache_path}")
@@ -80,6 +80,60 @@ def build_parser(
         help="Path to gtdb database download TSV file (from https://data.gtdb.ecogenomic.org/)",
     )
 
+    parser.add_argument(
+        "--normalised",
+        dest="normalised",
+        action="store_true",
+        default=False,
+        help=(
+            "Do not write copies of the tab delimited lists with the tax data added to every line.\n"
+            "Tax data is only written to the CSV file, once per genome"
+        ),
+    )
+
+    parser.add_argument(
+        "--no_gtdb_cache",
+        dest="no_gtdb_cache",
+        action="store_true",
+        default=False,
+        help=(
+            "Do not cache the parsed GTDB data.\n"
+            "By default the parsed GTDB data is cached next to the GTDB TSV file, and reloaded in later runs"
+        ),
+    )
+
+    parser.add_argument(
+        "--taxdump",
+        type=Path,
+        default=None,
+        help=(
+            "Path to dir containing an NCBI taxdump (nodes.dmp and names.dmp).\n"
+            "If provided, NCBI lineages are retrieved from the taxdump instead of querying NCBI.\n"
+            "Requires --acc_taxids"
+        ),
+    )
+
+    parser.add_argument(
+        "--acc_taxids",
+        type=Path,
+        default=None,
+        help=(
+            "Path to NCBI assembly_summary.txt file, or a tab delimited file of genomic accessions "
+            "and NCBI tax IDs. Used with --taxdump"
+        ),
+    )
+
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=None,
+        help=(
+            "Path to local SQLite3 database of previously retrieved lineages.\n"
+            "Lineages are retrieved from GTDB/NCBI only for genomes not in the cache, and are then added to the cache.\n"
+            "The database is created if it does not exist"
+        ),
+    )
+
     parser.add_argument(
         "--outpath",
         type=Path,
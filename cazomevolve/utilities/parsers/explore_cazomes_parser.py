@@ -52,12 +52,13 @@ class ValidateFormats(Action):
     def __call__(self, parser, args, values, option_string=None):
         valid_formats = ['png', 'pdf', 'svg']
         invalid = False
-        if values[0] not in valid_formats:
-            invalid = True
-            raise ValueError(f'Invalid file format "{values[0]}" provided. Accepted formats: {valid_formats}')
+        for value in values:
+            if value not in valid_formats:
+                invalid = True
+                raise ValueError(f'Invalid file format "{value}" provided. Accepted formats: {valid_formats}')
         if invalid:
             sys.exit(1)
-        setattr(args, self.dest, values[0])
+        setattr(args, self.dest, list(values))
 
 
 def build_parser(
@@ -103,8 +104,34 @@ def build_parser(
     parser.add_argument(
         "--group_by",
         type=str,
-        default='Genus',
-        help="Taxonomic rank to group data by. Default: Genus. Will calculate means and SDs for these groups",
+        nargs='+',
+        default=['Genus'],
+        help=(
+            "Taxonomic rank(s) to group data by. Default: Genus. Will calculate means and SDs for these groups.\n"
+            "Names must match the tax rank columns, e.g. Genus Species.\n"
+            "If multiple ranks are given, the data is loaded and summarised once, and the output of each rank\n"
+            "is written to a subdirectory of the output dir named after the rank"
+        ),
+    )
+
+    parser.add_argument(
+        "--min_group_prevalence",
+        type=float,
+        default=None,
+        help=(
+            "Min fraction of genomes in a group that must contain a family for the family to be group specific,\n"
+            "e.g. 0.9. By default a family is group specific if it is present in at least one genome in the group"
+        ),
+    )
+
+    parser.add_argument(
+        "--max_other_prevalence",
+        type=float,
+        default=None,
+        help=(
+            "Max fraction of genomes outside of a group that may contain a group specific family, e.g. 0.05.\n"
+            "By default a group specific family must be absent from all other groups"
+        ),
     )
 
     parser.add_argument(
@@ -114,10 +141,38 @@ def build_parser(
         choices=['png', 'pdf', 'svg'],
         nargs='+',
         type=str,
-        default='pdf',
+        default=['pdf'],
         help="File formats to write out figures. Can specify multiple foramts. Default write out all figures in PDF foramt",
     )
 
+    parser.add_argument(
+        "--clustermap_group_means",
+        dest="clustermap_group_means",
+        action="store_true",
+        default=False,
+        help=(
+            "Plot the mean frequency of each CAZy family per group (see --group_by) in the CAZy family clustermap,\n"
+            "instead of one row per genome. Use for very large data sets"
+        ),
+    )
+
+    parser.add_argument(
+        "--clustermap_max_labels",
+        type=int,
+        default=500,
+        help=(
+            "Max number of rows to label in the CAZy family clustermap. Above this number of rows,\n"
+            "the labels are not drawn and the heatmap cells are rasterised"
+        ),
+    )
+
+    parser.add_argument(
+        "--clustermap_max_size",
+        type=float,
+        default=200,
+        help="Max width and height (inches) of the CAZy family clustermap",
+    )
+
     parser.add_argument(
         "--kingdom",
         dest="kingdom",
@@ -174,6 +229,97 @@ def build_parser(
         help=" Taxonomy CSV file contains species lineage",
     )
 
+    parser.add_argument(
+        "--core_threshold",
+        type=float,
+        default=1.0,
+        help="Min fraction of genomes containing a family for the family to be in the core CAZome. Default: 1.0",
+    )
+
+    parser.add_argument(
+        "--soft_core_threshold",
+        type=float,
+        default=0.95,
+        help="Min fraction of genomes containing a family for the family to be in the soft core CAZome. Default: 0.95",
+    )
+
+    parser.add_argument(
+        "--shell_threshold",
+        type=float,
+        default=0.15,
+        help=(
+            "Min fraction of genomes containing a family for the family to be in the shell CAZome. Default: 0.15\n"
+            "Families present in fewer genomes are in the cloud CAZome"
+        ),
+    )
+
+    parser.add_argument(
+        "--near_cooccurrence_threshold",
+        type=float,
+        default=None,
+        help=(
+            "Min Jaccard similarity of the genomes containing two families for the families to be nearly always\n"
+            "present together, e.g. 0.9. Modules of nearly always co-occurring families are found using MinHash and LSH,\n"
+            "and written to cooccurring_families/near_cooccurring_families.csv. Default: None, not identified"
+        ),
+    )
+
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=None,
+        help=(
+            "Read the FGP file in chunks of this many rows, to analyse FGP files larger than the memory.\n"
+            "The rows of each genome must be listed together in the FGP file (as written by cazomevolve).\n"
+            "By default the entire FGP file is loaded into memory"
+        ),
+    )
+
+    parser.add_argument(
+        "--no_cache",
+        dest="no_cache",
+        action="store_true",
+        default=False,
+        help=(
+            "Do not cache the merged FGP and taxonomy data.\n"
+            "By default the merged data is cached next to the FGP file, and reloaded in later runs,\n"
+            "and the clustering of the CAZy family clustermap is cached in the output dir"
+        ),
+    )
+
+    parser.add_argument(
+        "--state_dir",
+        type=Path,
+        default=None,
+        help=(
+            "Path to dir to write the summaries of the genomes and the running statistics per group to.\n"
+            "Use with --update in later runs to add new genomes without reanalysing the entire data set"
+        ),
+    )
+
+    parser.add_argument(
+        "--update",
+        dest="update",
+        action="store_true",
+        default=False,
+        help=(
+            "Add the genomes in the FGP file to the data set saved in --state_dir, update the running statistics,\n"
+            "and rewrite the outputs for the entire data set. Genomes already in the data set are skipped"
+        ),
+    )
+
+    parser.add_argument(
+        "--rebuild_fam_freqs",
+        dest="rebuild_fam_freqs",
+        action="store_true",
+        default=False,
+        help=(
+            "With --update, rebuild the CAZy family frequencies per genome and the clustermap from all genomes\n"
+            "in the saved data set, which loads the summaries of every genome. By default, the per genome frequencies of\n"
+            "the previous run are deleted, and the clustermap is plotted from the mean frequency of each family per group"
+        ),
+    )
+
     parser.add_argument(
         "--show_plots",
         dest="show_plots",
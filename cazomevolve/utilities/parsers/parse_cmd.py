@@ -62,6 +62,8 @@ from cazomevolve.utilities.parsers import (
     get_dbcan_parser,
     add_taxs_parser,
     explore_cazomes_parser,
+    store_parser,
+    query_parser,
 )
 
 
@@ -138,6 +140,10 @@ def build_parser(argv: Optional[List] = None) -> Namespace:
     # explroe cazomes
     explore_cazomes_parser.build_parser(subparsers)
 
+    # store and query cazomes
+    store_parser.build_parser(subparsers)
+    query_parser.build_parser(subparsers)
+
     # Parse arguments
     # The list comprehension is to allow PosixPaths to be defined and passed in testing
     if argv is None:
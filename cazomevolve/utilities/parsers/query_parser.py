@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Build args parser for querying the CAZome store"""
+
+
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, _SubParsersAction
+from pathlib import Path
+from typing import List, Optional
+
+from cazomevolve.cazome import store
+
+
+def build_parser(
+    subps: _SubParsersAction, parents: Optional[List[ArgumentParser]] = None
+) -> None:
+    """Return ArgumentParser parser for script."""
+    # Create parser object
+    parser = subps.add_parser(
+        "query", formatter_class=ArgumentDefaultsHelpFormatter
+    )
+
+    # Add positional arguments to parser
+    parser.add_argument(
+        "db",
+        type=Path,
+        help="Path to the local SQLite3 CAZome store built with 'cazomevolve store build'",
+    )
+
+    parser.add_argument(
+        "--genomes",
+        type=str,
+        nargs='+',
+        default=None,
+        help="Genomic accessions to retrieve data for",
+    )
+
+    parser.add_argument(
+        "--genomes_file",
+        type=Path,
+        default=None,
+        help="Path to plain text file of genomic accessions to retrieve data for, one genome per line",
+    )
+
+    parser.add_argument(
+        "--families",
+        type=str,
+        nargs='+',
+        default=None,
+        help="CAZy families to retrieve data for",
+    )
+
+    parser.add_argument(
+        "--proteins",
+        type=str,
+        nargs='+',
+        default=None,
+        help="Protein IDs to retrieve data for",
+    )
+
+    parser.add_argument(
+        "--rank",
+        type=str,
+        nargs=2,
+        action="append",
+        metavar=("RANK", "TAX"),
+        default=None,
+        help=(
+            "Only retrieve data for genomes in this taxon, e.g. '--rank Genus Dickeya'.\n"
+            "Can be given multiple times"
+        ),
+    )
+
+    parser.add_argument(
+        "--output",
+        type=str,
+        choices=['annotations', 'genomes', 'counts'],
+        default='annotations',
+        help=(
+            "Data to return. 'annotations': genome, family and protein of each matching annotation. "
+            "'genomes': genomes with at least one matching annotation. "
+            "'counts': number of matching annotations per family per genome"
+        ),
+    )
+
+    parser.add_argument(
+        "--outpath",
+        type=Path,
+        default=None,
+        help="Path to write out CSV of results. Else, the results are written to STDOUT",
+    )
+
+    # Add option to specific directory for log to be written out to
+    parser.add_argument(
+        "-l",
+        "--log",
+        type=Path,
+        metavar="log file name",
+        default=None,
+        help="Defines log file name and/or path",
+    )
+
+    # Add option to specify verbose logging
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        action="store_true",
+        default=False,
+        help="Set logger level to 'INFO'",
+    )
+
+    parser.set_defaults(func=store.query_main)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+# Author:
+# Emma E. M. Hobbs
+
+# Contact
+# eemh1@st-andrews.ac.uk
+
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Build args parser for the CAZome store subcommands"""
+
+
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, _SubParsersAction
+from pathlib import Path
+from typing import List, Optional
+
+from cazomevolve.cazome import store
+
+
+def build_parser(
+    subps: _SubParsersAction, parents: Optional[List[ArgumentParser]] = None
+) -> None:
+    """Return ArgumentParser parser for script."""
+    # Create parser object
+    parser = subps.add_parser(
+        "store", formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    store_subps = parser.add_subparsers(
+        title="store subcommands", description="Valid store subcommands", dest="store_command",
+    )
+    store_subps.required = True
+
+    build_store_parser(store_subps)
+
+
+def build_store_parser(subps: _SubParsersAction) -> None:
+    """Add parser for building the CAZome store"""
+    parser = subps.add_parser(
+        "build", formatter_class=ArgumentDefaultsHelpFormatter
+    )
+
+    # Add positional arguments to parser
+    parser.add_argument(
+        "db",
+        type=Path,
+        help="Path to the local SQLite3 CAZome store. The store is created if it does not exist",
+    )
+
+    parser.add_argument(
+        "--FGP_FILE",
+        type=Path,
+        default=None,
+        help="Path to tab delim list of family-genome-protein",
+    )
+
+    parser.add_argument(
+        "--FG_FILE",
+        type=Path,
+        default=None,
+        help="Path to tab delim list of family-genome",
+    )
+
+    parser.add_argument(
+        "--tax_csv_path",
+        type=Path,
+        default=None,
+        help="Path to CSV file of genomes and tax ranks (e.g. from cazomevolve add_taxs)",
+    )
+
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=1000000,
+        help="Number of rows of the tab delimited lists to read and add to the store at a time",
+    )
+
+    # Add option to specific directory for log to be written out to
+    parser.add_argument(
+        "-l",
+        "--log",
+        type=Path,
+        metavar="log file name",
+        default=None,
+        help="Defines log file name and/or path",
+    )
+
+    # Add option to specify verbose logging
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        action="store_true",
+        default=False,
+        help="Set logger level to 'INFO'",
+    )
+
+    parser.set_defaults(func=store.build_main)
@@ -98,6 +98,7 @@ setuptools.setup(
         "ncbi-genome-download",
         "numpy",
         "pandas",
+        "pyarrow",
         "saintbioutils",
         "scikit-learn",
         "scipy",
@@ -52,7 +52,7 @@ from argparse import Namespace
 
 from saintBioutils.utilities import logger
 
-from cazomevolve.taxs import add_taxs
+from cazomevolve.taxs import add_taxs, lineage_cache
 
 
 @pytest.fixture
@@ -72,6 +72,11 @@ def argsdict(test_input_dir):
         genus=True,
         species=True,
         gtdb=None,
+        no_gtdb_cache=True,
+        normalised=False,
+        taxdump=None,
+        acc_taxids=None,
+        cache=None,
     )}
 
 
@@ -156,6 +161,21 @@ def test_add_tax_main(argsdict, monkeypatch):
     add_taxs.main(args=argsdict['args'])
 
 
+def test_add_tax_main_taxdump_no_acc(argsdict, test_input_dir, monkeypatch):
+    """Test when a taxdump is provided without a table of accessions and tax IDs"""
+    def mock_return_none(*args, **kwards):
+        return
+
+    monkeypatch.setattr(logger, "config_logger", mock_return_none)
+    monkeypatch.setattr(add_taxs, "config_logger", mock_return_none)
+
+    argsdict['args'].taxdump = test_input_dir / "taxdump"
+
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        add_taxs.main(args=argsdict['args'])
+    assert pytest_wrapped_e.type == SystemExit
+
+
 def test_load_gtdb_none(argsdict, col_names):
     """args.gtdb = None"""
     data = {'Genome': [], 'Kingdom': [], 'Genus': [], 'Species': []}
@@ -182,6 +202,21 @@ def test_load_gtdb(argsdict, col_names, gtdb_path):
     assert len(new_df) == len(df)
 
 
+def test_load_gtdb_cached(argsdict, col_names, gtdb_path, tmp_path):
+    """Test the parsed GTDB data is cached, and reloaded from the cache"""
+    gtdb_copy = tmp_path / gtdb_path.name
+    gtdb_copy.write_bytes(gtdb_path.read_bytes())
+
+    argsdict['args'].gtdb = gtdb_copy
+    argsdict['args'].no_gtdb_cache = False
+
+    new_df = add_taxs.load_gtdb_df(col_names, argsdict['args'])
+    assert len(list(tmp_path.glob(".*.feather"))) == 1
+
+    cached_df = add_taxs.load_gtdb_df(col_names, argsdict['args'])
+    assert cached_df.equals(new_df)
+
+
 def test_add_taxs(argsdict, col_names, test_input_dir):
     _path = test_input_dir / "gtdb/parsed_gtdb.csv"
     df = pd.read_csv(_path, index_col="Unnamed: 0")
@@ -194,3 +229,69 @@ def test_add_taxs(argsdict, col_names, test_input_dir):
     out1, out2 = add_taxs.add_gtdb_taxs(df, col_names, argsdict['args'])
     assert out1 == {}
     assert out2 == {'GCA_003382565.3'}
+
+
+def test_add_taxs_cache(argsdict, col_names, test_input_dir, tmp_path):
+    """Test genomes in the lineage cache are not retrieved from the GTDB df"""
+    _path = test_input_dir / "gtdb/parsed_gtdb.csv"
+    df = pd.read_csv(_path, index_col="Unnamed: 0")
+
+    argsdict['args'].gtdb = test_input_dir / "gtdb/gtdb_data.tsv"
+
+    cache = lineage_cache.connect_lineage_cache(tmp_path / "cache.db")
+    lineage_cache.add_lineages_to_cache(
+        cache,
+        {'GCA_003382565.3': 'GCA_003382565.3_Bacteria_Pectobacterium_versatile'},
+        col_names,
+        lineage_cache.get_gtdb_source(argsdict['args'].gtdb),
+    )
+
+    out1, out2 = add_taxs.add_gtdb_taxs(df, col_names, argsdict['args'], cache=cache)
+    cache.close()
+    assert out1 == {'GCA_003382565.3': 'GCA_003382565.3_Bacteria_Pectobacterium_versatile'}
+    assert out2 == set()
+
+
+def test_get_tab_list_genomes(argsdict):
+    assert add_taxs.get_tab_list_genomes(argsdict['args'].FGP_FILE) == {'GCA_003382565.3'}
+    assert add_taxs.get_tab_list_genomes(argsdict['args'].FG_FILE) == {'GCA_003382565.3'}
+
+
+def test_write_tab_lists(argsdict, col_names, tmp_path):
+    fgp_path = tmp_path / "FGP_FILE"
+    fgp_path.write_text("GH1\tGCA_1.1\tPROT1\nGH2\tGCA_2.1\tPROT2\nGH3\tGCA_2.1\tPROT3\n")
+
+    add_taxs.write_tab_lists(fgp_path, {'GCA_1.1': 'GCA_1.1_Bacteria_Dickeya_dadantii'}, col_names)
+
+    with open(tmp_path / "FGP_FILE_taxs", "r") as fh:
+        assert fh.read() == (
+            "GH1\tGCA_1.1_Bacteria_Dickeya_dadantii\tPROT1\n"
+            "GH2\tGCA_2.1_NaN_NaN_NaN\tPROT2\n"
+            "GH3\tGCA_2.1_NaN_NaN_NaN\tPROT3\n"
+        )
+
+    # one field for the genome and for each lineage rank, whether or not tax data was retrieved
+    with open(tmp_path / "FGP_FILE_taxs", "r") as fh:
+        for line in fh:
+            assert len(line.split("\t")[1].split("_")) == len(col_names) + 1  # accessions contain an '_'
+
+
+def test_add_tax_main_normalised(argsdict, monkeypatch):
+    """Test the tab delimited lists are not rewritten when writing normalised output"""
+    def mock_return_none(*args, **kwards):
+        return
+    def mock_get_gtdb(*args, **kwards):
+        return {}, []
+    def mock_write_tab_lists(*args, **kwards):
+        raise AssertionError("Tab delimited lists should not be written")
+
+    monkeypatch.setattr(logger, "config_logger", mock_return_none)
+    monkeypatch.setattr(add_taxs, "config_logger", mock_return_none)
+    monkeypatch.setattr(add_taxs, "load_gtdb_df", mock_return_none)
+    monkeypatch.setattr(add_taxs, "add_gtdb_taxs", mock_get_gtdb)
+    monkeypatch.setattr(add_taxs, "write_tab_lists", mock_write_tab_lists)
+    monkeypatch.setattr(add_taxs, "write_out_csv", mock_return_none)
+    monkeypatch.setattr(add_taxs, "closing_message", mock_return_none)
+
+    argsdict['args'].normalised = True
+    add_taxs.main(args=argsdict['args'])
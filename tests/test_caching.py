@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+#
+# Author:
+# Emma E. M. Hobbs
+#
+# Contact
+# eemh1@st-andrews.ac.uk
+#
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+"""Test utilities module caching.py
+
+These test are intened to be run from the root of the repository using:
+pytest -v
+"""
+
+
+import pytest
+import pandas as pd
+
+from cazomevolve.utilities import caching
+
+
+def test_cache_path_keys(tmp_path):
+    source = tmp_path / "source.tsv"
+    source.write_text("GCA_1.1\tGH1\n")
+
+    path_1 = caching.get_cache_path([source], ['Genus'])
+    assert path_1.parent == tmp_path
+    assert path_1 != caching.get_cache_path([source], ['Genus', 'Species'])
+
+    source.write_text("GCA_1.1\tGH2\n")
+    assert path_1 != caching.get_cache_path([source], ['Genus'])
+
+
+def test_write_load_cached_df(tmp_path):
+    df = pd.DataFrame({'Genome': ['GCA_1.1', 'GCA_2.1'], 'Genus': ['Dickeya', 'Dickeya']})
+    df['Genus'] = df['Genus'].astype('category')
+    cache_path = tmp_path / ".cache.feather"
+
+    assert caching.load_cached_df(cache_path) is None
+    caching.write_cached_df(df, cache_path)
+    assert caching.load_cached_df(cache_path).equals(df)
@@ -47,6 +47,8 @@ pytest -v
 
 import logging
 import pytest
+
+import pandas as pd
 import numpy as np
 
 from argparse import Namespace
@@ -77,6 +79,10 @@ def argsdict(test_input_dir, test_output_dir):
         tax_family=True,
         genus=True,
         species=True,
+        group_by='Genus',
+        chunk_size=None,
+        update=False,
+        state_dir=None,
     )}
 
 
@@ -114,6 +120,8 @@ def test_get_dbcan_main(argsdict, monkeypatch):
 
     monkeypatch.setattr(explore_cazomes, "make_output_directory", mock_none) 
     monkeypatch.setattr(explore_cazomes, "load_data", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "CazomeDataset", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "summarise_fgp_df", mock_none) 
     monkeypatch.setattr(explore_cazomes, "compare_cazome_sizes", mock_none) 
     monkeypatch.setattr(explore_cazomes, "compare_cazy_classes", mock_none) 
     monkeypatch.setattr(explore_cazomes, "compare_cazy_families", mock_compare_fams) # needs three 
@@ -124,6 +132,106 @@ def test_get_dbcan_main(argsdict, monkeypatch):
     explore_cazomes.main(args=argsdict['args'], logger=logging.getLogger(__name__))
 
 
+def test_get_dbcan_main_multiple_ranks(argsdict, monkeypatch):
+    ranks = []
+
+    def mock_none(*args, **kwards):
+        return
+
+    def mock_compare_fams(fgp_df, args):
+        ranks.append((args.group_by, args.output_dir))
+        return 1,2,3
+
+    monkeypatch.setattr(explore_cazomes, "make_output_directory", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "load_data", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "CazomeDataset", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "summarise_fgp_df", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "compare_cazome_sizes", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "compare_cazy_classes", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "compare_cazy_families", mock_compare_fams)
+    monkeypatch.setattr(explore_cazomes, "compare_core_cazomes", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "find_always_cooccurring_families", mock_none) 
+    monkeypatch.setattr(explore_cazomes, "closing_message", mock_none) 
+
+    args = argsdict['args']
+    args.group_by = ['Genus', 'Species']
+    explore_cazomes.main(args=args, logger=logging.getLogger(__name__))
+
+    assert ranks == [('Genus', args.output_dir / 'Genus'), ('Species', args.output_dir / 'Species')]
+
+
+def test_update_state_no_state(tmp_path):
+    args = Namespace(state_dir=tmp_path, group_by='Genus')
+
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        explore_cazomes.update_state(args)
+    assert pytest_wrapped_e.type == SystemExit
+
+
+def test_save_and_update_state(fgp_df, tmp_path, monkeypatch):
+    fgp_df = fgp_df[['Family', 'Genome', 'Protein']].assign(Genus='Pectobacterium')
+    monkeypatch.setattr(explore_cazomes, "load_data", lambda args: fgp_df)
+
+    args = Namespace(state_dir=tmp_path / "state", group_by='Genus', chunk_size=None)
+    explore_cazomes.save_state(explore_cazomes.CazomeDataset(fgp_df, ['Genus']), args)
+
+    state = explore_cazomes.update_state(args)['Genus']
+    assert len(state) == len(set(fgp_df['Genome']))
+    assert state.num_parts == 1  # all genomes were already in the data set
+
+    args.group_by = 'Species'
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        explore_cazomes.update_state(args)
+    assert pytest_wrapped_e.type == SystemExit
+
+
+def test_save_and_update_state_multiple_ranks(fgp_df, tmp_path, monkeypatch):
+    fgp_df = fgp_df[['Family', 'Genome', 'Protein']].assign(Genus='Pectobacterium', Species='Pectobacterium sp.')
+    monkeypatch.setattr(explore_cazomes, "load_data", lambda args: fgp_df)
+
+    args = Namespace(
+        output_dir=tmp_path / "out", state_dir=tmp_path / "state", group_by=['Genus', 'Species'], chunk_size=None,
+    )
+    explore_cazomes.save_state(explore_cazomes.CazomeDataset(fgp_df, ['Genus', 'Species']), args)
+    assert (tmp_path / "state" / "Genus" / explore_cazomes.STATE_FILE).exists()
+    assert (tmp_path / "state" / "Species" / explore_cazomes.STATE_FILE).exists()
+
+    states = explore_cazomes.update_state(args)
+    assert list(states) == ['Genus', 'Species']
+    assert states['Species'].group_by == 'Species'
+    assert len(states['Species']) == len(set(fgp_df['Genome']))
+
+
+def test_compare_cazy_families_state(fgp_df, tmp_path, monkeypatch):
+    fgp_df = pd.concat([
+        fgp_df[['Family', 'Genome', 'Protein']].assign(Genus='Pectobacterium'),
+        fgp_df[['Family', 'Genome', 'Protein']].iloc[::2].assign(Genome='GCA_1.1', Genus='Dickeya'),
+    ])
+    plotted = []
+    monkeypatch.setattr(explore_cazomes, "build_family_clustermap", lambda df, *args, **kwargs: plotted.append(df))
+
+    state = explore_cazomes.CazomeState(tmp_path / "state", 'Genus')
+    state.add_genomes(explore_cazomes.summarise_fgp_df(fgp_df))
+
+    args = Namespace(
+        output_dir=tmp_path / "out", group_by='Genus', rebuild_fam_freqs=False, no_cache=True, formats=['png'],
+        show_plots=False, clustermap_max_labels=500, clustermap_max_size=200,
+        min_group_prevalence=None, max_other_prevalence=None,
+    )
+    # per genome frequencies of a previous run, which do not include the new genomes
+    stale_path = args.output_dir / "cazy_families" / "cazy_family_frequencies.csv"
+    stale_path.parent.mkdir(parents=True)
+    stale_path.write_text("stale")
+
+    fam_freq_df, fam_freq_df_ggs, all_families = explore_cazomes.compare_cazy_families(state, args)
+    assert fam_freq_df is None
+    assert all_families == state.families
+    assert stale_path.exists() is False
+    assert (args.output_dir / "cazy_families" / "Genus_mean_cazy_family_frequencies.csv").exists()
+    # the clustermap is plotted from the mean frequency of each family per group
+    assert list(plotted[0].index) == ['Pectobacterium', 'Dickeya']
+
+
 def test_load_data(monkeypatch, fgp_df):
     def mock_df(*args, **kwards):
         return fgp_df
@@ -142,11 +250,39 @@ def test_load_data(monkeypatch, fgp_df):
         tax_family=True,
         genus=True,
         species=True,
+        no_cache=True,
     )
 
     explore_cazomes.load_data(args)
 
 
+def test_load_data_cached(test_input_dir, tmp_path):
+    fgp_path = tmp_path / "FGP_FILE"
+    tax_path = tmp_path / "taxs.csv"
+    fgp_path.write_bytes((test_input_dir / "cazome_data_files/FGP_FILE-uneditable").read_bytes())
+    tax_path.write_bytes((test_input_dir / "cazome_data_files/taxs.csv").read_bytes())
+
+    args = Namespace(
+        fgp_file=fgp_path,
+        tax_csv_path=tax_path,
+        kingdom=False,
+        phylum=False,
+        tax_class=False,
+        tax_order=False,
+        tax_family=False,
+        genus=True,
+        species=True,
+        no_cache=False,
+    )
+
+    fgp_df = explore_cazomes.load_data(args)
+    assert len(list(tmp_path.glob(".FGP_FILE.*.feather"))) == 1
+
+    cached_df = explore_cazomes.load_data(args)
+    assert cached_df.equals(fgp_df)
+    assert isinstance(cached_df['Genus'].dtype, pd.CategoricalDtype)
+
+
 def test_compare_cazome_sizes(monkeypatch, fam_freq_df_with_tax, test_output_dir):
     def mock_none(*args, **kwards):
         return
@@ -233,6 +369,7 @@ def test_compare_families(fam_freq_df_with_tax, built_fam_freq_df, test_output_d
     monkeypatch.setattr(explore_cazomes, "make_output_directory", mock_none)
     monkeypatch.setattr(explore_cazomes, "build_fam_freq_df", mock_built_df)
     monkeypatch.setattr(explore_cazomes, "build_family_clustermap", mock_none)
+    monkeypatch.setattr(explore_cazomes, "calc_clustermap_linkages", mock_row_colours)
     monkeypatch.setattr(explore_cazomes, "build_row_colours", mock_row_colours)
     monkeypatch.setattr(explore_cazomes, "get_group_specific_fams", mock_get_group_specific_fams)
 
@@ -251,6 +388,12 @@ def test_compare_families(fam_freq_df_with_tax, built_fam_freq_df, test_output_d
         species=True,
         formats=['pdf'],
         show_plots=False,
+        no_cache=True,
+        clustermap_group_means=False,
+        clustermap_max_labels=500,
+        clustermap_max_size=200,
+        min_group_prevalence=None,
+        max_other_prevalence=None,
     )
 
     explore_cazomes.compare_cazy_families(fam_freq_df_with_tax, args)
@@ -288,6 +431,9 @@ def test_core_cazome(built_fam_freq_df, all_families, test_output_dir, monkeypat
         species=True,
         group_by='Genus',
         round_by=2,
+        core_threshold=1.0,
+        soft_core_threshold=0.95,
+        shell_threshold=0.15,
     )
 
     explore_cazomes.compare_core_cazomes(
@@ -338,6 +484,7 @@ def test_cooccurring_fams(built_fam_freq_df, all_families, test_output_dir, monk
         group_by='Genus',
         round_by=2,
         formats=['pdf'],
+        near_cooccurrence_threshold=0.9,
     )
 
     explore_cazomes.find_always_cooccurring_families(
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+#
+# Author:
+# Emma E. M. Hobbs
+#
+# Contact
+# eemh1@st-andrews.ac.uk
+#
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+"""Tests cazome.explore.chunked.py
+
+These test are intened to be run from the root of the repository using:
+pytest -v
+"""
+
+
+import pytest
+
+import pandas as pd
+
+from cazomevolve.cazome.explore import cazome_sizes, cazy_classes, cazy_families, chunked, parse_data
+
+
+@pytest.fixture
+def fgp_rows():
+    return [
+        ['GH1', 'GCA_1.1', 'P1'],
+        ['CBM5', 'GCA_1.1', 'P1'],
+        ['GH2', 'GCA_1.1', 'P2'],
+        ['GT2', 'GCA_1.1', 'P3'],
+        ['GH1', 'GCA_2.1', 'P4'],
+        ['PL1', 'GCA_2.1', 'P5'],
+        ['PL1', 'GCA_2.1', 'P6'],
+        ['GH1', 'GCA_3.1', 'P7'],
+        ['GT2', 'GCA_3.1', 'P8'],
+        ['GT4', 'GCA_3.1', 'P9'],
+        ['CE8', 'GCA_3.1', 'P9'],
+        ['GH1', 'GCA_4.1', 'P10'],
+        ['GH13', 'GCA_4.1', 'P10'],
+    ]
+
+
+@pytest.fixture
+def tax_df():
+    return pd.DataFrame(
+        [
+            ['GCA_1.1', 'Dickeya', 'dadantii'],
+            ['GCA_2.1', 'Pectobacterium', 'atrosepticum'],
+            ['GCA_3.1', 'Dickeya', 'solani'],
+            ['GCA_4.1', 'Pectobacterium', 'brasiliense'],
+        ],
+        columns=['Genome', 'Genus', 'Species'],
+    )
+
+
+@pytest.fixture
+def fgp_path(fgp_rows, tmp_path):
+    _path = tmp_path / "fgp_file"
+    pd.DataFrame(fgp_rows).to_csv(_path, sep='\t', header=False, index=False)
+    return _path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 100])
+def test_chunked_matches_in_memory(fgp_path, tax_df, chunk_size):
+    fgp_df = parse_data.load_fgp_data(fgp_path)
+    fgp_df = parse_data.add_tax_data_from_tax_df(fgp_df, tax_df, genus=True, species=True)
+
+    chunked_cazome = chunked.build_chunked_cazome(fgp_path, chunk_size)
+    chunked_cazome.genome_table = parse_data.add_tax_data_from_tax_df(
+        chunked_cazome.genome_table, tax_df, genus=True, species=True,
+    )
+
+    assert list(chunked_cazome.genome_table['NumOfProteins']) == [3, 3, 3, 1]
+
+    for item in ['Protein', 'Family']:
+        assert cazome_sizes.count_items_in_cazome(chunked_cazome, item, 'Genus', round_by=2)[1].equals(
+            cazome_sizes.count_items_in_cazome(fgp_df, item, 'Genus', round_by=2)[1]
+        )
+    assert cazome_sizes.count_cazyme_fam_ratio(chunked_cazome, 'Genus', round_by=2)[1].equals(
+        cazome_sizes.count_cazyme_fam_ratio(fgp_df, 'Genus', round_by=2)[1]
+    )
+    assert cazy_classes.calculate_class_sizes(chunked_cazome, 'Genus', round_by=2)[0].equals(
+        cazy_classes.calculate_class_sizes(fgp_df, 'Genus', round_by=2)[0]
+    )
+    assert cazy_families.build_fam_freq_df(chunked_cazome, ['Genus']).to_csv() == \
+        cazy_families.build_fam_freq_df(fgp_df, ['Genus']).to_csv()
+
+
+def test_chunked_genomes_not_together(fgp_rows, tmp_path):
+    _path = tmp_path / "fgp_file"
+    pd.DataFrame(fgp_rows + [['GH5', 'GCA_1.1', 'P11']]).to_csv(_path, sep='\t', header=False, index=False)
+
+    with pytest.raises(ValueError):
+        chunked.build_chunked_cazome(_path, 2)
+
+
+def test_summarise_categorical_fgp_df(fgp_path, tax_df):
+    fgp_df = parse_data.load_fgp_data(fgp_path)
+    fgp_df = parse_data.add_tax_data_from_tax_df(fgp_df, tax_df, genus=True, species=True)
+
+    cazome = chunked.summarise_fgp_df(fgp_df)
+    chunked_cazome = chunked.build_chunked_cazome(fgp_path, 3)
+
+    # the categorical columns are summarised without converting them to strings
+    assert fgp_df['Family'].dtype.name == 'category'
+    pd.testing.assert_frame_equal(
+        cazome.genome_table.drop(columns=['Genus', 'Species']),
+        chunked_cazome.genome_table,
+        check_like=True,
+    )
+    pd.testing.assert_frame_equal(cazome.fam_counts, chunked_cazome.fam_counts)
@@ -45,6 +45,7 @@ pytest -v
 """
 
 
+import pandas as pd
 import pytest
 
 from argparse import Namespace
@@ -80,3 +81,120 @@ def test_identify_cooccurring_fam_pairs(built_fam_freq_df):
         exclude_core_cazome=True,
         core_cazome=['PL1', 'GH1'],
     )
+
+
+def test_identify_cooccurring_fam_pairs_values():
+    df = pd.DataFrame(
+        {
+            'GH1': [1, 1, 1],
+            'GH2': [2, 0, 1],
+            'CBM5': [1, 0, 3],
+            'PL1': [0, 1, 0],
+            'GT2': [0, 0, 0],
+        }
+    )
+    cooccurring_pairs = cooccurring_families.identify_cooccurring_fam_pairs(df, list(df.columns))
+    assert cooccurring_pairs == {"('CBM5', 'GH2')": {'fams': ('CBM5', 'GH2'), 'freq': 2}}
+
+    fam_bitsets = cooccurring_families.get_fam_presence_bitsets(df, list(df.columns))
+    assert list(fam_bitsets) == ['GH1', 'GH2', 'CBM5', 'PL1']  # GT2 is absent
+    assert fam_bitsets['GH2'] == fam_bitsets['CBM5']
+    assert cooccurring_families.count_set_bits(fam_bitsets['GH1']) == 3
+
+
+def test_calc_cooccuring_fam_freqs_merge_order(monkeypatch):
+    cooccurring_pairs = {
+        "('GH1', 'GH2')": {'fams': ('GH1', 'GH2'), 'freq': 2},
+        "('GT2', 'PL1')": {'fams': ('GT2', 'PL1'), 'freq': 2},
+        "('GH2', 'GT2')": {'fams': ('GH2', 'GT2'), 'freq': 2},
+        "('CBM5', 'CE8')": {'fams': ('CBM5', 'CE8'), 'freq': 1},
+    }
+    monkeypatch.setattr(
+        cooccurring_families,
+        "identify_cooccurring_fam_pairs",
+        lambda *args, **kwargs: cooccurring_pairs,
+    )
+
+    assert cooccurring_families.calc_cooccuring_fam_freqs(pd.DataFrame(), []) == {
+        0: {'fams': {'GH1', 'GH2', 'GT2', 'PL1'}, 'freqs': {2}},
+        1: {'fams': {'CBM5', 'CE8'}, 'freqs': {1}},
+    }
+
+
+def test_find_fam_root():
+    parents = {'GH2': 'GH1', 'GT2': 'GH2'}
+    assert cooccurring_families.find_fam_root(parents, 'GT2') == 'GH1'
+    assert parents['GT2'] == 'GH1'
+    assert cooccurring_families.find_fam_root(parents, 'PL1') == 'PL1'
+
+
+def test_calc_grouped_cooccuring_fam_freqs():
+    df = pd.DataFrame(
+        {
+            'Genome': ['GCA_1.1', 'GCA_2.1', 'GCA_3.1', 'GCA_4.1', 'GCA_5.1'],
+            'Genus': ['Dickeya', 'Pectobacterium', 'Dickeya', 'Pectobacterium', 'Dickeya'],
+            'GH1': [1, 1, 1, 0, 0],
+            'GH2': [2, 1, 1, 1, 0],
+            'CBM5': [0, 1, 0, 1, 1],
+            'PL1': [0, 0, 0, 1, 1],
+        }
+    )
+    all_families = ['GH1', 'GH2', 'CBM5', 'PL1']
+
+    grp_cooccurring_fams = cooccurring_families.calc_grouped_cooccuring_fam_freqs(df, 'Genus', all_families)
+
+    assert list(grp_cooccurring_fams) == ['Dickeya', 'Pectobacterium']
+    for grp in grp_cooccurring_fams:
+        assert grp_cooccurring_fams[grp] == cooccurring_families.calc_cooccuring_fam_freqs(
+            df[df['Genus'] == grp],
+            all_families,
+        )
+    assert grp_cooccurring_fams['Dickeya'] == {
+        0: {'fams': {'GH1', 'GH2'}, 'freqs': {2}},
+        1: {'fams': {'CBM5', 'PL1'}, 'freqs': {1}},
+    }
+    assert grp_cooccurring_fams['Pectobacterium'] == {0: {'fams': {'GH2', 'CBM5'}, 'freqs': {2}}}
+
+
+def test_identify_near_cooccurring_fam_pairs():
+    df = pd.DataFrame(
+        {
+            'GH1': [1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+            'GH2': [1, 1, 1, 1, 1, 1, 1, 1, 1, 0],  # missing from one genome
+            'CBM5': [2, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+            'PL1': [1, 0, 1, 0, 1, 0, 1, 0, 1, 0],
+        }
+    )
+    near_pairs = cooccurring_families.identify_near_cooccurring_fam_pairs(df, list(df.columns), threshold=0.85)
+    assert near_pairs == {
+        "('CBM5', 'GH2')": {'fams': ('CBM5', 'GH2'), 'freq': 9, 'jaccard': 1.0},
+        "('GH1', 'GH2')": {'fams': ('GH1', 'GH2'), 'freq': 9, 'jaccard': 0.9},
+        "('CBM5', 'GH1')": {'fams': ('CBM5', 'GH1'), 'freq': 9, 'jaccard': 0.9},
+    }
+
+    near_modules = cooccurring_families.calc_near_cooccurring_fam_modules(df, list(df.columns), threshold=0.85)
+    assert near_modules == {0: {'fams': {'GH1', 'GH2', 'CBM5'}, 'support': 9, 'genomes': 10}}
+
+    with pytest.raises(ValueError):
+        cooccurring_families.identify_near_cooccurring_fam_pairs(df, list(df.columns), threshold=0)
+
+
+def test_near_cooccurring_fam_modules_exact():
+    df = pd.DataFrame(
+        {
+            'GH1': [1, 0, 1, 1],
+            'GH2': [1, 0, 1, 1],
+            'PL1': [0, 1, 1, 0],
+            'CBM5': [0, 1, 1, 0],
+            'GT2': [1, 1, 0, 0],
+        }
+    )
+    exact_groups = cooccurring_families.calc_cooccuring_fam_freqs(df, list(df.columns))
+    near_modules = cooccurring_families.calc_near_cooccurring_fam_modules(df, list(df.columns), threshold=1.0)
+
+    assert [grp['fams'] for grp in exact_groups.values()] == [module['fams'] for module in near_modules.values()]
+
+
+def test_get_lsh_bands():
+    assert cooccurring_families.get_lsh_bands(128, 0.9) == 16
+    assert cooccurring_families.get_lsh_bands(128, 1.0) == 1
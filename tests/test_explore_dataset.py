@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+#
+# Author:
+# Emma E. M. Hobbs
+#
+# Contact
+# eemh1@st-andrews.ac.uk
+#
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+"""Tests cazome.explore.dataset.py
+
+These test are intened to be run from the root of the repository using:
+pytest -v
+"""
+
+
+import pytest
+
+import pandas as pd
+
+from cazomevolve.cazome.explore import cazy_families, cooccurring_families
+from cazomevolve.cazome.explore.dataset import CazomeDataset
+
+
+@pytest.fixture
+def small_fgp_df():
+    df = pd.DataFrame(
+        [
+            ['GH1', 'GCA_1.1', 'P1', 'Dickeya'],
+            ['GH2', 'GCA_1.1', 'P2', 'Dickeya'],
+            ['GH2', 'GCA_1.1', 'P3', 'Dickeya'],
+            ['GH1', 'GCA_2.1', 'P4', 'Dickeya'],
+            ['PL1', 'GCA_2.1', 'P5', 'Dickeya'],
+            ['GH1', 'GCA_3.1', 'P6', 'Pectobacterium'],
+            ['GH2', 'GCA_3.1', 'P7', 'Pectobacterium'],
+        ],
+        columns=['Family', 'Genome', 'Protein', 'Genus'],
+    )
+    return df.astype('category')
+
+
+def test_dataset_matrices(small_fgp_df):
+    dataset = CazomeDataset(small_fgp_df, ['Genus'])
+
+    assert dataset.genomes == ['GCA_1.1', 'GCA_2.1', 'GCA_3.1']
+    assert dataset.families == ['GH1', 'GH2', 'PL1']
+    assert dataset.fam_freq_matrix.loc[('GCA_1.1', 'Dickeya'), 'GH2'] == 2
+    assert dataset.presence_matrix.loc[('GCA_1.1', 'Dickeya'), 'GH2'] == 1
+    assert dataset.sparse_fam_freq_matrix.shape == (3, 3)
+    assert set(dataset.get_group_fam_freq_dfs('Genus')) == {'Dickeya', 'Pectobacterium'}
+    assert list(dataset.get_grouped_fam_freq_matrix('Genus').columns) == ['GH1', 'GH2', 'PL1', 'Genus']
+
+
+def test_dataset_caching(small_fgp_df, monkeypatch):
+    dataset = CazomeDataset(small_fgp_df, ['Genus'])
+    fam_freq_df = dataset.fam_freq_df
+
+    def mock_build(*args, **kwargs):
+        raise AssertionError("fam freq df was rebuilt")
+
+    monkeypatch.setattr(cazy_families, "build_fam_freq_df", mock_build)
+
+    assert dataset.fam_freq_df is fam_freq_df
+    assert cazy_families.identify_core_cazome(dataset) == {'GH1'}
+
+
+def test_dataset_filter_add_genomes(small_fgp_df, capsys):
+    dataset = CazomeDataset(small_fgp_df, ['Genus'])
+    assert len(dataset.fam_freq_df) == 3
+
+    dataset.filter_genomes(['GCA_1.1', 'GCA_3.1'])
+    assert len(dataset.fam_freq_df) == 2
+    assert dataset.sparse_fam_freq_matrix.shape == (2, 2)
+    assert dataset.families == ['GH1', 'GH2']
+    assert cazy_families.identify_core_cazome(dataset) == {'GH1', 'GH2'}
+
+    dataset.add_genomes(small_fgp_df[small_fgp_df['Genome'].isin(['GCA_2.1', 'GCA_3.1'])])
+    assert "GCA_3.1" in capsys.readouterr().out
+    assert dataset.genomes == ['GCA_1.1', 'GCA_3.1', 'GCA_2.1']
+    assert len(dataset.fgp_df) == len(small_fgp_df)
+    assert isinstance(dataset.fgp_df['Genome'].dtype, pd.CategoricalDtype)
+    assert cazy_families.identify_core_cazome(dataset) == {'GH1'}
+
+
+def test_dataset_analysis_functions(small_fgp_df):
+    dataset = CazomeDataset(small_fgp_df, ['Genus'])
+
+    assert cazy_families.build_fam_freq_df(dataset, ['Genus']) is dataset.fam_freq_df
+
+    unique_grp_fams, group_fams = cazy_families.get_group_specific_fams(dataset, 'Genus', dataset.families)
+    assert unique_grp_fams == {'Dickeya': {'PL1'}}
+
+    fggf_df, mean_freq_df = cazy_families.build_fam_mean_freq_df(dataset, 'Genus')
+    assert set(fggf_df['Genome']) == set(dataset.genomes)
+
+    cooccurring_fams = cooccurring_families.calc_cooccuring_fam_freqs(dataset, dataset.families)
+    assert cooccurring_fams == {}
+
+
+def test_dataset_multiple_ranks(small_fgp_df):
+    fgp_df = small_fgp_df.assign(Species=small_fgp_df['Genus'].astype(str) + ' sp.')
+    dataset = CazomeDataset(fgp_df, ['Genus', 'Species'])
+
+    genus_fam_freq_df = cazy_families.build_fam_freq_df(dataset, ['Genus'])
+    assert list(genus_fam_freq_df.columns) == ['Genome', 'Genus', 'GH1', 'GH2', 'PL1']
+    assert genus_fam_freq_df.to_csv() == cazy_families.build_fam_freq_df(fgp_df, ['Genus']).to_csv()
+
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+#
+# Author:
+# Emma E. M. Hobbs
+#
+# Contact
+# eemh1@st-andrews.ac.uk
+#
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+"""Tests cazome.explore.fam_matrix.py
+
+These test are intened to be run from the root of the repository using:
+pytest -v
+"""
+
+
+import pytest
+
+import numpy as np
+import pandas as pd
+
+from cazomevolve.cazome.explore import cazy_families, cooccurring_families, pca
+from cazomevolve.cazome.explore.fam_matrix import SparseFamFreqMatrix
+
+
+@pytest.fixture
+def small_fgp_df():
+    rows = [
+        ['GH1', 'GCA_1.1', 'P1', 'Dickeya'],
+        ['GH2', 'GCA_1.1', 'P2', 'Dickeya'],
+        ['GH2', 'GCA_1.1', 'P3', 'Dickeya'],
+        ['CBM5', 'GCA_1.1', 'P3', 'Dickeya'],
+        ['GH1', 'GCA_2.1', 'P4', 'Dickeya'],
+        ['PL1', 'GCA_2.1', 'P5', 'Dickeya'],
+        ['PL1', 'GCA_2.1', 'P5', 'Dickeya'],
+        ['GH1', 'GCA_3.1', 'P6', 'Pectobacterium'],
+        ['GH2', 'GCA_3.1', 'P7', 'Pectobacterium'],
+        ['CBM5', 'GCA_3.1', 'P7', 'Pectobacterium'],
+        ['GT2', 'GCA_4.1', 'P8', 'Pectobacterium'],
+        ['GH1', 'GCA_4.1', 'P9', 'Pectobacterium'],
+    ]
+    return pd.DataFrame(rows, columns=['Family', 'Genome', 'Protein', 'Genus']).astype('category')
+
+
+def test_from_fgp_df(small_fgp_df):
+    fam_matrix = SparseFamFreqMatrix.from_fgp_df(small_fgp_df, ['Genus'])
+    dense_df = cazy_families.build_fam_freq_df(small_fgp_df, ['Genus'])
+    dense_df = dense_df.set_index(['Genome', 'Genus']).loc[list(fam_matrix.index)]
+
+    assert fam_matrix.shape == (4, 5)
+    assert fam_matrix.matrix.nnz == 10
+    assert list(fam_matrix.genomes) == ['GCA_1.1', 'GCA_2.1', 'GCA_3.1', 'GCA_4.1']
+    assert np.array_equal(fam_matrix.to_dense().values, dense_df.values)
+    assert list(fam_matrix.to_dense().columns) == list(dense_df.columns)
+
+
+def test_filter_genomes(small_fgp_df):
+    fam_matrix = SparseFamFreqMatrix.from_fgp_df(small_fgp_df, ['Genus'])
+    filtered = fam_matrix.filter_genomes(['GCA_1.1', 'GCA_3.1'])
+
+    assert list(filtered.genomes) == ['GCA_1.1', 'GCA_3.1']
+    assert list(filtered.genome_taxs['Genus']) == ['Dickeya', 'Pectobacterium']
+    assert cazy_families.identify_core_cazome(filtered) == {'GH1', 'GH2', 'CBM5'}
+
+
+def test_sparse_core_cazome(small_fgp_df):
+    fam_matrix = SparseFamFreqMatrix.from_fgp_df(small_fgp_df, ['Genus'])
+
+    assert cazy_families.identify_core_cazome(fam_matrix) == {'GH1'}
+    assert cazy_families.identify_core_cazome(fam_matrix.to_dense()) == {'GH1'}
+
+
+def test_sparse_cooccurring_fams(small_fgp_df):
+    fam_matrix = SparseFamFreqMatrix.from_fgp_df(small_fgp_df, ['Genus'])
+    all_families = list(fam_matrix.families)
+
+    sparse_pairs = cooccurring_families.identify_cooccurring_fam_pairs(fam_matrix, all_families)
+    dense_pairs = cooccurring_families.identify_cooccurring_fam_pairs(fam_matrix.to_dense(), all_families)
+
+    assert sparse_pairs == dense_pairs
+    assert sparse_pairs == {"('CBM5', 'GH2')": {'fams': ('CBM5', 'GH2'), 'freq': 2}}
+    assert cooccurring_families.calc_cooccuring_fam_freqs(fam_matrix, all_families) == {
+        0: {'fams': {'CBM5', 'GH2'}, 'freqs': {2}},
+    }
+
+
+def test_sparse_pca(small_fgp_df):
+    fam_matrix = SparseFamFreqMatrix.from_fgp_df(small_fgp_df, ['Genus'])
+
+    sparse_pca, sparse_X = pca.perform_pca(fam_matrix, 3)
+    dense_pca, dense_X = pca.perform_pca(fam_matrix.to_dense(), 3)
+
+    assert np.allclose(sparse_pca.explained_variance_ratio_, dense_pca.explained_variance_ratio_)
+    assert np.allclose(
+        np.abs(sparse_pca.transform(sparse_X)),
+        np.abs(dense_pca.transform(dense_X)),
+    )
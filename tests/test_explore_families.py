@@ -47,15 +47,38 @@ pytest -v
 
 import pytest
 
+import pandas as pd
+
 from argparse import Namespace
 
 from cazomevolve.cazome.explore import cazy_families
+from cazomevolve.cazome.explore.fam_matrix import SparseFamFreqMatrix
 
 
 def test_build_fam_freq_df(fam_freq_df_with_tax):
     assert len(cazy_families.build_fam_freq_df(fam_freq_df_with_tax, ['Genus', 'Species'])) == 1
 
 
+def test_build_fam_freq_df_counts():
+    fgp_df = pd.DataFrame(
+        [
+            ['PL1', 'GCA_2.1', 'P1', 'Dickeya'],
+            ['GH1', 'GCA_2.1', 'P2', 'Dickeya'],
+            ['GH1', 'GCA_2.1', 'P2', 'Dickeya'],  # duplicate protein, counted once
+            ['GH1', 'GCA_1.1', 'P3', 'Pectobacterium'],
+            ['GH1', 'GCA_2.1', 'P4', 'Dickeya'],
+        ],
+        columns=['Family', 'Genome', 'Protein', 'Genus'],
+    )
+    for df in [fgp_df, fgp_df.astype('category')]:
+        fam_freq_df = cazy_families.build_fam_freq_df(df, ['Genus'])
+        assert list(fam_freq_df.columns) == ['Genome', 'Genus', 'GH1', 'PL1']
+        assert fam_freq_df.values.tolist() == [
+            ['GCA_2.1', 'Dickeya', 2, 1],
+            ['GCA_1.1', 'Pectobacterium', 1, 0],
+        ]
+
+
 def test_build_fam_fbuild_row_coloursreq_df(built_fam_freq_df):
     cazy_families.build_row_colours(built_fam_freq_df, 'Genus', 'Set1')
 
@@ -71,6 +94,66 @@ def test_build_clustermap(built_fam_freq_df):
     )
 
 
+def test_calc_clustermap_linkages(built_fam_freq_df, tmp_path):
+    df = built_fam_freq_df.drop(['Genus', 'Species'], axis=1).set_index('Genome')
+
+    row_linkage, col_linkage = cazy_families.calc_clustermap_linkages(df, cache_dir=tmp_path)
+    assert row_linkage.shape == (len(df) - 1, 4)
+    assert col_linkage.shape == (len(df.columns) - 1, 4)
+    assert len(list(tmp_path.glob("linkages_*.npz"))) == 1
+
+    cached_row_linkage, cached_col_linkage = cazy_families.calc_clustermap_linkages(df, cache_dir=tmp_path)
+    assert (cached_row_linkage == row_linkage).all()
+    assert (cached_col_linkage == col_linkage).all()
+
+    # a different matrix is not read from the cache
+    cazy_families.calc_clustermap_linkages(df + 1, method='single', cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("linkages_*.npz"))) == 2
+
+
+def test_build_clustermap_formats(built_fam_freq_df, tmp_path):
+    df = built_fam_freq_df.drop(['Genus', 'Species'], axis=1).set_index('Genome')
+    row_linkage, col_linkage = cazy_families.calc_clustermap_linkages(df)
+
+    cazy_families.build_family_clustermap(
+        df,
+        fig_size=(10,10),
+        file_path=tmp_path / "clustermap",
+        file_format=['png', 'svg'],
+        row_linkage=row_linkage,
+        col_linkage=col_linkage,
+    )
+    assert (tmp_path / "clustermap.png").exists()
+    assert (tmp_path / "clustermap.svg").exists()
+
+
+def test_build_group_mean_fam_freq_df():
+    df = pd.DataFrame(
+        {'Genus': ['B', 'A', 'B'], 'GH1': [1, 4, 2], 'PL1': [0, 2, 3]},
+        index=pd.Index(['G1', 'G2', 'G3'], name='Genome'),
+    )
+    group_mean_df = cazy_families.build_group_mean_fam_freq_df(df, 'Genus')
+
+    assert list(group_mean_df.index) == ['B', 'A']
+    assert group_mean_df.index.name == 'Genus'
+    assert group_mean_df.values.tolist() == [[1.5, 1.5], [4.0, 2.0]]
+
+
+def test_build_clustermap_scalable(built_fam_freq_df):
+    df = built_fam_freq_df.drop(['Genus', 'Species'], axis=1).set_index('Genome')
+
+    fam_clustermap = cazy_families.build_family_clustermap(
+        df,
+        fig_size=(len(df.columns) * 0.4, len(df) * 0.4),
+        rasterized=True,
+        max_labels=len(df) - 1,
+        max_fig_size=(5, 5),
+    )
+    assert tuple(fam_clustermap.figure.get_size_inches()) == (5, 5)
+    assert fam_clustermap.ax_heatmap.get_yticklabels() == []
+    assert all(collection.get_rasterized() for collection in fam_clustermap.ax_heatmap.collections)
+
+
 def test_build_family_clustermap_multi_legend(built_fam_freq_df):
     row_colours, lut = cazy_families.build_row_colours(built_fam_freq_df, 'Genus', 'Set1')
     built_fam_freq_df = built_fam_freq_df.set_index(['Genome', 'Species'])
@@ -99,8 +182,101 @@ def test_build_fam_mean_freq_df(built_fam_freq_df):
     cazy_families.build_fam_mean_freq_df(built_fam_freq_df, 'Genus', round_by=2)
 
 
+def test_build_fam_mean_freq_df_values():
+    df = pd.DataFrame(
+        {'Genus': ['A', 'B', 'A'], 'GH1': [1, 4, 2], 'PL1': [0, 2, 3]},
+        index=pd.Index(['G1', 'G2', 'G3'], name='Genome'),
+    )
+    df_1, df_2 = cazy_families.build_fam_mean_freq_df(df, 'Genus', round_by=2)
+
+    assert list(df_1.columns) == ['Family', 'Genus', 'Genome', 'Frequency']
+    assert df_1.values.tolist() == [
+        ['GH1', 'A', 'G1', 1], ['PL1', 'A', 'G1', 0],
+        ['GH1', 'B', 'G2', 4], ['PL1', 'B', 'G2', 2],
+        ['GH1', 'A', 'G3', 2], ['PL1', 'A', 'G3', 3],
+    ]
+
+    assert list(df_2.columns) == ['Family', 'Genus', 'MeanFreq', 'SdFreq']
+    assert df_2.values.tolist() == [
+        ['GH1', 'A', 1.5, 0.5], ['PL1', 'A', 1.5, 1.5],
+        ['GH1', 'B', 4.0, 0.0], ['PL1', 'B', 2.0, 0.0],
+    ]
+
+
 def test_get_group_specific_fams(built_fam_freq_df):
     built_fam_freq_df = built_fam_freq_df.drop('Species', axis=1)
     built_fam_freq_df = built_fam_freq_df.set_index(['Genome'])
     fams = list(built_fam_freq_df.columns)
     cazy_families.get_group_specific_fams(built_fam_freq_df, 'Genus', fams)
+
+
+def test_get_group_specific_fams_prevalence():
+    df = pd.DataFrame(
+        {
+            'Genus': ['A', 'A', 'A', 'B', 'B', 'C'],
+            'GH1': [1, 1, 1, 0, 0, 0],
+            'GH2': [1, 1, 0, 1, 0, 0],
+            'GT2': [2, 0, 0, 0, 0, 1],
+            'PL1': [0, 0, 0, 0, 0, 3],
+        },
+        index=['G1', 'G2', 'G3', 'G4', 'G5', 'G6'],
+    )
+    fams = ['Genus', 'GH1', 'GH2', 'GT2', 'PL1']
+
+    unique_grp_fams, group_fams = cazy_families.get_group_specific_fams(df, 'Genus', fams)
+    assert unique_grp_fams == {'A': {'GH1'}, 'C': {'PL1'}}
+    assert group_fams == {'A': {'GH1', 'GH2', 'GT2'}, 'B': {'GH2'}, 'C': {'GT2', 'PL1'}}
+
+    # GH2 in 2/3 of A and 1/3 of the other genomes, GT2 in 1/1 of C and 1/5 of the other genomes
+    unique_grp_fams, _ = cazy_families.get_group_specific_fams(
+        df, 'Genus', fams, min_prevalence=0.6, max_other_prevalence=0.4,
+    )
+    assert unique_grp_fams == {'A': {'GH1', 'GH2'}, 'C': {'GT2', 'PL1'}}
+
+    unique_grp_fams, _ = cazy_families.get_group_specific_fams(df, 'Genus', fams, min_prevalence=0.9)
+    assert unique_grp_fams == {'A': {'GH1'}, 'C': {'PL1'}}
+
+
+def test_calc_fam_prevalence():
+    df = pd.DataFrame({
+        'Genome': ['G1', 'G2', 'G3', 'G4'],
+        'Genus': ['A', 'A', 'A', 'B'],
+        'GH1': [1, 2, 1, 1],
+        'GT2': [1, 1, 0, 3],
+        'PL1': [0, 0, 0, 1],
+    })
+    prevalence_df = cazy_families.calc_fam_prevalence(
+        df, ['Genome', 'Genus', 'GH1', 'GT2', 'PL1'], ranks=['Genus'], soft_core=0.7, shell=0.3,
+    )
+
+    assert prevalence_df[['Rank', 'Group', 'Family']].astype(str).values.tolist() == [
+        ['All', 'All', 'GH1'], ['All', 'All', 'GT2'], ['All', 'All', 'PL1'],
+        ['Genus', 'A', 'GH1'], ['Genus', 'A', 'GT2'], ['Genus', 'A', 'PL1'],
+        ['Genus', 'B', 'GH1'], ['Genus', 'B', 'GT2'], ['Genus', 'B', 'PL1'],
+    ]
+    assert list(prevalence_df['Genomes']) == [4, 3, 1, 3, 2, 0, 1, 1, 1]
+    assert list(prevalence_df['GroupSize']) == [4, 4, 4, 3, 3, 3, 1, 1, 1]
+    assert list(prevalence_df['Category']) == [
+        'Core', 'SoftCore', 'Cloud',
+        'Core', 'Shell', 'Absent',
+        'Core', 'Core', 'Core',
+    ]
+
+    assert cazy_families.get_group_core_cazomes(prevalence_df, 'Genus') == {'A': {'GH1'}, 'B': {'GH1', 'GT2', 'PL1'}}
+    assert cazy_families.get_group_core_cazomes(prevalence_df, 'All', category='SoftCore') == {'All': {'GT2'}}
+
+    fgp_df = df.melt(id_vars=['Genome', 'Genus'], var_name='Family', value_name='Freq')
+    fgp_df = fgp_df[fgp_df['Freq'] > 0]
+    sparse_matrix = SparseFamFreqMatrix.from_fgp_df(fgp_df[['Family', 'Genome', 'Genus']], tax_ranks=['Genus'])
+    pd.testing.assert_frame_equal(
+        cazy_families.calc_fam_prevalence(
+            sparse_matrix, ['GH1', 'GT2', 'PL1'], ranks=['Genus'], soft_core=0.7, shell=0.3,
+        ),
+        prevalence_df,
+        check_dtype=False,
+    )
+
+
+def test_classify_fam_prevalence_thresholds():
+    with pytest.raises(ValueError):
+        cazy_families.classify_fam_prevalence(pd.Series([0.5]), soft_core=0.1, shell=0.2)
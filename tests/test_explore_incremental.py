@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+#
+# Author:
+# Emma E. M. Hobbs
+#
+# Contact
+# eemh1@st-andrews.ac.uk
+#
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+"""Tests cazome.explore.incremental.py
+
+These test are intened to be run from the root of the repository using:
+pytest -v
+"""
+
+
+import pytest
+
+import pandas as pd
+
+from cazomevolve.cazome.explore import (
+    cazome_sizes,
+    cazy_classes,
+    cazy_families,
+    chunked,
+    cooccurring_families,
+    incremental,
+    parse_data,
+)
+
+
+@pytest.fixture
+def fgp_df():
+    fgp_df = pd.DataFrame(
+        [
+            ['GH1', 'GCA_1.1', 'P1'],
+            ['CBM5', 'GCA_1.1', 'P1'],
+            ['GH2', 'GCA_1.1', 'P2'],
+            ['GT2', 'GCA_1.1', 'P3'],
+            ['GH1', 'GCA_2.1', 'P4'],
+            ['PL1', 'GCA_2.1', 'P5'],
+            ['PL1', 'GCA_2.1', 'P6'],
+            ['GH1', 'GCA_3.1', 'P7'],
+            ['GT2', 'GCA_3.1', 'P8'],
+            ['GT4', 'GCA_3.1', 'P9'],
+            ['CE8', 'GCA_3.1', 'P9'],
+            ['GH1', 'GCA_4.1', 'P10'],
+            ['GH1', 'GCA_4.1', 'P11'],
+            ['GH13', 'GCA_4.1', 'P11'],
+            ['GH1', 'GCA_5.1', 'P12'],
+            ['GT2', 'GCA_5.1', 'P13'],
+        ],
+        columns=['Family', 'Genome', 'Protein'],
+    )
+    tax_df = pd.DataFrame(
+        [
+            ['GCA_1.1', 'Dickeya', 'dadantii'],
+            ['GCA_2.1', 'Pectobacterium', 'atrosepticum'],
+            ['GCA_3.1', 'Dickeya', 'solani'],
+            ['GCA_4.1', 'Pectobacterium', 'brasiliense'],
+            ['GCA_5.1', 'Musicola', 'paradisiaca'],
+        ],
+        columns=['Genome', 'Genus', 'Species'],
+    )
+    return parse_data.add_tax_data_from_tax_df(fgp_df, tax_df, genus=True, species=True)
+
+
+def test_incremental_matches_full(fgp_df, tmp_path):
+    full_cazome = chunked.summarise_fgp_df(fgp_df)
+
+    state = incremental.CazomeState(tmp_path / "state", 'Genus')
+    assert state.add_genomes(chunked.summarise_fgp_df(fgp_df[fgp_df['Genome'].isin(['GCA_1.1', 'GCA_2.1'])])) == 2
+    state.save()
+
+    # genomes already in the data set are skipped
+    state = incremental.CazomeState.load(tmp_path / "state")
+    assert state.add_genomes(chunked.summarise_fgp_df(fgp_df[fgp_df['Genome'] != 'GCA_1.1'])) == 3
+    state.save()
+
+    state = incremental.CazomeState.load(tmp_path / "state")
+    assert len(state) == 5
+    assert state.groups == ['Dickeya', 'Pectobacterium', 'Musicola']
+
+    size_dfs = state.get_cazome_size_dfs(round_by=2)
+    assert size_dfs[0].equals(cazome_sizes.count_items_in_cazome(full_cazome, 'Protein', 'Genus', round_by=2)[1])
+    assert size_dfs[1].equals(cazome_sizes.count_items_in_cazome(full_cazome, 'Family', 'Genus', round_by=2)[1])
+    assert size_dfs[2].equals(cazome_sizes.count_cazyme_fam_ratio(full_cazome, 'Genus', round_by=2)[1])
+    pd.testing.assert_frame_equal(
+        state.get_class_df(round_by=2),
+        cazy_classes.calculate_class_sizes(full_cazome, 'Genus', round_by=2)[0],
+        check_dtype=False,
+    )
+
+    fam_freq_df = cazy_families.build_fam_freq_df(full_cazome, ['Genus'])
+    assert state.load_cazome().get_fam_freq_df(['Genus']).to_csv() == fam_freq_df.to_csv()
+
+    all_families = list(fam_freq_df.columns)[2:]
+    assert state.get_group_specific_fams() == cazy_families.get_group_specific_fams(fam_freq_df, 'Genus', all_families)
+    assert state.get_core_cazome() == {'GH1'}
+
+    pd.testing.assert_frame_equal(
+        state.get_fam_prevalence(soft_core=0.5, shell=0.3),
+        cazy_families.calc_fam_prevalence(fam_freq_df, all_families, ranks=['Genus'], soft_core=0.5, shell=0.3),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+
+def test_incremental_fam_mean_freqs(fgp_df, tmp_path):
+    state = incremental.CazomeState(tmp_path / "state", 'Genus')
+    for genomes in [['GCA_1.1'], ['GCA_2.1', 'GCA_3.1'], ['GCA_4.1', 'GCA_5.1']]:
+        state.add_genomes(chunked.summarise_fgp_df(fgp_df[fgp_df['Genome'].isin(genomes)]))
+
+    fam_freq_df = cazy_families.build_fam_freq_df(fgp_df, ['Genus']).set_index('Genome')
+    _, mean_freq_df = cazy_families.build_fam_mean_freq_df(fam_freq_df, 'Genus', round_by=2)
+
+    state_mean_freq_df = state.get_fam_mean_freq_df(['GH1', 'GT2', 'PL1'], round_by=2)
+    pd.testing.assert_frame_equal(
+        state_mean_freq_df.sort_values(['Family', 'Genus']).reset_index(drop=True),
+        mean_freq_df[mean_freq_df['Family'].isin(['GH1', 'GT2', 'PL1'])].sort_values(['Family', 'Genus']).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_incremental_group_mean_fam_freqs(fgp_df, tmp_path):
+    state = incremental.CazomeState(tmp_path / "state", 'Genus')
+    for genomes in [['GCA_1.1'], ['GCA_2.1', 'GCA_3.1'], ['GCA_4.1', 'GCA_5.1']]:
+        state.add_genomes(chunked.summarise_fgp_df(fgp_df[fgp_df['Genome'].isin(genomes)]))
+
+    fam_freq_df = cazy_families.build_fam_freq_df(fgp_df, ['Genus']).set_index('Genome')
+    pd.testing.assert_frame_equal(
+        state.get_group_mean_fam_freq_df(),
+        cazy_families.build_group_mean_fam_freq_df(fam_freq_df, 'Genus'),
+        check_index_type=False,
+    )
+
+
+def test_incremental_cooccurring_fams(fgp_df, tmp_path):
+    state = incremental.CazomeState(tmp_path / "state", 'Genus')
+    for genomes in [['GCA_1.1'], ['GCA_2.1', 'GCA_3.1'], ['GCA_4.1', 'GCA_5.1']]:
+        state.add_genomes(chunked.summarise_fgp_df(fgp_df[fgp_df['Genome'].isin(genomes)]))
+        state.save()
+        state = incremental.CazomeState.load(tmp_path / "state")
+
+    fam_freq_df = cazy_families.build_fam_freq_df(fgp_df, ['Genus'])
+    all_families = list(fam_freq_df.columns)[2:]
+
+    cooccurring_fams_dict, grp_cooccurring_fams = state.get_cooccurring_fams(all_families)
+    assert cooccurring_fams_dict == cooccurring_families.calc_cooccuring_fam_freqs(fam_freq_df, all_families)
+    assert grp_cooccurring_fams == cooccurring_families.calc_grouped_cooccuring_fam_freqs(
+        fam_freq_df, 'Genus', all_families,
+    )
+
+
+def test_combine_running_stats():
+    values = [[1.0, 4.0], [2.0, 8.0, 9.0]]
+    count, mean, m2 = incremental.combine_running_stats(
+        [pd.Series([len(_)]) for _ in values],
+        [pd.Series([pd.Series(_).mean()]) for _ in values],
+        [pd.Series([((pd.Series(_) - pd.Series(_).mean()) ** 2).sum()]) for _ in values],
+    )
+    all_values = pd.Series(values[0] + values[1])
+    assert count[0] == 5
+    assert mean[0] == pytest.approx(all_values.mean())
+    assert m2[0] / count[0] == pytest.approx(all_values.var(ddof=0))
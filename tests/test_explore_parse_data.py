@@ -48,6 +48,8 @@ pytest -v
 import pytest
 import subprocess
 
+import pandas as pd
+
 from argparse import Namespace
 
 from saintBioutils.utilities import logger, file_io
@@ -60,6 +62,32 @@ def test_load_fgp_data(test_input_dir):
     assert len(parse_data.load_fgp_data(_path)) == 60
 
 
+def test_load_fgp_data_categorical(test_input_dir):
+    _path = test_input_dir / "cazome_data_files/FGP_FILE-uneditable"
+    df = parse_data.load_fgp_data(_path)
+
+    assert list(df.columns) == ['Family', 'Genome', 'Protein']
+    assert all(isinstance(dtype, pd.CategoricalDtype) for dtype in df.dtypes)
+    assert df.equals(parse_data.load_fgp_data(_path, engine='pyarrow'))
+
+    object_df = parse_data.load_fgp_data(_path, categorical=False)
+    assert list(df['Protein'].astype(str)) == list(object_df['Protein'])
+
+
+def test_load_fgp_data_columns(test_input_dir):
+    _path = test_input_dir / "cazome_data_files/FG_FILE-uneditable"
+    df = parse_data.load_fgp_data(_path, columns=['Genome', 'Family'])
+
+    assert list(df.columns) == ['Family', 'Genome']
+    assert len(df) == 60
+
+
+def test_load_fgp_data_unknown_column(test_input_dir):
+    _path = test_input_dir / "cazome_data_files/FGP_FILE-uneditable"
+    with pytest.raises(ValueError):
+        parse_data.load_fgp_data(_path, columns=['Family', 'Genus'])
+
+
 def test_load_tax_data(test_input_dir):
     _path = test_input_dir / "cazome_data_files/taxs.csv"
 
@@ -82,3 +110,16 @@ def test_add_tax_column_from_row_index(fam_freq_df_with_tax):
         'Genus',
         1
     )) == 51
+
+
+def test_add_tax_data_from_tax_df_missing_genome(tax_df, capsys):
+    df = pd.DataFrame({
+        'Family': ['GH1', 'GH2', 'GH1'],
+        'Genome': [tax_df.iloc[0]['Genome'], 'GCA_1.1', tax_df.iloc[0]['Genome']],
+    })
+    df = parse_data.add_tax_data_from_tax_df(df, tax_df, genus=True)
+
+    assert list(df['Genus'].isna()) == [False, True, False]
+    assert df.iloc[0]['Genus'] == tax_df.iloc[0]['Genus']
+    assert "GCA_1.1" in capsys.readouterr().out
+    assert isinstance(df['Genus'].dtype, pd.CategoricalDtype)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+#
+# Author:
+# Emma E. M. Hobbs
+#
+# Contact
+# eemh1@st-andrews.ac.uk
+#
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+"""Test taxs module lineage_cache.py
+
+These test are intened to be run from the root of the repository using:
+pytest -v
+"""
+
+
+import pytest
+
+from argparse import Namespace
+
+from cazomevolve.taxs import lineage_cache, ncbi
+
+
+@pytest.fixture
+def col_names():
+    return ['Genome', 'Genus', 'Species']
+
+
+def test_cache_lineages(col_names, tmp_path):
+    cache = lineage_cache.connect_lineage_cache(tmp_path / "cache.db")
+    lineage_cache.add_lineages_to_cache(
+        cache,
+        {'GCA_1.1': 'GCA_1.1_Dickeya_dadantii', 'GCA_2.1': 'GCA_2.1_Dickeya_solani'},
+        col_names,
+        'NCBI 2023-01-01',
+    )
+    # replace an existing lineage
+    lineage_cache.add_lineages_to_cache(
+        cache,
+        {'GCA_2.1': 'GCA_2.1_Dickeya_fangzhongdai'},
+        col_names,
+        'NCBI 2023-02-01',
+    )
+
+    assert lineage_cache.get_cached_lineages(cache, {'GCA_2.1', 'GCA_3.1'}, col_names, 'NCBI') == {
+        'GCA_2.1': 'GCA_2.1_Dickeya_fangzhongdai',
+    }
+    # different selection of ranks
+    assert lineage_cache.get_cached_lineages(cache, {'GCA_1.1'}, ['Genome', 'Genus'], 'NCBI') == {}
+    # different source
+    assert lineage_cache.get_cached_lineages(cache, {'GCA_1.1'}, col_names, 'GTDB') == {}
+    cache.close()
+
+
+def test_cached_lineages_source_prefix(col_names, tmp_path, monkeypatch):
+    cache = lineage_cache.connect_lineage_cache(tmp_path / "cache.db")
+    genomes_tax_dict = {f'GCA_{i}.1': f'GCA_{i}.1_Dickeya_dadantii' for i in range(5)}
+    lineage_cache.add_lineages_to_cache(cache, genomes_tax_dict, col_names, 'GTDB bac120XtaxonomyXr214.tsv')
+
+    # '_' in the source prefix is not a wildcard
+    assert lineage_cache.get_cached_lineages(cache, set(genomes_tax_dict), col_names, 'GTDB bac120_taxonomy_r214.tsv') == {}
+    assert lineage_cache.get_cached_lineages(cache, set(genomes_tax_dict), col_names, 'GTDB bac120%') == {}
+
+    # genomes are looked up in batches
+    monkeypatch.setattr(lineage_cache, "LOOKUP_BATCH_SIZE", 2)
+    assert lineage_cache.get_cached_lineages(
+        cache,
+        set(genomes_tax_dict) | {'GCA_9.1'},
+        col_names,
+        'GTDB bac120XtaxonomyXr214.tsv',
+    ) == genomes_tax_dict
+    cache.close()
+
+
+def test_add_ncbi_taxs_cache(col_names, tmp_path, monkeypatch):
+    """Test only genomes not in the cache are queried against NCBI, and new lineages are cached"""
+    queried = []
+
+    def mock_get_tax_ids(genomes, args):
+        queried.extend(genomes)
+        return {'2': {'GCA_2.1'}}, ['GCA_3.1']
+
+    def mock_get_ncbi_taxs(taxids_genomes, genomes_tax_dict, failed_genomes, col_names, args):
+        genomes_tax_dict['GCA_2.1'] = 'GCA_2.1_Dickeya_solani'
+        return genomes_tax_dict, failed_genomes
+
+    monkeypatch.setattr(ncbi, "get_tax_ids", mock_get_tax_ids)
+    monkeypatch.setattr(ncbi, "get_ncbi_taxs", mock_get_ncbi_taxs)
+
+    cache = lineage_cache.connect_lineage_cache(tmp_path / "cache.db")
+    lineage_cache.add_lineages_to_cache(cache, {'GCA_1.1': 'GCA_1.1_Dickeya_dadantii'}, col_names, 'NCBI 2023-01-01')
+
+    genomes_tax_dict = ncbi.add_ncbi_taxs({}, {'GCA_1.1', 'GCA_2.1', 'GCA_3.1'}, col_names, Namespace(), cache=cache)
+
+    assert sorted(queried) == ['GCA_2.1', 'GCA_3.1']
+    assert genomes_tax_dict == {
+        'GCA_1.1': 'GCA_1.1_Dickeya_dadantii',
+        'GCA_2.1': 'GCA_2.1_Dickeya_solani',
+        'GCA_3.1': 'GCA_3.1_NaN_NaN',
+    }
+    # failed genomes are not cached
+    assert lineage_cache.get_cached_lineages(cache, {'GCA_2.1', 'GCA_3.1'}, col_names, 'NCBI') == {
+        'GCA_2.1': 'GCA_2.1_Dickeya_solani',
+    }
+    cache.close()
@@ -49,6 +49,7 @@ import pytest
 import pandas as pd
 
 from argparse import Namespace
+from contextlib import nullcontext
 
 from saintBioutils.utilities import logger
 
@@ -93,6 +94,61 @@ def test_get_ids_failed(argsdict, monkeypatch):
     assert out2 == ['genomes']
 
 
+def test_get_ids_batched(argsdict, monkeypatch):
+    """Test genomes are mapped back to tax ids, and only failed genomes are retried"""
+    retried = []
+
+    def mock_batch(genomes, args):
+        return {'GCA_1.1': '1', 'GCF_2.1': '1', 'GCA_3.1': '3'}
+
+    def mock_single(genome, args):
+        retried.append(genome)
+        return None
+
+    monkeypatch.setattr(ncbi, "get_batch_tax_ids", mock_batch)
+    monkeypatch.setattr(ncbi, "get_genome_tax_id", mock_single)
+
+    out1, out2 = ncbi.get_tax_ids(
+        ['GCA_1.1', 'GCF_2.1', 'GCA_3.1', 'GCA_4.1'],
+        argsdict['args'],
+        batch_size=2,
+    )
+    assert out1 == {'1': {'GCA_1.1', 'GCF_2.1'}, '3': {'GCA_3.1'}}
+    assert out2 == ['GCA_4.1']
+    assert retried == ['GCA_4.1']
+
+
+def test_get_batch_tax_ids(argsdict, monkeypatch):
+    """Test mapping GenBank and RefSeq accessions in document summaries to tax ids"""
+    results = [
+        {'IdList': ['11', '12']},
+        {'QueryKey': '1', 'WebEnv': 'env'},
+        {'DocumentSummarySet': {'DocumentSummary': [
+            {'AssemblyAccession': 'GCF_1.1', 'Taxid': '1', 'Synonym': {'Genbank': 'GCA_1.1', 'RefSeq': 'GCF_1.1'}},
+            {'AssemblyAccession': 'GCA_2.1', 'Taxid': '2', 'Synonym': {}},
+        ]}},
+    ]
+
+    class MockHandle:
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            return False
+
+    def mock_entrez(*args, **kwargs):
+        return MockHandle()
+
+    def mock_read(*args, **kwargs):
+        return results.pop(0)
+
+    monkeypatch.setattr(ncbi, "entrez_retry", mock_entrez)
+    monkeypatch.setattr(ncbi.Entrez, "read", mock_read)
+
+    assert ncbi.get_batch_tax_ids(['GCA_1.1', 'GCA_2.1', 'GCA_3.1'], argsdict['args']) == {
+        'GCA_1.1': '1', 'GCA_2.1': '2',
+    }
+
+
 def test_get_ncbi_taxs_failed(argsdict, col_names_full, monkeypatch):
     """Test getting taxs when connection fails"""
     def mock_entrez_tax_call(*args, **kwargs):
@@ -120,3 +176,50 @@ def test_get_ncbi_taxs(argsdict, col_names_full, monkeypatch, test_input_dir):
         out1, out2 = ncbi.get_ncbi_taxs({}, {}, {'genomes'}, col_names_full, argsdict['args'])
         assert out1 == {}
         assert out2 == {'genomes'}
+
+
+def test_get_ncbi_taxs_batch(argsdict, col_names_full, monkeypatch, test_input_dir):
+    """Test parsing lineages from a batch of NCBI Taxonomy records"""
+    ncbi_result = test_input_dir / "ncbi/ncbi_record.xml"
+
+    with open(ncbi_result, "rb") as fh:
+        def mock_entrez(*args, **kwards):
+            return fh
+
+        monkeypatch.setattr(ncbi, "entrez_retry", mock_entrez)
+
+        out1, out2 = ncbi.get_ncbi_taxs(
+            {'2700054': {'GCA_1.1'}, '1': {'GCA_2.1'}},
+            {},
+            [],
+            col_names_full,
+            argsdict['args'],
+        )
+    assert out1 == {
+        'GCA_1.1': 'GCA_1.1_Eukaryota_Ascomycota_Sordariomycetes_Hypocreales_Hypocreaceae_Trichoderma_achlamydosporum',
+    }
+    assert out2 == ['GCA_2.1']
+
+
+def test_get_ncbi_taxs_domain_rank(argsdict, col_names_full, monkeypatch):
+    """Test the Kingdom is retrieved from records using the 'domain' rank, which replaced 'superkingdom'"""
+    tax_records = [{
+        'TaxId': '1',
+        'ScientificName': 'Pectobacterium atrosepticum',
+        'LineageEx': [
+            {'Rank': 'domain', 'ScientificName': 'Bacteria'},
+            {'Rank': 'phylum', 'ScientificName': 'Pseudomonadota'},
+            {'Rank': 'class', 'ScientificName': 'Gammaproteobacteria'},
+            {'Rank': 'order', 'ScientificName': 'Enterobacterales'},
+            {'Rank': 'family', 'ScientificName': 'Pectobacteriaceae'},
+            {'Rank': 'genus', 'ScientificName': 'Pectobacterium'},
+        ],
+    }]
+    monkeypatch.setattr(ncbi, "entrez_retry", lambda *args, **kwargs: nullcontext())
+    monkeypatch.setattr(ncbi.Entrez, "read", lambda *args, **kwargs: tax_records)
+
+    out1, out2 = ncbi.get_ncbi_taxs({'1': {'GCA_1.1'}}, {}, [], col_names_full, argsdict['args'])
+    assert out1 == {
+        'GCA_1.1': 'GCA_1.1_Bacteria_Pseudomonadota_Gammaproteobacteria_Enterobacterales_Pectobacteriaceae_Pectobacterium_atrosepticum',
+    }
+    assert out2 == []
@@ -64,6 +64,8 @@ from cazomevolve.utilities.parsers import (
     get_dbcan_parser,
     add_taxs_parser,
     explore_cazomes_parser,
+    store_parser,
+    query_parser,
 )
 
 
@@ -254,6 +256,19 @@ def test_explore_cazomes_parser(monkeypatch):
     new_namespace = parse_cmd.build_parser(['explore_cazomes', 'fgp_file', 'tax_csv_path', 'out'])
     assert new_namespace.fgp_file == Path('fgp_file')
     assert new_namespace.tax_csv_path == Path('tax_csv_path')
+    assert new_namespace.formats == ['pdf']
+    assert new_namespace.near_cooccurrence_threshold is None
+    assert new_namespace.rebuild_fam_freqs is False
+
+
+def test_explore_cazomes_parser_formats(monkeypatch):
+    def mock_run(*args, **kwards):
+        return
+
+    monkeypatch.setattr(cazomevolve_script, "main", mock_run)
+
+    new_namespace = parse_cmd.build_parser(['explore_cazomes', 'fgp_file', 'tax_csv_path', 'out', '--formats', 'png', 'svg'])
+    assert new_namespace.formats == ['png', 'svg']
 
 
 def test_explore_cazomes_parser_invalid_foramt(monkeypatch):
@@ -265,3 +280,27 @@ def test_explore_cazomes_parser_invalid_foramt(monkeypatch):
     with pytest.raises(SystemExit) as pytest_wrapped_e:
         new_namespace = parse_cmd.build_parser(['explore_cazomes', 'fgp_file', 'tax_csv_path', 'out', 'prot', 'genus', 'ppp'])
     assert pytest_wrapped_e.type == SystemExit
+
+
+def test_store_build_parser(monkeypatch):
+    def mock_run(*args, **kwards):
+        return
+
+    monkeypatch.setattr(cazomevolve_script, "main", mock_run)
+
+    new_namespace = parse_cmd.build_parser(['store', 'build', 'db', '--FGP_FILE', 'fgp_file'])
+    assert new_namespace.db == Path('db')
+    assert new_namespace.FGP_FILE == Path('fgp_file')
+    assert new_namespace.FG_FILE is None
+
+
+def test_query_parser(monkeypatch):
+    def mock_run(*args, **kwards):
+        return
+
+    monkeypatch.setattr(cazomevolve_script, "main", mock_run)
+
+    new_namespace = parse_cmd.build_parser(['query', 'db', '--families', 'GH28', '--rank', 'Genus', 'Dickeya'])
+    assert new_namespace.families == ['GH28']
+    assert new_namespace.rank == [['Genus', 'Dickeya']]
+    assert new_namespace.output == 'annotations'
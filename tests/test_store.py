@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+#
+# Author:
+# Emma E. M. Hobbs
+#
+# Contact
+# eemh1@st-andrews.ac.uk
+#
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+"""Test cazome module store.py
+
+These test are intened to be run from the root of the repository using:
+pytest -v
+"""
+
+
+import pytest
+
+import pandas as pd
+
+from argparse import Namespace
+
+from cazomevolve.cazome import store
+
+
+@pytest.fixture
+def cazome_store(tmp_path):
+    fgp_path = tmp_path / "fgp.tsv"
+    fgp_path.write_text(
+        "GH28\tGCA_1.1\tP1\n"
+        "PL1\tGCA_1.1\tP1\n"
+        "PL1\tGCA_1.1\tP2\n"
+        "GH28\tGCA_2.1\tP3\n"
+        "GH28\tGCA_3.1\tP4\n"
+        "CE8\tGCA_3.1\tP5\n"
+    )
+    tax_path = tmp_path / "taxs.csv"
+    tax_path.write_text(
+        ",Genome,Genus,Species\n"
+        "0,GCA_1.1,Dickeya,dadantii\n"
+        "1,GCA_2.1,Pectobacterium,versatile\n"
+        "2,GCA_3.1,Dickeya,solani\n"
+    )
+
+    connection = store.connect_store(tmp_path / "store.db")
+    store.add_cazome_data(connection, fgp_path, proteins=True, chunk_size=2)
+    store.add_tax_data(connection, tax_path)
+    yield connection
+    connection.close()
+
+
+def test_query_genomes(cazome_store):
+    assert store.query_genomes(cazome_store, families=['GH28'], ranks={'Genus': 'Dickeya'}) == ['GCA_1.1', 'GCA_3.1']
+    assert store.query_genomes(cazome_store, proteins=['P3']) == ['GCA_2.1']
+    assert store.query_genomes(cazome_store, families=['GH1']) == []
+
+
+def test_query_annotations(cazome_store):
+    annotations = store.query_annotations(cazome_store, families=['PL1'], ranks={'Genus': 'Dickeya'})
+    assert annotations.values.tolist() == [['GCA_1.1', 'PL1', 'P1'], ['GCA_1.1', 'PL1', 'P2']]
+
+
+def test_query_fam_freqs(cazome_store):
+    fam_freqs = store.query_fam_freqs(cazome_store, genomes=['GCA_1.1', 'GCA_3.1'])
+    assert list(fam_freqs.columns) == ['Genome', 'CE8', 'GH28', 'PL1']
+    assert fam_freqs.values.tolist() == [['GCA_1.1', 0, 1, 2], ['GCA_3.1', 1, 1, 0]]
+
+
+def test_rebuild_replaces_annotations(cazome_store, tmp_path):
+    fg_path = tmp_path / "fg.tsv"
+    fg_path.write_text("GH5\tGCA_2.1\nGH5\tGCA_2.1\n")
+
+    store.add_cazome_data(cazome_store, fg_path, proteins=False)
+
+    annotations = store.query_annotations(cazome_store, genomes=['GCA_2.1'])
+    assert annotations['Family'].tolist() == ['GH5', 'GH5']
+    assert annotations['Protein'].isna().all()
+    # other genomes are unchanged
+    assert len(store.query_annotations(cazome_store, genomes=['GCA_1.1'])) == 3
+
+
+def test_fg_family_counts(tmp_path):
+    fg_path = tmp_path / "fg.tsv"
+    fg_path.write_text("CBM50\tGCA_1.1\nGH28\tGCA_1.1\nCBM50\tGCA_1.1\nCBM50\tGCA_1.1\nGH28\tGCA_2.1\n")
+
+    connection = store.connect_store(tmp_path / "store.db")
+    store.add_cazome_data(connection, fg_path, proteins=False, chunk_size=2)
+
+    # each line of a FG list is one annotation
+    fam_freqs = store.query_fam_freqs(connection)
+    assert list(fam_freqs.columns) == ['Genome', 'CBM50', 'GH28']
+    assert fam_freqs.values.tolist() == [['GCA_1.1', 3, 1], ['GCA_2.1', 0, 1]]
+    connection.close()
+
+
+def test_build_main_fgp_and_fg(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "closing_message", lambda *args, **kwargs: None)
+
+    fgp_path = tmp_path / "fgp.tsv"
+    fgp_path.write_text("GH28\tGCA_1.1\tP1\nPL1\tGCA_1.1\tP2\nGH28\tGCA_2.1\tP3\n")
+    fg_path = tmp_path / "fg.tsv"
+    fg_path.write_text("GH28\tGCA_1.1\nPL1\tGCA_1.1\nGH28\tGCA_2.1\nCE8\tGCA_3.1\n")
+    tax_path = tmp_path / "taxs.csv"
+    tax_path.write_text(",Genome,Genus\n0,GCA_1.1,Dickeya\n1,GCA_2.1,Pectobacterium\n2,GCA_3.1,Dickeya\n")
+
+    args = Namespace(
+        db=tmp_path / "store.db",
+        FGP_FILE=fgp_path,
+        FG_FILE=fg_path,
+        tax_csv_path=tax_path,
+        chunk_size=2,
+    )
+    store.build_main(args, logger=True)
+
+    connection = store.connect_store(tmp_path / "store.db")
+    annotations = store.query_annotations(connection, families=['PL1'], ranks={'Genus': 'Dickeya'})
+    assert annotations.values.tolist() == [['GCA_1.1', 'PL1', 'P2']]
+    assert store.query_annotations(connection, genomes=['GCA_1.1', 'GCA_2.1'])['Protein'].tolist() == ['P1', 'P2', 'P3']
+    # genomes only listed in the FG file are added without protein IDs
+    assert store.query_annotations(connection, genomes=['GCA_3.1']).values.tolist() == [['GCA_3.1', 'CE8', None]]
+    connection.close()
+
+
+def test_query_main(cazome_store, tmp_path):
+    genomes_file = tmp_path / "genomes.txt"
+    genomes_file.write_text("GCA_1.1\n\nGCA_2.1\n")
+
+    args = Namespace(
+        db=tmp_path / "store.db",
+        genomes=None,
+        genomes_file=genomes_file,
+        families=None,
+        proteins=None,
+        rank=[['Species', 'dadantii']],
+        output='genomes',
+        outpath=tmp_path / "out.csv",
+    )
+    store.query_main(args, logger=True)
+
+    assert pd.read_csv(tmp_path / "out.csv")['Genome'].tolist() == ['GCA_1.1']
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# (c) University of St Andrews 2022
+# (c) University of Strathclyde 2022
+# (c) James Hutton Institute 2022
+#
+# Author:
+# Emma E. M. Hobbs
+#
+# Contact
+# eemh1@st-andrews.ac.uk
+#
+# Emma E. M. Hobbs,
+# Biomolecular Sciences Building,
+# University of St Andrews,
+# North Haugh Campus,
+# St Andrews,
+# KY16 9ST
+# Scotland,
+# UK
+#
+# The MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+"""Test taxs module taxdump.py
+
+These test are intened to be run from the root of the repository using:
+pytest -v
+"""
+
+
+import pytest
+
+from argparse import Namespace
+
+from cazomevolve.taxs import taxdump
+
+
+@pytest.fixture
+def taxdump_dir(test_input_dir):
+    return test_input_dir / "taxdump"
+
+
+@pytest.fixture
+def argsdict(taxdump_dir):
+    return {'args': Namespace(
+        taxdump=taxdump_dir,
+        acc_taxids=taxdump_dir / "acc_taxids.tsv",
+    )}
+
+
+@pytest.fixture
+def col_names_full():
+    return ['Genome', 'Kingdom', 'Phylum', 'Class', 'Order', 'Family', 'Genus', 'Species']
+
+
+def test_get_lineage(taxdump_dir):
+    tree = taxdump.TaxDump(taxdump_dir / "nodes.dmp", taxdump_dir / "names.dmp")
+    assert tree.get_lineage(204038) == {
+        'superkingdom': 'Bacteria',
+        'phylum': 'Pseudomonadota',
+        'class': 'Gammaproteobacteria',
+        'order': 'Enterobacterales',
+        'family': 'Pectobacteriaceae',
+        'genus': 'Dickeya',
+        'species': 'Dickeya dadantii',
+    }
+    # lineages of ancestors are memoised
+    assert tree.get_lineage(204037)['genus'] == 'Dickeya'
+    assert tree.get_lineage(999) is None
+
+
+def test_load_acc_taxids_assembly_summary(tmp_path):
+    summary_path = tmp_path / "assembly_summary.txt"
+    with open(summary_path, "w") as fh:
+        fh.write("#   See ftp://ftp.ncbi.nlm.nih.gov/genomes/README_assembly_summary.txt\n")
+        fh.write("\t".join(
+            ["GCF_000147055.1", "PRJNA224116", "SAMN02603773", "", "reference genome", "198628", "204038"]
+            + [""] * 10 + ["GCA_000147055.1"]
+        ) + "\n")
+
+    assert taxdump.load_acc_taxids(summary_path) == {
+        'GCF_000147055.1': 198628,
+        'GCA_000147055.1': 198628,
+    }
+
+
+def test_add_taxdump_taxs(argsdict, col_names_full):
+    genomes_tax_dict = taxdump.add_taxdump_taxs(
+        {},
+        {'GCF_000147055.1', 'GCA_000406145.1', 'GCA_1.1'},
+        col_names_full,
+        argsdict['args'],
+    )
+    assert genomes_tax_dict == {
+        'GCF_000147055.1': 'GCF_000147055.1_Bacteria_Pseudomonadota_Gammaproteobacteria_Enterobacterales_Pectobacteriaceae_Dickeya_dadantii',
+        'GCA_000406145.1': 'GCA_000406145.1_Bacteria_Pseudomonadota_Gammaproteobacteria_Enterobacterales_Pectobacteriaceae_Dickeya_',
+        'GCA_1.1': 'GCA_1.1_NaN_NaN_NaN_NaN_NaN_NaN_NaN',
+    }